@@ -0,0 +1,51 @@
+'''
+Costo en CPU contra bytes ahorrados de cada codificación y nivel de
+`CompressionMiddleware`, sobre el listado de comics y el de wish-lists en
+JSON y MessagePack.
+'''
+from common import bench, comic_list_payload, print_table, wishlist_payload
+
+from e_commerce.api.renderers import FastJSONRenderer, MessagePackRenderer
+from e_commerce.middleware import COMPRESSORS
+
+
+LEVELS = {'gzip': (1, 6, 9), 'br': (1, 4, 6, 11), 'zstd': (1, 3, 9, 19)}
+
+
+def _compress(compressor_class, level, content):
+    _compressor = compressor_class(level)
+    return _compressor.compress(content) + _compressor.finish()
+
+
+def main():
+    _rows = []
+    for _name, _payload in (
+        ('comics x1000', comic_list_payload(1000)),
+        ('wishlists x1000', wishlist_payload(1000)),
+    ):
+        for _format, _renderer in (
+            ('json', FastJSONRenderer()),
+            ('msgpack', MessagePackRenderer()),
+        ):
+            _content = _renderer.render(_payload)
+            _rows.append((_name, _format, '-', '-', len(_content), '100.0', '0.00'))
+            for _encoding, (_class, _) in COMPRESSORS.items():
+                for _level in LEVELS[_encoding]:
+                    _size = len(_compress(_class, _level, _content))
+                    _rows.append((
+                        _name,
+                        _format,
+                        _encoding,
+                        _level,
+                        _size,
+                        f'{_size / len(_content) * 100:.1f}',
+                        f'{bench(lambda: _compress(_class, _level, _content), repeat=3) * 1000:.2f}',
+                    ))
+    print_table(
+        ('payload', 'format', 'encoding', 'level', 'bytes', '% size', 'ms'),
+        _rows
+    )
+
+
+if __name__ == '__main__':
+    main()
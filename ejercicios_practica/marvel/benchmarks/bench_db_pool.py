@@ -0,0 +1,111 @@
+'''
+Latencia de requests que hacen una consulta a Postgres según cómo se
+manejan las conexiones: una nueva por request (CONN_MAX_AGE = 0),
+persistentes por hilo (CONN_MAX_AGE > 0) y con el pool del backend
+(e_commerce/db/backends/postgresql). Los requests pasan por el
+`WSGIHandler` de Django, que abre y cierra las conexiones igual que en
+producción, desde varios hilos como un servidor WSGI con hilos.
+Requiere Postgres:
+
+    DB_ENGINE=POSTGRES DB_HOST=localhost python benchmarks/bench_db_pool.py
+'''
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import make_comics, print_table, setup_test_database
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections
+from django.http import JsonResponse
+from django.urls import path
+
+from e_commerce.db.backends.postgresql import base
+from e_commerce.models import Comic
+
+_REQUESTS = 2000
+_THREADS = (1, 8)
+_CONFIGS = (
+    ('nueva por request', {'CONN_MAX_AGE': 0}, {}),
+    ('persistente', {'CONN_MAX_AGE': 60}, {}),
+    ('pool', {'CONN_MAX_AGE': 0}, {'pool': {'max_size': 8}}),
+)
+
+
+def _comic_view(request, pk):
+    return JsonResponse({'title': Comic.objects.only('title').get(pk=pk).title})
+
+
+urlpatterns = [path('comics/<int:pk>/', _comic_view)]
+
+
+def _environ(pk):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': f'/comics/{pk}/',
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+
+
+def _run(handler, threads):
+    def _worker(count):
+        _latencies = []
+        for _index in range(count):
+            _start = time.perf_counter()
+            _response = handler(_environ(_index % 100 + 1), lambda *args: None)
+            _response.close()
+            _latencies.append(time.perf_counter() - _start)
+        # Los hilos terminan, sus conexiones persistentes también.
+        connections.close_all()
+        return _latencies
+
+    _start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as _executor:
+        _results = list(_executor.map(_worker, [_REQUESTS // threads] * threads))
+    _elapsed = time.perf_counter() - _start
+    _latencies = sorted(_latency for _result in _results for _latency in _result)
+    return (
+        statistics.median(_latencies),
+        _latencies[int(len(_latencies) * 0.99) - 1],
+        len(_latencies) / _elapsed,
+    )
+
+
+def main():
+    if connection.vendor != 'postgresql':
+        sys.exit('Este benchmark requiere Postgres (DB_ENGINE=POSTGRES).')
+    settings.ROOT_URLCONF = __name__
+    _teardown = setup_test_database()
+    try:
+        Comic.objects.bulk_create(make_comics(100))
+        connection.close()
+        _handler = WSGIHandler()
+        _settings = connections.settings['default']
+        _rows = []
+        for _threads in _THREADS:
+            for _name, _values, _options in _CONFIGS:
+                _settings.update(_values)
+                _settings['OPTIONS'] = _options
+                _p50, _p99, _rps = _run(_handler, _threads)
+                _rows.append((
+                    _threads, _name, f'{_p50 * 1000:.2f}', f'{_p99 * 1000:.2f}', f'{_rps:.0f}'
+                ))
+                for _pool in base._pools.values():
+                    _pool.close()
+                base._pools.clear()
+        print_table(('hilos', 'conexiones', 'p50 ms', 'p99 ms', 'requests/s'), _rows)
+    finally:
+        _settings.update({'CONN_MAX_AGE': 0, 'OPTIONS': {}})
+        _teardown()
+
+
+if __name__ == '__main__':
+    main()
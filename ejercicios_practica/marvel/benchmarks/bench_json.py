@@ -0,0 +1,39 @@
+'''
+Compara `JSONRenderer` / `JSONParser` de DRF con `FastJSONRenderer` /
+`FastJSONParser` (orjson) sobre el listado de comics y el de wish-lists.
+'''
+import io
+
+from common import bench, comic_list_payload, print_table, wishlist_payload
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from e_commerce.api.parsers import FastJSONParser
+from e_commerce.api.renderers import FastJSONRenderer
+
+
+def main():
+    _rows = []
+    for _name, _payload in (
+        ('comics x1000', comic_list_payload(1000)),
+        ('wishlists x1000', wishlist_payload(1000)),
+    ):
+        _content = JSONRenderer().render(_payload)
+        assert FastJSONRenderer().render(_payload) == _content
+        for _label, _renderer, _parser in (
+            ('json', JSONRenderer(), JSONParser()),
+            ('orjson', FastJSONRenderer(), FastJSONParser()),
+        ):
+            _rows.append((
+                _name,
+                _label,
+                len(_content),
+                f'{bench(lambda: _renderer.render(_payload)) * 1000:.2f}',
+                f'{bench(lambda: _parser.parse(io.BytesIO(_content))) * 1000:.2f}',
+            ))
+    print_table(('payload', 'encoder', 'bytes', 'render ms', 'parse ms'), _rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+'''
+Compara los listados armados con instancias del modelo contra el pipeline
+de `values_list()` (`ValuesListMixin`): tiempo por request y memoria pico
+(tracemalloc) sobre una base de datos de prueba.
+'''
+import tracemalloc
+
+from common import (
+    bench,
+    make_comics,
+    make_users,
+    print_table,
+    setup_test_database
+)
+
+from django.contrib.auth.models import User
+
+from rest_framework.generics import ListAPIView
+from rest_framework.permissions import AllowAny
+from rest_framework.test import APIRequestFactory
+
+from e_commerce.api.mixins import SparseFieldsQuerysetMixin, ValuesListMixin
+from e_commerce.api.serializers import ComicSerializer, UserSerializer
+from e_commerce.models import Comic
+
+_SIZES = (100, 1000, 10000)
+
+
+def _view(serializer_class, values):
+    _bases = (SparseFieldsQuerysetMixin, ValuesListMixin, ListAPIView) if values else (
+        SparseFieldsQuerysetMixin, ListAPIView
+    )
+    return type('BenchListAPIView', _bases, {
+        'queryset': serializer_class.Meta.model.objects.order_by('id'),
+        'serializer_class': serializer_class,
+        'permission_classes': (AllowAny,),
+        'pagination_class': None,
+    }).as_view()
+
+
+def _peak_memory(func):
+    tracemalloc.start()
+    func()
+    _, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _peak
+
+
+def main():
+    # NOTE: En SQLite las fechas se guardan como texto y Django las convierte
+    # al leerlas con ambos pipelines; con los dos campos de fecha de `User`
+    # esa conversión es la mayor parte del tiempo.
+    _teardown = setup_test_database()
+    try:
+        Comic.objects.bulk_create(make_comics(max(_SIZES)))
+        User.objects.bulk_create(make_users(max(_SIZES)))
+        _factory = APIRequestFactory()
+        _rows = []
+        for _name, _serializer_class in (
+            ('comics', ComicSerializer), ('users', UserSerializer)
+        ):
+            _instances_view = _view(_serializer_class, values=False)
+            _values_view = _view(_serializer_class, values=True)
+            _model = _serializer_class.Meta.model
+            for _size in _SIZES:
+                _request = _factory.get('/')
+                _queryset = _model.objects.filter(id__lte=_size).order_by('id')
+                _instances_view.view_class.queryset = _queryset
+                _values_view.view_class.queryset = _queryset
+                assert (
+                    _instances_view(_request).data == _values_view(_request).data
+                ), f'{_name}: la salida del pipeline es distinta.'
+                _times, _peaks = [], []
+                for _view_func in (_instances_view, _values_view):
+                    _times.append(bench(lambda: _view_func(_request).data, repeat=3))
+                    _peaks.append(_peak_memory(lambda: _view_func(_request).data))
+                _rows.append((
+                    f'{_name} x{_size}',
+                    f'{_times[0] * 1000:.2f}',
+                    f'{_times[1] * 1000:.2f}',
+                    f'{_times[0] / _times[1]:.1f}x',
+                    f'{_peaks[0] / 1024:.0f}',
+                    f'{_peaks[1] / 1024:.0f}',
+                ))
+    finally:
+        _teardown()
+    print_table(
+        ('listado', 'instancias ms', 'values ms', 'speedup',
+         'instancias KiB', 'values KiB'),
+        _rows
+    )
+
+
+if __name__ == '__main__':
+    main()
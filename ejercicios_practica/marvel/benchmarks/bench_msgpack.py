@@ -0,0 +1,39 @@
+'''
+Compara tamaño y CPU de MessagePack contra JSON (estándar y orjson) sobre
+la salida anidada de `WishListSerializer` y el listado de comics.
+'''
+import io
+
+from common import bench, comic_list_payload, print_table, wishlist_payload
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from e_commerce.api.parsers import FastJSONParser, MessagePackParser
+from e_commerce.api.renderers import FastJSONRenderer, MessagePackRenderer
+
+
+def main():
+    _rows = []
+    for _name, _payload in (
+        ('wishlists x1000', wishlist_payload(1000)),
+        ('comics x1000', comic_list_payload(1000)),
+    ):
+        for _label, _renderer, _parser in (
+            ('json', JSONRenderer(), JSONParser()),
+            ('orjson', FastJSONRenderer(), FastJSONParser()),
+            ('msgpack', MessagePackRenderer(), MessagePackParser()),
+        ):
+            _content = _renderer.render(_payload)
+            _rows.append((
+                _name,
+                _label,
+                len(_content),
+                f'{bench(lambda: _renderer.render(_payload)) * 1000:.2f}',
+                f'{bench(lambda: _parser.parse(io.BytesIO(_content))) * 1000:.2f}',
+            ))
+    print_table(('payload', 'format', 'bytes', 'render ms', 'parse ms'), _rows)
+
+
+if __name__ == '__main__':
+    main()
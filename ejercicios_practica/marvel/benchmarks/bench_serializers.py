@@ -0,0 +1,51 @@
+'''
+Compara la representación genérica de DRF con la compilada
+(`E_COMMERCE_COMPILED_SERIALIZERS`) en páginas de 1000 filas.
+'''
+from common import bench, make_comics, make_users, make_wishlists, print_table
+
+from django.conf import settings
+
+from e_commerce.api.renderers import FastJSONRenderer
+from e_commerce.api.serializers import (
+    ComicSerializer,
+    UserSerializer,
+    WishListSerializer
+)
+
+
+def _represent(serializer_class, rows, compiled, **kwargs):
+    settings.E_COMMERCE_COMPILED_SERIALIZERS = compiled
+    return serializer_class(rows, many=True, **kwargs).data
+
+
+def main():
+    _rows = []
+    for _name, _serializer_class, _instances, _kwargs in (
+        ('ComicSerializer', ComicSerializer, make_comics(1000), {}),
+        ('UserSerializer', UserSerializer, make_users(1000), {}),
+        ('WishListSerializer (ids)', WishListSerializer, make_wishlists(1000), {}),
+        (
+            'WishListSerializer (expand)', WishListSerializer, make_wishlists(1000),
+            {'context': {'expand': ('user', 'comic')}}
+        ),
+    ):
+        _render = FastJSONRenderer().render
+        assert _render(
+            _represent(_serializer_class, _instances, False, **_kwargs)
+        ) == _render(
+            _represent(_serializer_class, _instances, True, **_kwargs)
+        ), f'{_name}: la salida compilada es distinta.'
+        _drf = bench(lambda: _represent(_serializer_class, _instances, False, **_kwargs))
+        _compiled = bench(lambda: _represent(_serializer_class, _instances, True, **_kwargs))
+        _rows.append((
+            _name,
+            f'{_drf * 1000:.2f}',
+            f'{_compiled * 1000:.2f}',
+            f'{_drf / _compiled:.1f}x',
+        ))
+    print_table(('serializer x1000', 'drf ms', 'compiled ms', 'speedup'), _rows)
+
+
+if __name__ == '__main__':
+    main()
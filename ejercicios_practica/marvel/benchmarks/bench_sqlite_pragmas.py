@@ -0,0 +1,104 @@
+'''
+Lecturas y escrituras concurrentes sobre SQLite con los PRAGMAs por
+defecto y con `E_COMMERCE_SQLITE_PRAGMAS` (WAL, synchronous=NORMAL, mmap,
+etc.). Varios hilos leen listados de comics mientras otros actualizan el
+stock como `purchased_item`; cada configuración usa un archivo nuevo (el
+modo WAL queda guardado en el archivo).
+'''
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from common import make_comics, print_table
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+
+from e_commerce.models import Comic
+
+_COMICS = 1000
+_READERS = 4
+_WRITERS = 2
+_SECONDS = 3
+
+
+def _reader(stop, counts):
+    _offset = 0
+    while not stop.is_set():
+        try:
+            list(
+                Comic.objects.order_by('id')
+                .values_list('id', 'title', 'price', 'stock_qty')[_offset:_offset + 100]
+            )
+            counts['reads'] += 1
+        except OperationalError:
+            counts['errors'] += 1
+        _offset = (_offset + 100) % _COMICS
+    connection.close()
+
+
+# NOTE: Con dos escritores igual hay errores en ambas configuraciones: cada
+# uno lee el comic y después lo guarda (como `purchased_item`), y si otro
+# escribió entre medio SQLite no puede esperar y falla enseguida. WAL evita
+# que los lectores y el escritor se bloqueen entre sí, no eso.
+def _writer(stop, counts):
+    _pk = 0
+    while not stop.is_set():
+        try:
+            with transaction.atomic():
+                _comic = Comic.objects.get(pk=_pk % _COMICS + 1)
+                _comic.stock_qty += 1
+                _comic.save()
+            counts['writes'] += 1
+        except OperationalError:
+            counts['errors'] += 1
+        _pk += 1
+    connection.close()
+
+
+def _run(pragmas, directory):
+    settings.E_COMMERCE_SQLITE_PRAGMAS = pragmas
+    connections.settings['default']['NAME'] = Path(directory) / f'bench-{len(pragmas)}.sqlite3'
+    connection.close()
+    call_command('migrate', verbosity=0)
+    Comic.objects.bulk_create(make_comics(_COMICS))
+    connection.close()
+
+    _stop = threading.Event()
+    _counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    _threads = [
+        threading.Thread(target=_reader, args=(_stop, _counts)) for _ in range(_READERS)
+    ] + [
+        threading.Thread(target=_writer, args=(_stop, _counts)) for _ in range(_WRITERS)
+    ]
+    for _thread in _threads:
+        _thread.start()
+    time.sleep(_SECONDS)
+    _stop.set()
+    for _thread in _threads:
+        _thread.join()
+    return _counts
+
+
+def main():
+    if connection.vendor != 'sqlite':
+        raise SystemExit('Este benchmark es para SQLite.')
+    _pragmas = settings.E_COMMERCE_SQLITE_PRAGMAS
+    _rows = []
+    with tempfile.TemporaryDirectory() as _directory:
+        for _name, _config in (('por defecto', {}), ('E_COMMERCE_SQLITE_PRAGMAS', _pragmas)):
+            _counts = _run(_config, _directory)
+            _rows.append((
+                _name,
+                f'{_counts["reads"] / _SECONDS:.0f}',
+                f'{_counts["writes"] / _SECONDS:.0f}',
+                _counts['errors'],
+            ))
+    print(f'{_READERS} hilos leyendo y {_WRITERS} escribiendo durante {_SECONDS}s:')
+    print_table(('PRAGMAs', 'lecturas/s', 'escrituras/s', 'database is locked'), _rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+'''
+Utilidades compartidas por los benchmarks. Cada script se ejecuta desde el
+directorio del proyecto, por ejemplo:
+
+    python benchmarks/bench_json.py
+'''
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marvel.settings')
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from e_commerce.models import Comic, WishList  # noqa: E402
+
+
+# Textos con el largo típico de los comics que trae `get_comics`.
+DESCRIPTION = (
+    'Spider-Man faces his greatest challenge yet as an old enemy returns '
+    'to New York with a plan that could change the Marvel Universe forever. '
+) * 4
+PICTURE = (
+    'http://i.annihil.us/u/prod/marvel/i/mg/c/80/5e3d7536c8ada/'
+    'standard_xlarge.jpg'
+)
+
+
+def make_comics(count):
+    _now = timezone.now()
+    return [
+        Comic(
+            id=_index + 1,
+            marvel_id=80000 + _index,
+            title=f'Amazing Spider-Man (2018) #{_index}',
+            description=DESCRIPTION,
+            price=3.99 + _index % 5,
+            stock_qty=_index % 20,
+            picture=PICTURE,
+            created_at=_now,
+            updated_at=_now,
+        )
+        for _index in range(count)
+    ]
+
+
+def make_users(count):
+    _now = timezone.now()
+    return [
+        User(
+            id=_index + 1, username=f'user{_index}', email=f'user{_index}@example.com',
+            first_name='Inove', last_name='Coding School', password='pbkdf2_sha256$x',
+            is_staff=not _index % 10, date_joined=_now, last_login=_now
+        )
+        for _index in range(count)
+    ]
+
+
+def make_wishlists(count):
+    _user = User(
+        id=1, username='inovecode', email='inove@example.com',
+        first_name='Inove', last_name='Coding School',
+        date_joined=timezone.now(), last_login=timezone.now()
+    )
+    return [
+        WishList(
+            id=_comic.id, user=_user, comic=_comic, favorite=bool(_comic.id % 2),
+            cart=not _comic.id % 3, wished_qty=1, bought_qty=0
+        )
+        for _comic in make_comics(count)
+    ]
+
+
+def comic_list_payload(count=1000):
+    from e_commerce.api.serializers import ComicSerializer
+    return ComicSerializer(make_comics(count), many=True).data
+
+
+def wishlist_payload(count=1000, expand=('user', 'comic')):
+    from e_commerce.api.serializers import WishListSerializer
+    return WishListSerializer(
+        make_wishlists(count), many=True, context={'expand': expand}
+    ).data
+
+
+def setup_test_database():
+    '''
+    Crea una base de datos de prueba vacía (como hace el runner de tests) y
+    devuelve una función para eliminarla al terminar.
+    '''
+    from django.db import connection
+    _old_name = connection.creation.create_test_db(verbosity=0)
+    return lambda: connection.creation.destroy_test_db(_old_name, verbosity=0)
+
+
+def bench(func, repeat=5, number=None):
+    '''
+    Devuelve el mejor tiempo (en segundos) de una llamada a `func()`.
+    Si no se indica `number` se calcula para que cada medición dure ~0.2s.
+    '''
+    if number is None:
+        number = 1
+        while True:
+            _start = time.perf_counter()
+            for _ in range(number):
+                func()
+            if time.perf_counter() - _start > 0.2:
+                break
+            number *= 2
+    _best = float('inf')
+    for _ in range(repeat):
+        _start = time.perf_counter()
+        for _ in range(number):
+            func()
+        _best = min(_best, (time.perf_counter() - _start) / number)
+    return _best
+
+
+def print_table(headers, rows):
+    _widths = [
+        max(len(str(_value)) for _value in (_header, *_column))
+        for _header, *_column in zip(headers, *rows)
+    ]
+    for _row in (headers, *rows):
+        print('  '.join(
+            str(_value).rjust(_width) for _value, _width in zip(_row, _widths)
+        ))
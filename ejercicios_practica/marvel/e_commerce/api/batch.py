@@ -0,0 +1,214 @@
+import functools
+import io
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+import orjson
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from rest_framework.permissions import SAFE_METHODS
+
+from e_commerce.middleware import is_compression_exempt
+
+
+logger = logging.getLogger(__name__)
+
+# NOTE: Los requests de un batch se ejecutan llamando directamente a la view
+# que resuelve cada URL, sin volver a pasar por HTTP ni por los middlewares.
+# El request del batch ya está autenticado, así que si la view acepta el
+# mismo método de autenticación (por ejemplo `TokenAuthentication`) a cada
+# sub-request se le pasa el mismo usuario y token con la "autenticación
+# forzada" de DRF (la misma que usa `APIClient.force_authenticate()`), y no
+# se vuelve a consultar la base de datos para autenticarlo. Si no lo acepta,
+# el sub-request lleva las credenciales originales (headers y cookies) y se
+# autentica con las `authentication_classes` de la view, como cualquier
+# request.
+
+
+def _accepts_authenticator(view_func, authenticator):
+    _view_class = getattr(view_func, 'cls', None)
+    if authenticator is None or _view_class is None:
+        return False
+    return any(
+        isinstance(authenticator, _class)
+        for _class in _view_class.authentication_classes
+    )
+
+
+def _sub_request(request, method, path, body, force_auth):
+    _path, _, _query = path.partition('?')
+    _body = b'' if body is None else orjson.dumps(body)
+    _sub = HttpRequest()
+    _sub.method = method
+    _sub.path = _sub.path_info = _path
+    _sub.META = {
+        **request.META,
+        'REQUEST_METHOD': method,
+        'PATH_INFO': _path,
+        'QUERY_STRING': _query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(_body)),
+        'HTTP_ACCEPT': 'application/json',
+    }
+    # Los headers condicionales y de compresión no aplican a cada parte.
+    for _header in (
+        'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_ACCEPT_ENCODING'
+    ):
+        _sub.META.pop(_header, None)
+    _sub.GET = QueryDict(_query)
+    _sub.COOKIES = request.COOKIES
+    _sub._stream = io.BytesIO(_body)
+    _sub._read_started = False
+    for _attr in ('session', 'user'):
+        if hasattr(request._request, _attr):
+            setattr(_sub, _attr, getattr(request._request, _attr))
+    if force_auth:
+        _sub._force_auth_user = request.user
+        _sub._force_auth_token = request.auth
+    return _sub
+
+
+def _content(response):
+    if response.streaming:
+        _content = b''.join(response.streaming_content)
+    else:
+        _content = response.content
+    if not _content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return orjson.loads(_content)
+    return _content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def dispatch(request, prefix, sub_request):
+    '''
+    Ejecuta un sub-request (`BatchSubRequestSerializer`) y devuelve su
+    respuesta como diccionario. Sólo se aceptan URLs que empiecen con
+    `prefix` (las de e_commerce/api/urls.py) y no se permiten batches
+    anidados.
+    '''
+    _path = sub_request['path']
+    _response = {'status': 404, 'headers': {}, 'body': {'detail': 'Not found.'}}
+    if 'id' in sub_request:
+        _response = {'id': sub_request['id'], **_response}
+    if not _path.startswith(prefix):
+        return _response
+    try:
+        _match = resolve(_path.partition('?')[0])
+    except Resolver404:
+        return _response
+    if _match.url_name == 'batch':
+        _response.update(status=400, body={'detail': 'No se permiten batches anidados.'})
+        return _response
+    if is_compression_exempt(_match.func):
+        # La respuesta del batch incluye la del sub-request (por ejemplo,
+        # un token), así que tampoco se comprime.
+        request._request.compression_exempt = True
+
+    try:
+        _view_response = _match.func(
+            _sub_request(
+                request, sub_request['method'], _path, sub_request.get('body'),
+                _accepts_authenticator(_match.func, request.successful_authenticator)
+            ),
+            *_match.args,
+            **_match.kwargs
+        )
+        if hasattr(_view_response, 'render'):
+            _view_response.render()
+        _response.update(
+            status=_view_response.status_code,
+            headers=dict(_view_response.items()),
+            body=_content(_view_response)
+        )
+    except Exception:
+        # Un error no controlado por DRF en un sub-request sólo afecta a
+        # su respuesta, no al batch completo.
+        logger.exception('Batch sub-request failed: %s %s', sub_request['method'], _path)
+        _response.update(status=500, body={'detail': 'Error interno del servidor.'})
+    return _response
+
+
+class _ReadWorkers:
+    '''
+    Hilos que ejecutan los sub-requests de sólo lectura de un batch. Cada
+    hilo usa sus propias conexiones a la base de datos durante todo el batch
+    y las cierra una sola vez, al terminar.
+    '''
+
+    def __init__(self, size):
+        self._size = size
+        self._queue = queue.SimpleQueue()
+        self._threads = []
+
+    def _run(self):
+        try:
+            while True:
+                _item = self._queue.get()
+                if _item is None:
+                    return
+                _future, _func = _item
+                if not _future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    _future.set_result(_func())
+                except BaseException as _error:
+                    _future.set_exception(_error)
+        finally:
+            connections.close_all()
+
+    def submit(self, func):
+        if len(self._threads) < self._size:
+            _thread = threading.Thread(target=self._run, daemon=True)
+            _thread.start()
+            self._threads.append(_thread)
+        _future = Future()
+        self._queue.put((_future, func))
+        return _future
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for _thread in self._threads:
+            _thread.join()
+
+
+def dispatch_batch(request, prefix, sub_requests):
+    '''
+    Ejecuta los sub-requests en orden. Bajo ASGI los de sólo lectura
+    (GET, HEAD, OPTIONS) consecutivos se ejecutan en paralelo, con hasta
+    `E_COMMERCE_BATCH_WORKERS` hilos; un request de escritura espera a los
+    anteriores y los siguientes esperan a que termine.
+    '''
+    _workers = settings.E_COMMERCE_BATCH_WORKERS
+    if _workers <= 1 or not isinstance(request._request, ASGIRequest):
+        return [dispatch(request, prefix, _sub) for _sub in sub_requests]
+
+    _responses, _group = [], []
+    _readers = _ReadWorkers(_workers)
+
+    def _flush():
+        _futures = [
+            _readers.submit(functools.partial(dispatch, request, prefix, _sub))
+            for _sub in _group
+        ]
+        _responses.extend(_future.result() for _future in _futures)
+        _group.clear()
+
+    try:
+        for _sub in sub_requests:
+            if _sub['method'] in SAFE_METHODS:
+                _group.append(_sub)
+                continue
+            _flush()
+            _responses.append(dispatch(request, prefix, _sub))
+        _flush()
+    finally:
+        _readers.close()
+    return _responses
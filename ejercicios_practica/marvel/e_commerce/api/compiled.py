@@ -0,0 +1,227 @@
+import datetime
+import operator
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.settings import api_settings
+
+
+# NOTE: `Serializer.to_representation()` recorre los campos uno por uno y
+# para cada valor llama a `get_attribute()` y `to_representation()` del
+# campo, con sus controles genéricos. En los listados grandes ese costo por
+# campo y por fila es la mayor parte del tiempo de CPU. Acá se arma, una vez
+# por combinación de campos, un "plan" con cómo leer cada campo (el atributo
+# directamente, o la columna de `values_list()`) y sólo se llama al campo
+# cuando el valor no es del tipo nativo esperado, con el mismo resultado que
+# DRF.
+
+# Campos cuya representación es el mismo valor si ya es del tipo indicado
+# (por ejemplo `CharField.to_representation()` es `str(value)`).
+_NATIVE_TYPES = (
+    (serializers.BooleanField, bool),
+    (serializers.CharField, str),
+    (serializers.IntegerField, int),
+    (serializers.FloatField, float),
+)
+
+_SKIP = object()
+
+
+def _field_plan(field, model):
+    '''
+    Devuelve cómo leer el campo: ("attr", nombre, tipo nativo o None),
+    ("pk", nombre de la columna) o ("generic",).
+    '''
+    if len(field.source_attrs) != 1 or model is None:
+        return ('generic',)
+    try:
+        _model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return ('generic',)
+    if not _model_field.concrete or _model_field.many_to_many:
+        return ('generic',)
+
+    if _model_field.is_relation:
+        if (
+            type(field) is serializers.PrimaryKeyRelatedField
+            and field.pk_field is None
+            and _model_field.target_field.primary_key
+        ):
+            return ('pk', _model_field.attname)
+        if isinstance(field, serializers.BaseSerializer):
+            return ('attr', field.source, None)
+        return ('generic',)
+
+    for _field_class, _native in _NATIVE_TYPES:
+        if (
+            isinstance(field, _field_class)
+            and type(field).to_representation is _field_class.to_representation
+        ):
+            return ('attr', field.source, _native)
+    return ('attr', field.source, None)
+
+
+def _datetime_converter(field):
+    '''
+    `DateTimeField.to_representation()` resuelve en cada llamada el formato
+    y la zona horaria; acá se resuelven una sola vez. Los casos que no son
+    una fecha "aware" con formato ISO 8601 se delegan en el campo.
+    '''
+    _output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    _timezone = getattr(field, 'timezone', field.default_timezone())
+    if (
+        _output_format is None
+        or _output_format.lower() != ISO_8601
+        or _timezone is None
+    ):
+        return field.to_representation
+
+    def _convert(value):
+        if value.__class__ is not datetime.datetime or value.tzinfo is None:
+            return field.to_representation(value)
+        try:
+            _value = value.astimezone(_timezone).isoformat()
+        except OverflowError:
+            return field.to_representation(value)
+        if _value.endswith('+00:00'):
+            _value = _value[:-6] + 'Z'
+        return _value
+    return _convert
+
+
+def _converter(field):
+    if (
+        isinstance(field, serializers.DateTimeField)
+        and type(field).to_representation is serializers.DateTimeField.to_representation
+        and type(field).enforce_timezone is serializers.DateTimeField.enforce_timezone
+    ):
+        return _datetime_converter(field)
+    return field.to_representation
+
+
+def _generic_value(field, instance):
+    try:
+        _attribute = field.get_attribute(instance)
+    except SkipField:
+        return _SKIP
+    _check_for_none = (
+        _attribute.pk if isinstance(_attribute, PKOnlyObject) else _attribute
+    )
+    if _check_for_none is None:
+        return None
+    return field.to_representation(_attribute)
+
+
+def _build_representation(fields, plan, values=False):
+    '''
+    Arma la función `instancia -> dict` para la lista de campos `plan`.
+    Cada paso es (nombre, tipo de paso, lectura, tipo nativo, conversión):
+    la lectura es un `attrgetter` del atributo o, con `values=True`, un
+    `itemgetter` de la posición en la tupla de `values_list()` (en el orden
+    de `plan`); los campos "generic" se resuelven como en DRF.
+    '''
+    _steps = []
+    for _index, (_field, (_name, _step)) in enumerate(zip(fields, plan)):
+        if _step[0] == 'generic':
+            _steps.append((_name, 'generic', None, None, _field))
+            continue
+        _read = (
+            operator.itemgetter(_index) if values else operator.attrgetter(_step[1])
+        )
+        if _step[0] == 'pk':
+            _steps.append((_name, 'pk', _read, None, None))
+        else:
+            _steps.append((_name, 'attr', _read, _step[2], _converter(_field)))
+    _steps = tuple(_steps)
+
+    def _represent(instance):
+        _ret = {}
+        for _name, _kind, _read, _native, _convert in _steps:
+            if _kind == 'generic':
+                _value = _generic_value(_convert, instance)
+                if _value is not _SKIP:
+                    _ret[_name] = _value
+                continue
+            _value = _read(instance)
+            if _kind == 'pk' or _value is None or _value.__class__ is _native:
+                _ret[_name] = _value
+            else:
+                _ret[_name] = _convert(_value)
+        return _ret
+    return _represent
+
+
+def _compile(serializer, values):
+    _model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    _fields = [
+        _field for _field in serializer.fields.values() if not _field.write_only
+    ]
+    _plan = tuple(
+        (_field.field_name, _field_plan(_field, _model)) for _field in _fields
+    )
+    if values and any(
+        _step[0] == 'generic' or (
+            _step[0] == 'attr'
+            and _model._meta.get_field(_step[1]).is_relation
+        )
+        for _, _step in _plan
+    ):
+        return None, None
+    return _plan, _build_representation(_fields, _plan, values)
+
+
+def compile_representation(serializer):
+    '''
+    Devuelve una función `instancia -> dict` equivalente a
+    `Serializer.to_representation()` para los campos actuales del
+    serializador.
+    '''
+    return _compile(serializer, values=False)[1]
+
+
+def compile_values_representation(serializer):
+    '''
+    Igual que `compile_representation()` pero para filas de `values_list()`:
+    devuelve las columnas a pedir y la función `tupla -> dict`. Si algún
+    campo necesita la instancia (métodos, propiedades, objetos anidados)
+    devuelve `(None, None)`.
+    '''
+    _plan, _represent = _compile(serializer, values=True)
+    if _plan is None:
+        return None, None
+    return [_step[1] for _, _step in _plan], _represent
+
+
+class CompiledRepresentationMixin:
+    '''
+    Mixin para `ModelSerializer` que reemplaza la representación genérica
+    de DRF por la función de `compile_representation()`. Como se
+    ubica debajo del serializador en el MRO, los `to_representation()`
+    propios del serializador (por ejemplo el de `UserSerializer`, que quita
+    "password" e "is_active") siguen ejecutándose igual.
+    Se desactiva con `E_COMMERCE_COMPILED_SERIALIZERS = False`.
+    '''
+
+    def reset_compiled_representation(self):
+        # Llamar si se modifican los campos después de usar el serializador.
+        self.__dict__.pop('_compiled_representation', None)
+
+    # Función `tupla -> dict` para las filas de `values_list()`, la asigna
+    # `ValuesListMixin` (ver e_commerce/api/mixins.py).
+    values_representation = None
+
+    def to_representation(self, instance):
+        if instance.__class__ is tuple and self.values_representation:
+            return self.values_representation(instance)
+        if not settings.E_COMMERCE_COMPILED_SERIALIZERS or not isinstance(
+            instance, self.Meta.model
+        ):
+            return super().to_representation(instance)
+        _represent = self.__dict__.get('_compiled_representation')
+        if _represent is None:
+            _represent = self._compiled_representation = compile_representation(self)
+        return _represent(instance)
@@ -0,0 +1,402 @@
+import hashlib
+import secrets
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+
+from e_commerce.api.compiled import compile_values_representation
+from e_commerce.api.renderers import FastJSONRenderer, RenderedJSON
+from e_commerce.api.serializers import sparse_field_paths
+from e_commerce.cache import (
+    catalog_list_cache_key,
+    get_catalog_list,
+    get_comic_entry,
+    get_row_fragments,
+    set_catalog_list,
+    set_row_fragments
+)
+
+
+def _make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def conditional_response(request, etag, last_modified, build_response):
+    '''
+    GET condicional: si los headers "If-None-Match" / "If-Modified-Since"
+    del request coinciden con el ETag / Last-Modified actuales se responde
+    304 sin llamar a `build_response()`, es decir, sin consultar la base de
+    datos ni serializar. En caso contrario se agregan ambos headers a la
+    respuesta.
+    '''
+    _last_modified = int(last_modified)
+    _response = get_conditional_response(
+        request, etag=etag, last_modified=_last_modified
+    )
+    if _response is None:
+        _response = build_response()
+    _response['ETag'] = etag
+    _response['Last-Modified'] = http_date(_last_modified)
+    return _response
+
+
+class CachedComicRetrieveMixin:
+    '''
+    Mixin para las vistas de detalle de comics (`RetrieveAPIView`): el comic
+    serializado se lee de la caché y sólo se consulta la base de datos si no
+    está. La caché se invalida desde `e_commerce/signals.py`.
+    La respuesta incluye ETag y Last-Modified según el "updated_at" del comic.
+    '''
+
+    def retrieve(self, request, *args, **kwargs):
+        # Con "?fields=" / "?exclude=" la respuesta no es la cacheada.
+        if request.query_params.get('fields') or request.query_params.get('exclude'):
+            return super().retrieve(request, *args, **kwargs)
+        _lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+
+        def _load():
+            _instance = self.get_object()
+            return _instance, self.get_serializer(_instance).data
+
+        _entry = get_comic_entry(
+            self.lookup_field, self.kwargs[_lookup_url_kwarg], _load
+        )
+
+        def _build_response():
+            return Response(data=_entry['data'], status=status.HTTP_200_OK)
+
+        # La UI navegable de DRF incluye datos del usuario logueado, por eso
+        # no se le agregan validadores.
+        if request.accepted_renderer.format == 'api':
+            return _build_response()
+        return conditional_response(
+            request,
+            _make_etag(
+                _entry['marvel_id'],
+                _entry['updated_at'],
+                request.accepted_media_type
+            ),
+            _entry['updated_at'],
+            _build_response
+        )
+
+
+def _catalog_list_response(request, key, build_response):
+    '''
+    Resuelve el GET condicional y, si hace falta responder el listado, lo
+    devuelve desde la caché o llama a `build_response()`.
+    '''
+    def _cached_response():
+        _cached = get_catalog_list(key)
+        if _cached is None:
+            return build_response()
+        _content_type, _content = _cached
+        return HttpResponse(_content, content_type=_content_type)
+
+    _, _last_modified = request.catalog_state
+    return conditional_response(
+        request, _make_etag(key), _last_modified, _cached_response
+    )
+
+
+def catalog_list_response(request, build_data, renderer_context=None):
+    '''
+    Devuelve un listado del catálogo de comics cacheado ya renderizado (en
+    bytes). Si está en caché se responde directamente, sin consultar la base
+    de datos ni ejecutar el serializador; si no, se llama a `build_data()`,
+    se renderiza con el renderer negociado y se guarda.
+    El ETag se calcula a partir de la misma clave (versión del catálogo y
+    query-params), así que un request condicional se resuelve con un 304
+    antes de buscar el listado.
+    La UI navegable de DRF ("api") no se cachea porque incluye datos del
+    usuario logueado.
+    '''
+    _renderer = request.accepted_renderer
+    if request.method != 'GET' or _renderer.format == 'api':
+        return Response(data=build_data(), status=status.HTTP_200_OK)
+
+    _key = catalog_list_cache_key(request)
+
+    def _build_response():
+        _content_type = request.accepted_media_type
+        if _renderer.charset:
+            _content_type = f'{_content_type}; charset={_renderer.charset}'
+        _content = _renderer.render(
+            build_data(),
+            request.accepted_media_type,
+            renderer_context or {'request': request}
+        )
+        set_catalog_list(_key, _content_type, _content)
+        return HttpResponse(_content, content_type=_content_type)
+
+    return _catalog_list_response(request, _key, _build_response)
+
+
+def _cache_streamed_content(key, content_type, chunks):
+    '''
+    Devuelve los mismos `chunks` y, si el contenido completo no supera
+    `E_COMMERCE_CATALOG_LIST_CACHE_MAX_BYTES`, lo guarda en la caché al
+    terminar. Si el listado es más grande se deja de acumular, para que la
+    memoria usada no dependa del tamaño del catálogo.
+    '''
+    _parts, _size = [], 0
+    for _chunk in chunks:
+        if _parts is not None:
+            _size += len(_chunk)
+            if _size > settings.E_COMMERCE_CATALOG_LIST_CACHE_MAX_BYTES:
+                _parts = None
+            else:
+                _parts.append(_chunk)
+        yield _chunk
+    if _parts is not None:
+        set_catalog_list(key, content_type, b''.join(_parts))
+
+
+def streaming_catalog_list_response(request, stream_content, content_type):
+    '''
+    Igual que `catalog_list_response()` pero el listado se envía en partes
+    con un `StreamingHttpResponse`: `stream_content()` debe devolver un
+    iterador de bytes.
+    '''
+    _key = catalog_list_cache_key(request)
+
+    def _build_response():
+        return StreamingHttpResponse(
+            _cache_streamed_content(_key, content_type, stream_content()),
+            content_type=content_type
+        )
+
+    return _catalog_list_response(request, _key, _build_response)
+
+
+class CachedCatalogListMixin:
+    '''
+    Mixin para las vistas que listan el catálogo de comics (`ListAPIView`).
+    Las páginas se cachean por versión del catálogo y query-params, ver
+    `catalog_list_response()`.
+    '''
+
+    def list(self, request, *args, **kwargs):
+        _list = super().list
+        return catalog_list_response(
+            request,
+            lambda: _list(request, *args, **kwargs).data,
+            self.get_renderer_context()
+        )
+
+
+def _serializer_columns(serializer, model, prefix=''):
+    '''
+    Recorre los campos (ya filtrados) del serializador y devuelve las
+    columnas a cargar con `.only()` y las relaciones a traer con
+    `select_related()`. Si algún campo no corresponde directamente a una
+    columna (métodos, propiedades, "source='*'", etc.) devuelve `None` en
+    lugar de las columnas, porque no podemos saber qué necesita.
+    '''
+    _only, _related = [], []
+    for _field in serializer.fields.values():
+        if _field.write_only:
+            continue
+        try:
+            _model_field = model._meta.get_field(_field.source)
+        except FieldDoesNotExist:
+            return None, _related
+        if not _model_field.concrete or _model_field.many_to_many:
+            return None, _related
+        _only.append(f'{prefix}{_field.source}')
+        if isinstance(_field, BaseSerializer) and _model_field.is_relation:
+            _path = f'{prefix}{_field.source}'
+            _nested_only, _nested_related = _serializer_columns(
+                _field, _model_field.related_model, f'{_path}__'
+            )
+            _related += [_path, *_nested_related]
+            if _nested_only is None:
+                return None, _related
+            _only += _nested_only
+    return _only, _related
+
+
+def sparse_queryset(queryset, serializer):
+    '''
+    Trae en la misma query las relaciones que el serializador muestra
+    anidadas (por ejemplo las pedidas con "?expand=") con `select_related()`
+    y, si el request pidió campos con "?fields=" / "?exclude=", limita el
+    queryset a las columnas que se usan (`.only()`).
+    '''
+    _only, _related = _serializer_columns(serializer, queryset.model)
+    if _related:
+        queryset = queryset.select_related(*_related)
+    _context = serializer.context
+    if _only is not None and (
+        sparse_field_paths(_context, 'fields')
+        or sparse_field_paths(_context, 'exclude')
+    ):
+        queryset = queryset.only(*_only)
+    return queryset
+
+
+class SparseFieldsQuerysetMixin:
+    '''
+    Mixin para las vistas genéricas cuyos serializadores usan
+    `SparseFieldsMixin`: además de achicar la respuesta, sólo se consultan
+    las columnas pedidas y las relaciones anidadas se traen con un join.
+    Ver `sparse_queryset()`.
+    '''
+
+    def filter_queryset(self, queryset):
+        return sparse_queryset(
+            super().filter_queryset(queryset), self.get_serializer()
+        )
+
+
+class ValuesListMixin:
+    '''
+    Mixin para los listados (`ListModelMixin`) cuyos serializadores usan
+    `CompiledRepresentationMixin`: si todos los campos a mostrar son columnas
+    del modelo, el listado se consulta con `values_list()` y cada tupla se
+    convierte directamente en el diccionario de salida, sin crear las
+    instancias del modelo. Si algún campo necesita la instancia (métodos,
+    propiedades, relaciones anidadas) se usa el listado normal.
+    Los `to_representation()` propios del serializador se siguen ejecutando
+    con el diccionario ya armado, así que no deben leer otros atributos de la
+    instancia.
+    '''
+
+    def get_values_plan(self, serializer):
+        '''
+        Columnas a pedir con `values_list()` y la función `tupla -> dict`
+        para `serializer`, o `(None, None)` si hay que usar instancias.
+        '''
+        if not settings.E_COMMERCE_COMPILED_SERIALIZERS:
+            return None, None
+        return compile_values_representation(serializer)
+
+    def list(self, request, *args, **kwargs):
+        _columns, _represent = self.get_values_plan(self.get_serializer())
+        if _columns is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*_columns)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(
+            queryset if page is None else page, many=True
+        )
+        serializer.child.values_representation = _represent
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+
+# Marca que ocupa el lugar de "results" al codificar el resto de la página;
+# es aleatoria para que no pueda aparecer en "next" / "previous".
+_RESULTS_PLACEHOLDER = f'e_commerce:results:{secrets.token_hex(16)}'
+
+
+class RowFragmentCacheMixin:
+    '''
+    Mixin para los listados de comics: guarda en caché el JSON ya codificado
+    de cada fila con su versión ("updated_at") en la clave, ver
+    `get_row_fragments()`. Cada página se arma con los pk y versiones de sus
+    filas (una query chica), los fragmentos se buscan en una sola consulta a
+    la caché y sólo se serializan las filas que falten o hayan cambiado.
+    Se usa sólo con `FastJSONRenderer` sin indentar y sin "?fields=" /
+    "?exclude="; en otro caso (MessagePack, la UI navegable, etc.) se arma
+    el listado normal.
+    '''
+    fragment_version_field = 'updated_at'
+
+    def _use_row_fragments(self, request):
+        _renderer = request.accepted_renderer
+        return (
+            request.method == 'GET'
+            and isinstance(_renderer, FastJSONRenderer)
+            and not _renderer.ensure_ascii
+            and _renderer.get_indent(
+                request.accepted_media_type, self.get_renderer_context()
+            ) is None
+            and not request.query_params.get('fields')
+            and not request.query_params.get('exclude')
+        )
+
+    def _fragment_label(self, model, serializer):
+        # Los campos del serializador forman parte de la clave, así al
+        # cambiarlos no se sirven fragmentos armados con los anteriores.
+        _schema = hashlib.md5(repr([
+            (_name, type(_field).__name__, _field.source)
+            for _name, _field in serializer.fields.items()
+        ]).encode()).hexdigest()[:12]
+        return f'{model._meta.label_lower}:{type(serializer).__name__}:{_schema}'
+
+    def _serialize_missing(self, queryset, serializer, pks):
+        '''
+        Devuelve pares (pk, versión, datos) de las filas indicadas. Si la
+        vista usa `ValuesListMixin` se leen con `values_list()`, sin crear
+        las instancias.
+        '''
+        _columns = _represent = None
+        if isinstance(self, ValuesListMixin):
+            _columns, _represent = self.get_values_plan(serializer)
+        _version_field = self.fragment_version_field
+        if _columns is None:
+            for _instance in queryset.filter(pk__in=pks):
+                yield (
+                    _instance.pk,
+                    getattr(_instance, _version_field),
+                    serializer.to_representation(_instance)
+                )
+            return
+        serializer.values_representation = _represent
+        for _row in queryset.filter(pk__in=pks).values_list(
+            'pk', _version_field, *_columns
+        ):
+            yield _row[0], _row[1], serializer.to_representation(_row[2:])
+
+    def _row_fragments(self, queryset, rows):
+        _serializer = self.get_serializer()
+        _label = self._fragment_label(queryset.model, _serializer)
+        _fragments = get_row_fragments(_label, rows)
+        _missing = [_pk for _pk, _ in rows if _pk not in _fragments]
+        if _missing:
+            _render = self.request.accepted_renderer.render
+            _new = {}
+            for _pk, _version, _data in self._serialize_missing(
+                queryset, _serializer, _missing
+            ):
+                _fragment = _fragments[_pk] = _render(_data)
+                _new[(_pk, _version.timestamp())] = _fragment
+            set_row_fragments(_label, _new)
+        # Si una fila se borró entre ambas queries simplemente se omite.
+        return [_fragments[_pk] for _pk, _ in rows if _pk in _fragments]
+
+    def list(self, request, *args, **kwargs):
+        if not self._use_row_fragments(request):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        _versions = queryset.values_list('pk', self.fragment_version_field)
+        _page = self.paginate_queryset(_versions)
+        _rows = [
+            (_pk, _version.timestamp())
+            for _pk, _version in (_versions if _page is None else _page)
+        ]
+        _results = b'[' + b','.join(self._row_fragments(queryset, _rows)) + b']'
+        if _page is None:
+            return Response(RenderedJSON(_results))
+
+        # Los demás datos de la página ("count", "next", etc.) se codifican
+        # normalmente con una marca en lugar de "results", que después se
+        # reemplaza por los fragmentos.
+        _render = request.accepted_renderer.render
+        _response = self.get_paginated_response(_RESULTS_PLACEHOLDER)
+        _before, _placeholder, _after = _render(_response.data).rpartition(
+            _render(_RESULTS_PLACEHOLDER)
+        )
+        _response.data = RenderedJSON(_before + _results + _after)
+        return _response
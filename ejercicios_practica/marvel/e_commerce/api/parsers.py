@@ -0,0 +1,42 @@
+import msgpack
+import orjson
+
+from django.conf import settings
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from e_commerce.api.renderers import FastJSONRenderer, MessagePackRenderer
+
+
+class FastJSONParser(JSONParser):
+    '''
+    Reemplazo de `JSONParser` que decodifica con orjson. orjson sólo acepta
+    UTF-8, para otras codificaciones se usa el parser estándar.
+    '''
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        _encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        if _encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackParser(BaseParser):
+    '''
+    Parser para requests con "Content-Type: application/msgpack".
+    '''
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
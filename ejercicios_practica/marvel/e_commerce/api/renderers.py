@@ -0,0 +1,82 @@
+import msgpack
+import orjson
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# NOTE: orjson ya serializa los tipos básicos (y sus subclases, como
+# `ReturnDict`/`ReturnList` de DRF). El resto (Decimal, fechas, UUID, textos
+# traducibles, querysets, etc.) se delega en el encoder de DRF para que la
+# salida sea idéntica a la de `JSONRenderer`.
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+_drf_default = JSONEncoder().default
+
+
+def orjson_dumps(data):
+    return orjson.dumps(data, default=_drf_default, option=_ORJSON_OPTIONS)
+
+
+class RenderedJSON(bytes):
+    '''
+    Contenido JSON ya codificado: `FastJSONRenderer` lo devuelve tal cual.
+    '''
+
+
+class FastJSONRenderer(JSONRenderer):
+    '''
+    Reemplazo de `JSONRenderer` que codifica con orjson. Se usa el renderer
+    estándar si se pide salida indentada ("application/json; indent=4", la
+    UI navegable), con ASCII escapado (UNICODE_JSON = False), con espacios
+    (COMPACT_JSON = False) o con NaN e Infinity (STRICT_JSON = False), y
+    para los enteros de más de 64 bits, que orjson no codifica.
+    A diferencia de DRF, con STRICT_JSON = True un float NaN o infinito se
+    codifica como `null` en lugar de lanzar un ValueError.
+    '''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, RenderedJSON):
+            return bytes(data)
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            _content = orjson_dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Igual que DRF, escapamos U+2028 y U+2029 para que el JSON también
+        # sea JavaScript válido.
+        if b'\xe2\x80\xa8' in _content or b'\xe2\x80\xa9' in _content:
+            _content = _content.replace(
+                b'\xe2\x80\xa8', b'\\u2028'
+            ).replace(b'\xe2\x80\xa9', b'\\u2029')
+        return _content
+
+
+class MessagePackRenderer(BaseRenderer):
+    '''
+    Renderer MessagePack ("Accept: application/msgpack") para los servicios
+    internos: ocupa menos que JSON y es más barato de codificar y decodificar.
+    Los tipos que no son nativos de MessagePack se convierten igual que en
+    JSON (fechas en texto ISO 8601, Decimal a float, etc.).
+    '''
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_drf_default, use_bin_type=True)
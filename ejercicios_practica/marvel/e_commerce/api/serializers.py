@@ -7,13 +7,76 @@ from django.core.exceptions import ValidationError as DjangoValidationError
 
 # Luego importamos todos los serializadores de django rest framework.
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.authtoken.models import Token
 
 # Primero importamos los modelos que queremos serializar:
+from e_commerce.api.compiled import CompiledRepresentationMixin
 from e_commerce.models import Comic, WishList
 
 
-class ComicSerializer(serializers.ModelSerializer):
+def is_read_request(context):
+    _request = context.get('request')
+    return _request is not None and _request.method in SAFE_METHODS
+
+
+def sparse_field_paths(context, param):
+    '''
+    Devuelve los campos pedidos en el query-param `param` ("fields" o
+    "exclude") del request de lectura que está en el contexto, por ejemplo
+    "?fields=id,comic.title" -> ('id', 'comic.title').
+    '''
+    if not is_read_request(context):
+        return ()
+    _value = context['request'].query_params.get(param, '')
+    return tuple(_path.strip() for _path in _value.split(',') if _path.strip())
+
+
+class SparseFieldsMixin:
+    '''
+    Permite que el cliente elija los campos de la respuesta:
+    - "?fields=marvel_id,title" devuelve sólo esos campos.
+    - "?exclude=description" devuelve todos menos esos.
+    En los serializadores anidados se usa la ruta del campo, por ejemplo
+    "?fields=id,comic.title" o "?exclude=user.email".
+    Sólo aplica a los requests de lectura (GET / HEAD / OPTIONS).
+    '''
+
+    def _field_path(self):
+        _parts, _node = [], self
+        while _node.parent is not None:
+            if _node.field_name:
+                _parts.append(_node.field_name)
+            _node = _node.parent
+        return '.'.join(reversed(_parts))
+
+    def _relative_paths(self, param):
+        _prefix = self._field_path()
+        _paths = sparse_field_paths(self.context, param)
+        if not _prefix:
+            return _paths
+        return tuple(
+            _path[len(_prefix) + 1:] for _path in _paths
+            if _path.startswith(f'{_prefix}.')
+        )
+
+    def get_fields(self):
+        _fields = super().get_fields()
+        _include = self._relative_paths('fields')
+        if _include:
+            _keep = {_path.split('.')[0] for _path in _include}
+            for _name in list(_fields):
+                if _name not in _keep:
+                    _fields.pop(_name)
+        for _path in self._relative_paths('exclude'):
+            if '.' not in _path:
+                _fields.pop(_path, None)
+        return _fields
+
+
+class ComicSerializer(
+    SparseFieldsMixin, CompiledRepresentationMixin, serializers.ModelSerializer
+):
     # new_field =  serializers.SerializerMethodField()
     
     class Meta:
@@ -38,7 +101,22 @@ class UserLoginSerializer(serializers.Serializer):
         fields = ('username', 'password')
 
 
-class UserSerializer(serializers.ModelSerializer):
+class BatchSubRequestSerializer(serializers.Serializer):
+    '''
+    Cada uno de los requests de e-commerce/api/batch/. "id" es opcional y se
+    devuelve tal cual en la respuesta correspondiente.
+    '''
+    id = serializers.CharField(required=False)
+    method = serializers.ChoiceField(
+        choices=('GET', 'POST', 'PUT', 'PATCH', 'DELETE'), default='GET'
+    )
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+
+class UserSerializer(
+    SparseFieldsMixin, CompiledRepresentationMixin, serializers.ModelSerializer
+):
     class Meta:
         model = User
         # fields = '__all__'
@@ -103,8 +181,9 @@ class UserSerializer(serializers.ModelSerializer):
         
         # NOTE: Descomentar, realizar una petición GET
         # y observar que sucede.
-        data.pop('password')
-        data.pop('is_active')
+        # (Pueden no estar si se eligieron los campos con "?fields=").
+        data.pop('password', None)
+        data.pop('is_active', None)
         return data
 
 
@@ -216,12 +295,61 @@ class UpdatePasswordUserSerializer(serializers.ModelSerializer):
 
 
 # TODO: Realizar el serializador para el modelo de WishList
-class WishListSerializer(serializers.ModelSerializer):
+def expanded_fields(context):
+    '''
+    Campos relacionados que se piden anidados con "?expand=user,comic" (o
+    con la clave "expand" del contexto, al usar el serializador a mano).
+    '''
+    if 'expand' in context:
+        return set(context['expand'])
+    _request = context.get('request')
+    if _request is None:
+        return set()
+    _value = _request.query_params.get('expand', '')
+    return {_name.strip() for _name in _value.split(',') if _name.strip()}
+
+
+class WishListSerializer(
+    SparseFieldsMixin, CompiledRepresentationMixin, serializers.ModelSerializer
+):
+    '''
+    Por defecto "user" y "comic" se devuelven como IDs (y así se reciben al
+    escribir). Con "?expand=user", "?expand=comic" o ambos se devuelven
+    los objetos completos.
+    '''
+    expandable_fields = {'user': UserSerializer, 'comic': ComicSerializer}
+
+    def _expanded_names(self, fields):
+        return (
+            expanded_fields(self.context)
+            & self.expandable_fields.keys()
+            & fields.keys()
+        )
+
+    def get_fields(self):
+        # NOTE: En las lecturas declaramos los campos expandidos desde el
+        # principio, así las vistas pueden ver qué relaciones se necesitan
+        # (`select_related()` / `.only()`).
+        _fields = super().get_fields()
+        # (Al generar el esquema de Swagger se documentan los IDs de entrada.)
+        _view = self.context.get('view')
+        if is_read_request(self.context) and not getattr(
+            _view, 'swagger_fake_view', False
+        ):
+            for _name in self._expanded_names(_fields):
+                _fields[_name] = self.expandable_fields[_name](read_only=True)
+        return _fields
 
     def to_representation(self, instance):
-        self.fields['user'] = UserSerializer()
-        self.fields['comic'] = ComicSerializer()
+        # En las escrituras los campos reciben IDs; si se pidió expandirlos
+        # la respuesta igualmente los muestra anidados.
+        for _name in self._expanded_names(self.fields):
+            _serializer_class = self.expandable_fields[_name]
+            if not isinstance(self.fields[_name], _serializer_class):
+                self.fields[_name] = _serializer_class()
+                self.reset_compiled_representation()
         return super().to_representation(instance)
+
     class Meta:
         model = WishList
         fields = (
@@ -234,3 +362,25 @@ class WishListSerializer(serializers.ModelSerializer):
             'bought_qty'
         )
         read_only_fields = ('id',)
+
+
+class UserWishListSerializer(
+    SparseFieldsMixin, CompiledRepresentationMixin, serializers.ModelSerializer
+):
+    '''
+    Serializador para la lista de deseos del usuario autenticado. Como el
+    usuario ya es conocido no se incluye, y sólo se anida el comic.
+    '''
+    comic = ComicSerializer(read_only=True)
+
+    class Meta:
+        model = WishList
+        fields = (
+            'id',
+            'comic',
+            'favorite',
+            'cart',
+            'wished_qty',
+            'bought_qty'
+        )
+        read_only_fields = fields
@@ -1,5 +1,4 @@
 from django.urls import path, include
-from e_commerce.marvel_views import *
 
 # Importamos las API_VIEWS:
 from e_commerce.api.views import *
@@ -18,6 +17,7 @@ urlpatterns = [
         'comics/comic/<int:marvel_id>/',
         GetOneMarvelComicAPIView.as_view()
     ),
+    path('comics/batch/', ComicBatchAPIView.as_view(), name='comic_batch'),
     path('comics/create/', PostComicAPIView.as_view()),
     path('comics/list-create/', ListCreateComicAPIView.as_view()),
     path('comics/update/<int:marvel_id>/', UpdateComicAPIView.as_view()),
@@ -28,6 +28,12 @@ urlpatterns = [
     path('comics/delete/<int:pk>/', DestroyComicAPIView.as_view()),
     
     path('comics/user/<str:username>/', ComicUserAPIView.as_view(), name='comic_list_user'),
+    # Feed de cambios:
+    path('changes/', ChangesAPIView.as_view(), name='changes'),
+    # Exportación de tablas completas (NDJSON / CSV):
+    path('export/<str:table>/', ExportAPIView.as_view(), name='export'),
+    # Varios requests a esta API en uno solo:
+    path('batch/', BatchAPIView.as_view(), name='batch'),
     # User API Viewsets:
     path('users/', include('e_commerce.api.routers')),
 ]
@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db.models import Subquery
 from django.forms.models import model_to_dict
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.authentication import TokenAuthentication, BasicAuthentication
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
 # (GET - ListAPIView) Listar todos los elementos en la entidad:
 # (POST - CreateAPIView) Inserta elementos en la DB
 # (GET - RetrieveAPIView) Devuelve un solo elemento de la entidad.
@@ -26,12 +30,12 @@ from rest_framework.response import Response
 from rest_framework.validators import ValidationError
 from rest_framework.views import APIView
 
-# NOTE: Importamos este decorador para poder customizar los 
-# parámetros y responses en Swagger, para aquellas
-# vistas de API basadas en funciones y basadas en Clases 
-# que no tengan definido por defecto los métodos HTTP.
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
+# NOTE: Para customizar los parámetros y responses en Swagger, en aquellas
+# vistas de API basadas en funciones y basadas en Clases que no tengan
+# definido por defecto los métodos HTTP, se usa el decorador
+# `swagger_auto_schema` de `drf_yasg.utils` (y `drf_yasg.openapi`).
+# No se importan acá mientras no se usen: drf-yasg es pesado de importar y
+# este módulo se carga al arrancar cada worker.
 
 # Librería para manejar filtrado:
 from django_filters.rest_framework import DjangoFilterBackend
@@ -43,8 +47,27 @@ from rest_framework.pagination import (
     PageNumberPagination
 )
 
+from e_commerce.api.batch import dispatch_batch
+from e_commerce.api.mixins import (
+    CachedCatalogListMixin,
+    CachedComicRetrieveMixin,
+    RowFragmentCacheMixin,
+    SparseFieldsQuerysetMixin,
+    ValuesListMixin,
+    catalog_list_response,
+    streaming_catalog_list_response
+)
+from e_commerce.api.renderers import FastJSONRenderer, MessagePackRenderer
 from e_commerce.api.serializers import *
-from e_commerce.models import Comic
+from e_commerce.cache import get_comic_entries, get_wishlist_comic_ids
+from e_commerce.changes import (
+    CHANGES_RESOURCES,
+    ExpiredCursor,
+    InvalidCursor,
+    get_changes
+)
+from e_commerce.exports import EXPORT_FORMATS, EXPORT_TABLES, iter_export
+from e_commerce.models import Comic, User, WishList
 
 
 mensaje_headder = '''
@@ -63,11 +86,53 @@ headers = {
 ```
 '''
 
+# NOTE: Columnas que devuelve `comic_list_api_view`, en el mismo orden
+# que las devolvería `Comic.objects.values()`.
+COMIC_LIST_FIELDS = tuple(
+    _field.attname for _field in Comic._meta.concrete_fields
+)
+
+
+def stream_comic_list(chunk_size):
+    '''
+    Genera el listado de comics como un array JSON en partes: se recorre
+    una única query con `.iterator()` (cursor del lado del servidor en
+    Postgres) y cada bloque de `chunk_size` filas se codifica y se envía,
+    por lo que la memoria usada no depende del tamaño de la tabla.
+    '''
+    _renderer = FastJSONRenderer()
+    _rows = Comic.objects.order_by('id').values_list(
+        *COMIC_LIST_FIELDS
+    ).iterator(chunk_size=chunk_size)
+    _separator = b'['
+    _chunk = []
+    for _row in _rows:
+        _chunk.append(dict(zip(COMIC_LIST_FIELDS, _row)))
+        if len(_chunk) == chunk_size:
+            yield _separator + _renderer.render(_chunk)[1:-1]
+            _separator = b','
+            _chunk = []
+    if _chunk:
+        yield _separator + _renderer.render(_chunk)[1:-1]
+        _separator = b','
+    yield b']' if _separator == b',' else b'[]'
+
+
 @api_view(http_method_names=['GET'])
+@renderer_classes([FastJSONRenderer, MessagePackRenderer])
 def comic_list_api_view(request):
-    _queryset = Comic.objects.all()
-    _data = list(_queryset.values()) if _queryset.exists() else []
-    return Response(data=_data, status=status.HTTP_200_OK)
+    # NOTE: Sólo el JSON se envía en partes; con "Accept: application/msgpack"
+    # el listado se arma completo y se renderiza con `MessagePackRenderer`.
+    if request.accepted_renderer.format == MessagePackRenderer.format:
+        return catalog_list_response(
+            request,
+            lambda: list(Comic.objects.order_by('id').values(*COMIC_LIST_FIELDS))
+        )
+    return streaming_catalog_list_response(
+        request,
+        lambda: stream_comic_list(settings.E_COMMERCE_STREAM_CHUNK_SIZE),
+        content_type='application/json'
+    )
 
 
 @api_view(http_method_names=['GET'])
@@ -104,13 +169,22 @@ def comic_create_api_view(request):
     )
 
 
-class GetComicAPIView(ListAPIView):
+class GetComicAPIView(
+    CachedCatalogListMixin,
+    SparseFieldsQuerysetMixin,
+    RowFragmentCacheMixin,
+    ValuesListMixin,
+    ListAPIView
+):
     __doc__ = f'''{mensaje_headder}
     `[METODO GET]`
     Esta vista de API nos devuelve una lista de todos los comics presentes 
-    en la base de datos.
+    en la base de datos. Los listados se guardan en caché hasta que cambia
+    el catálogo.
     '''
-    queryset = Comic.objects.all()
+    # NOTE: Ordenamos para que el paginado (y por ende las páginas
+    # cacheadas) sea consistente.
+    queryset = Comic.objects.all().order_by('id')
     serializer_class = ComicSerializer
     permission_classes = (AllowAny,)
 
@@ -126,7 +200,12 @@ class PostComicAPIView(CreateAPIView):
     permission_classes = (AllowAny,)
 
 
-class ListCreateComicAPIView(ListCreateAPIView):
+class ListCreateComicAPIView(
+    CachedCatalogListMixin,
+    SparseFieldsQuerysetMixin,
+    RowFragmentCacheMixin,
+    ListCreateAPIView
+):
     __doc__ = f'''{mensaje_headder}
     `[METODO GET-POST]`
     Esta vista de API nos devuelve una lista de todos los comics presentes 
@@ -138,7 +217,7 @@ class ListCreateComicAPIView(ListCreateAPIView):
     permission_classes = (IsAuthenticated & IsAdminUser,)
 
 
-class RetrieveUpdateComicAPIView(RetrieveUpdateAPIView):
+class RetrieveUpdateComicAPIView(CachedComicRetrieveMixin, SparseFieldsQuerysetMixin, RetrieveUpdateAPIView):
     __doc__ = f'''{mensaje_headder}
     `[METODO GET-PUT-PATCH]`
     Esta vista de API nos permite actualizar un registro,
@@ -199,10 +278,11 @@ class DestroyComicAPIView(DestroyAPIView):
 #     queryset = Comic.objects.all()
 
 
-class GetOneComicAPIView(RetrieveAPIView):
+class GetOneComicAPIView(CachedComicRetrieveMixin, SparseFieldsQuerysetMixin, RetrieveAPIView):
     __doc__ = f'''{mensaje_headder}
     `[METODO GET]`
     Esta vista de API nos devuelve un comic en particular de la base de datos.
+    El comic serializado se guarda en caché.
     '''
     serializer_class = ComicSerializer
     permission_classes = (IsAuthenticated | IsAdminUser,)
@@ -220,11 +300,12 @@ class GetOneComicAPIView(RetrieveAPIView):
         return queryset
 
 
-class GetOneMarvelComicAPIView(RetrieveAPIView):
+class GetOneMarvelComicAPIView(CachedComicRetrieveMixin, SparseFieldsQuerysetMixin, RetrieveAPIView):
     __doc__ = f'''{mensaje_headder}
     `[METODO GET]`
     Esta vista de API nos devuelve un comic en particular de la base de datos
     a partir del valor del campo "marvel_id" pasado por URL.
+    El comic serializado se guarda en caché.
     '''
     serializer_class = ComicSerializer
     permission_classes = (IsAuthenticated | IsAdminUser,)
@@ -274,6 +355,59 @@ class GetOneMarvelComicAPIView(RetrieveAPIView):
 #         )
 
 
+class ComicBatchAPIView(APIView):
+    __doc__ = f'''{mensaje_headder}
+    `[METODO GET]`
+    Devuelve varios comics en un solo request, por ID ("?ids=1,2,3") o por
+    "marvel_id" ("?marvel_ids=..."), en el mismo orden en que se pidieron.
+    Los comics que están en caché no se consultan y el resto se trae con
+    una sola query. Los que no existen se informan en "missing".
+    '''
+    permission_classes = (IsAuthenticated | IsAdminUser,)
+    _LOOKUPS = {'ids': 'pk', 'marvel_ids': 'marvel_id'}
+
+    def _requested(self, request):
+        _params = [_name for _name in self._LOOKUPS if request.query_params.get(_name)]
+        if len(_params) != 1:
+            raise ValidationError(
+                {'detail': 'Indique "ids" o "marvel_ids" (sólo uno de ellos).'}
+            )
+        _param = _params[0]
+        try:
+            # Sin repetidos, respetando el orden.
+            _values = list(dict.fromkeys(
+                int(_value) for _value in request.query_params[_param].split(',')
+            ))
+        except ValueError:
+            raise ValidationError({_param: 'Deben ser números enteros separados por comas.'})
+        if len(_values) > settings.E_COMMERCE_COMIC_BATCH_MAX_IDS:
+            raise ValidationError({
+                _param: f'Se pueden pedir hasta '
+                        f'{settings.E_COMMERCE_COMIC_BATCH_MAX_IDS} comics.'
+            })
+        return self._LOOKUPS[_param], _values
+
+    def get(self, request):
+        _lookup_field, _values = self._requested(request)
+
+        def _load(values):
+            return [
+                (_instance, ComicSerializer(_instance).data)
+                for _instance in Comic.objects.filter(**{f'{_lookup_field}__in': values})
+            ]
+
+        _entries = get_comic_entries(_lookup_field, _values, _load)
+        return Response(
+            data={
+                'results': [
+                    _entries[_value]['data'] for _value in _values if _value in _entries
+                ],
+                'missing': [_value for _value in _values if _value not in _entries],
+            },
+            status=status.HTTP_200_OK
+        )
+
+
 class LoginUserAPIView(APIView):
     '''
     ```
@@ -297,6 +431,9 @@ class LoginUserAPIView(APIView):
     '''
     authentication_classes = ()
     permission_classes = ()
+    # NOTE: La respuesta contiene el token, no se comprime
+    # (ver e_commerce/middleware.py).
+    compression_exempt = True
 
     # NOTE: Agregamos todo esto para personalizar
     # el body de la request y los responses
@@ -334,9 +471,172 @@ class LoginUserAPIView(APIView):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-class ComicUserAPIView(ListAPIView):
+class ComicUserAPIView(
+    SparseFieldsQuerysetMixin, RowFragmentCacheMixin, ValuesListMixin, ListAPIView
+):
+    __doc__ = f'''{mensaje_headder}
+    `[METODO GET]`
+    Esta vista de API nos devuelve los comics que el usuario indicado en la
+    URL tiene en su wish-list, ordenados por "title".
+    '''
     serializer_class = ComicSerializer
     pagination_class = PageNumberPagination
     queryset = Comic.objects.all().order_by('title')
     filter_backends = [SearchFilter]
     search_fields = ['title', 'description']
+
+    def get_queryset(self):
+        '''
+        Los IDs de los comics de la wish-list se obtienen de la caché (se
+        invalida cada vez que cambia la wish-list del usuario), así la
+        query final es un simple `IN` sobre la clave primaria. Con más de
+        `E_COMMERCE_WISHLIST_IDS_MAX_IN` IDs se usa una subconsulta sobre el
+        índice (user, comic), para no superar el límite de parámetros de la
+        base de datos.
+        '''
+        _user_id = get_object_or_404(
+            User.objects.only('id'), username=self.kwargs['username']
+        ).id
+        _ids = get_wishlist_comic_ids(_user_id)
+        if len(_ids) > settings.E_COMMERCE_WISHLIST_IDS_MAX_IN:
+            _ids = Subquery(
+                WishList.objects.filter(user_id=_user_id).values('comic_id')
+            )
+        return self.queryset.filter(id__in=_ids)
+
+
+class ChangesAPIView(APIView):
+    __doc__ = f'''{mensaje_headder}
+    `[METODO GET]`
+    Feed de cambios para sincronizar réplicas. Devuelve, en orden, las filas
+    creadas o modificadas ("upsert") y las eliminadas ("delete") del recurso
+    indicado después del cursor recibido.
+
+    Query-params:
+    - resource: "comics" (por defecto) o "wishlists".
+    - since: valor de "next" de la respuesta anterior. Si se omite se
+      devuelven los cambios desde el principio. Un cursor de hace más de
+      `E_COMMERCE_CHANGES_RETENTION_DAYS` días ya no es válido.
+    - limit: cantidad máxima de eventos (por defecto 100).
+    '''
+    permission_classes = (IsAuthenticated & IsAdminUser,)
+
+    def get(self, request):
+        _resource = request.query_params.get('resource', 'comics')
+        if _resource not in CHANGES_RESOURCES:
+            raise ValidationError(
+                {'resource': f'Debe ser uno de: {", ".join(CHANGES_RESOURCES)}.'}
+            )
+        try:
+            _limit = int(request.query_params.get('limit', 100))
+        except ValueError:
+            raise ValidationError({'limit': 'Debe ser un número entero.'})
+        _limit = max(1, min(_limit, settings.E_COMMERCE_CHANGES_MAX_LIMIT))
+
+        try:
+            _results, _next = get_changes(
+                _resource, request.query_params.get('since'), _limit
+            )
+        except ExpiredCursor:
+            raise ValidationError({
+                'since': 'El cursor expiró, hay que sincronizar desde el principio.'
+            })
+        except InvalidCursor:
+            raise ValidationError({'since': 'El cursor no es válido.'})
+        return Response(
+            data={'results': _results, 'next': _next},
+            status=status.HTTP_200_OK
+        )
+
+
+def _optional_int_param(request, name):
+    _value = request.query_params.get(name)
+    if _value in (None, ''):
+        return None
+    try:
+        return int(_value)
+    except ValueError:
+        raise ValidationError({name: 'Debe ser un número entero.'})
+
+
+class ExportAPIView(APIView):
+    __doc__ = f'''{mensaje_headder}
+    `[METODO GET]`
+    Exporta la tabla completa indicada en la URL ("comics" o "wishlists")
+    en NDJSON o CSV. El contenido se envía en partes a medida que se lee de
+    la base de datos, así que la memoria usada no depende del tamaño de la
+    tabla.
+
+    Query-params:
+    - output: "ndjson" (por defecto) o "csv".
+    - pk_gte / pk_lt: exporta sólo el rango de IDs [pk_gte, pk_lt), para
+      repartir tablas grandes entre varios clientes.
+    '''
+    permission_classes = (IsAuthenticated & IsAdminUser,)
+
+    def get(self, request, table):
+        if table not in EXPORT_TABLES:
+            raise ValidationError(
+                {'table': f'Debe ser una de: {", ".join(EXPORT_TABLES)}.'}
+            )
+        # NOTE: No usamos "format" porque DRF lo reserva para elegir renderer.
+        _output = request.query_params.get('output', 'ndjson')
+        if _output not in EXPORT_FORMATS:
+            raise ValidationError(
+                {'output': f'Debe ser uno de: {", ".join(EXPORT_FORMATS)}.'}
+            )
+        _response = StreamingHttpResponse(
+            iter_export(
+                table,
+                _output,
+                settings.E_COMMERCE_STREAM_CHUNK_SIZE,
+                pk_gte=_optional_int_param(request, 'pk_gte'),
+                pk_lt=_optional_int_param(request, 'pk_lt')
+            ),
+            content_type=EXPORT_FORMATS[_output]
+        )
+        _response['Content-Disposition'] = (
+            f'attachment; filename="{table}.{_output}"'
+        )
+        return _response
+
+
+class BatchAPIView(APIView):
+    __doc__ = f'''{mensaje_headder}
+    `[METODO POST]`
+    Ejecuta varios requests a esta API en un solo round trip. Cada uno se
+    despacha directamente a su view, con el usuario ya autenticado del
+    batch si la view acepta esa autenticación (si no, con las credenciales
+    del request), y las respuestas se devuelven en el mismo orden.
+    Esquema de entrada:\n
+    {{
+        "requests": [
+            {{"id": "comic", "method": "GET", "path": "/e-commerce/api/comics/1/"}},
+            {{"method": "POST", "path": "/e-commerce/api/login/",
+             "body": {{"username": "root", "password": "12345"}}}}
+        ]
+    }}
+    '''
+    permission_classes = (AllowAny,)
+
+    def post(self, request):
+        _requests = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(_requests, list):
+            raise ValidationError({'requests': 'Debe ser una lista de requests.'})
+        if len(_requests) > settings.E_COMMERCE_BATCH_MAX_REQUESTS:
+            raise ValidationError({
+                'requests': f'Se pueden enviar hasta '
+                            f'{settings.E_COMMERCE_BATCH_MAX_REQUESTS} requests.'
+            })
+        _serializer = BatchSubRequestSerializer(data=_requests, many=True)
+        _serializer.is_valid(raise_exception=True)
+        # Sólo se despachan las URLs de esta API (e_commerce/api/urls.py).
+        _prefix = reverse('batch')[:-len('batch/')]
+        return Response(
+            data={
+                'responses': dispatch_batch(
+                    request, _prefix, _serializer.validated_data
+                )
+            },
+            status=status.HTTP_200_OK
+        )
@@ -18,8 +18,18 @@ from rest_framework.pagination import (
     PageNumberPagination
 )
 
+from e_commerce.api.mixins import (
+    SparseFieldsQuerysetMixin,
+    ValuesListMixin,
+    sparse_queryset
+)
 from e_commerce.models import User
-from .serializers import UserSerializer, UpdatePasswordUserSerializer, WishListSerializer
+from .serializers import (
+    UserSerializer,
+    UpdatePasswordUserSerializer,
+    UserWishListSerializer,
+    WishListSerializer
+)
 
 
 # Genero una clase para configurar el paginado de la API.
@@ -152,16 +162,19 @@ class CustomUserViewSet(viewsets.ViewSet):
 
 # Ahora veamos que sucede si los viewsets los
 # heredamos de ModelViewSet.
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsQuerysetMixin, ValuesListMixin, viewsets.ModelViewSet):
     permission_classes = [AllowAny]
     serializer_class = UserSerializer
     # NOTE: Con el siguiente atributo puedo administrar que tipo
     # de métodos permite esta view.
     # http_method_names = ['get', 'post', 'put', 'delete']
-    queryset = User.objects.all()
+    # NOTE: El listado se pagina, así que necesita un orden estable.
+    queryset = User.objects.all().order_by('id')
 
 
-class FilteringBackendUserViewSet(viewsets.ModelViewSet):
+class FilteringBackendUserViewSet(
+    SparseFieldsQuerysetMixin, ValuesListMixin, viewsets.ModelViewSet
+):
     '''
     Vista de API basada en Clase que permite manejar
     el filtrado, búsqueda, paginado y orden de los resultados del
@@ -202,7 +215,7 @@ class FilteringUserViewSet(viewsets.GenericViewSet):
     '''
     permission_classes = (AllowAny,)
     serializer_class = UserSerializer
-    queryset = serializer_class.Meta.model.objects.all()
+    queryset = serializer_class.Meta.model.objects.all().order_by('id')
 
     # NOTE: Habilito sólo el método 'GET' para esta view.
     http_method_names = ('get',)
@@ -238,7 +251,7 @@ class FilteringUserViewSet(viewsets.GenericViewSet):
 
         return queryset
 
-class WishListViewSet(viewsets.ModelViewSet):
+class WishListViewSet(SparseFieldsQuerysetMixin, viewsets.ModelViewSet):
     authentication_classes = [TokenAuthentication]
     serializer_class = WishListSerializer
     pagination_class = PageNumberPagination
@@ -250,4 +263,32 @@ class WishListViewSet(viewsets.ModelViewSet):
         if _username:
             queryset =queryset.filter(user__username= _username)
         return queryset
-    
\ No newline at end of file
+
+    # NOTE: Esta acción lista la wish-list del usuario autenticado. Filtramos
+    # directamente por "user_id" (usa el índice único (user, comic)) en vez
+    # de hacer el join con la tabla de usuarios por "username", y traemos
+    # los comics en la misma query con `select_related()`.
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='me',
+        serializer_class=UserWishListSerializer
+    )
+    def me(self, request):
+        queryset = self.serializer_class.Meta.model.objects.filter(
+            user_id=request.user.id
+        ).select_related('comic').order_by('id')
+
+        # Filtros opcionales: ?cart=1 y/o ?favorite=1
+        for _flag in ('cart', 'favorite'):
+            _value = request.query_params.get(_flag)
+            if _value is not None:
+                queryset = queryset.filter(
+                    **{_flag: _value.lower() in ('1', 'true')}
+                )
+
+        page = self.paginate_queryset(
+            sparse_queryset(queryset, self.get_serializer())
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
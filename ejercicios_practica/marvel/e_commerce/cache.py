@@ -0,0 +1,316 @@
+import hashlib
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+
+from e_commerce.models import Comic, Tombstone, WishList
+
+
+# NOTE: Todas las claves de caché de la aplicación llevan este prefijo para
+# no chocar con otras aplicaciones que compartan el mismo backend.
+KEY_PREFIX = 'e_commerce'
+
+# Los IDs se guardan como un array de enteros de 64 bits empaquetado en
+# bytes, que ocupa mucho menos que una lista de Python serializada.
+_ID_ARRAY_TYPECODE = 'q'
+
+
+def _wishlist_comic_ids_key(user_id):
+    return f'{KEY_PREFIX}:wishlist:comic_ids:{user_id}'
+
+
+def get_wishlist_comic_ids(user_id):
+    '''
+    Devuelve la lista de IDs de los comics que el usuario tiene en su
+    wish-list. Se consulta primero la caché y, si no está, se obtiene del
+    índice único (user, comic) y se guarda para los próximos requests.
+    '''
+    _key = _wishlist_comic_ids_key(user_id)
+    _packed = cache.get(_key)
+    if _packed is not None:
+        _ids = array(_ID_ARRAY_TYPECODE)
+        _ids.frombytes(_packed)
+        return _ids.tolist()
+
+    _ids = list(
+        WishList.objects.filter(user_id=user_id)
+        .order_by()
+        .values_list('comic_id', flat=True)
+    )
+    cache.set(
+        _key,
+        array(_ID_ARRAY_TYPECODE, _ids).tobytes(),
+        settings.E_COMMERCE_WISHLIST_IDS_CACHE_TIMEOUT
+    )
+    return _ids
+
+
+def invalidate_wishlist_comic_ids(user_id):
+    '''
+    Elimina los IDs cacheados de la wish-list del usuario. Se repite al
+    confirmar la transacción para no dejar en caché IDs leídos antes del
+    commit.
+    '''
+    _key = _wishlist_comic_ids_key(user_id)
+    cache.delete(_key)
+    transaction.on_commit(lambda: cache.delete(_key))
+
+
+# NOTE: Para que muchos requests simultáneos sobre un mismo comic que no
+# está en caché no vayan todos a la base de datos, sólo el primero ejecuta
+# la consulta y el resto espera a que termine y lee el resultado de la caché.
+# Esto agrupa los "misses" dentro de cada proceso.
+_inflight_lock = threading.Lock()
+_inflight = {}
+
+
+@contextmanager
+def _coalesce(key):
+    with _inflight_lock:
+        _entry = _inflight.setdefault(key, [threading.Lock(), 0])
+        _entry[1] += 1
+    try:
+        with _entry[0]:
+            yield
+    finally:
+        with _inflight_lock:
+            _entry[1] -= 1
+            if not _entry[1]:
+                _inflight.pop(key, None)
+
+
+def _comic_key(lookup_field, value):
+    return f'{KEY_PREFIX}:comic:{lookup_field}:{value}'
+
+
+def get_comic_entry(lookup_field, value, loader):
+    '''
+    Caché de lectura ("read-through") de los comics serializados. Se puede
+    buscar por "pk" o por "marvel_id"; `loader()` sólo se llama si el comic
+    no está en caché y debe devolver la instancia y sus datos serializados.
+    El resultado se guarda bajo ambas claves como un diccionario con los
+    datos ("data") y la fecha de última modificación del comic ("updated_at",
+    como timestamp), que se usa para los headers ETag / Last-Modified.
+    '''
+    _key = _comic_key(lookup_field, value)
+    _entry = cache.get(_key)
+    if _entry is not None:
+        return _entry
+
+    with _coalesce(_key):
+        _entry = cache.get(_key)
+        if _entry is None:
+            _instance, _data = loader()
+            _entry = {
+                'data': _data,
+                'marvel_id': _instance.marvel_id,
+                'updated_at': _instance.updated_at.timestamp(),
+            }
+            cache.set_many(
+                {
+                    _comic_key('pk', _instance.pk): _entry,
+                    _comic_key('marvel_id', _instance.marvel_id): _entry,
+                },
+                settings.E_COMMERCE_COMIC_CACHE_TIMEOUT
+            )
+    return _entry
+
+
+def get_comic_entries(lookup_field, values, loader):
+    '''
+    Versión de `get_comic_entry()` para varios comics: los que están en
+    caché se leen en una sola consulta y `loader(faltantes)` se llama una
+    vez con los valores que faltan; debe devolver pares (instancia, datos).
+    Devuelve {valor: entrada} sólo con los comics que existen.
+    '''
+    _keys = {_comic_key(lookup_field, _value): _value for _value in values}
+    _entries = {
+        _keys[_key]: _entry for _key, _entry in cache.get_many(_keys).items()
+    }
+    _missing = [_value for _value in values if _value not in _entries]
+    if not _missing:
+        return _entries
+
+    _new = {}
+    for _instance, _data in loader(_missing):
+        _entry = {
+            'data': _data,
+            'marvel_id': _instance.marvel_id,
+            'updated_at': _instance.updated_at.timestamp(),
+        }
+        _lookup_value = _instance.pk if lookup_field == 'pk' else getattr(
+            _instance, lookup_field
+        )
+        _entries[_lookup_value] = _entry
+        _new[_comic_key('pk', _instance.pk)] = _entry
+        _new[_comic_key('marvel_id', _instance.marvel_id)] = _entry
+    cache.set_many(_new, settings.E_COMMERCE_COMIC_CACHE_TIMEOUT)
+    return _entries
+
+
+def invalidate_comics(rows):
+    '''
+    Elimina de la caché los comics indicados como pares (id, marvel_id).
+    Si el comic cacheado tenía otro "marvel_id" también se elimina esa clave.
+    La invalidación se repite al confirmar la transacción para no dejar en
+    caché datos leídos antes del commit.
+    '''
+    _pk_keys = [_comic_key('pk', _id) for _id, _ in rows]
+    _keys = set(_pk_keys)
+    _keys.update(_comic_key('marvel_id', _marvel_id) for _, _marvel_id in rows)
+    for _entry in cache.get_many(_pk_keys).values():
+        _keys.add(_comic_key('marvel_id', _entry['marvel_id']))
+
+    cache.delete_many(list(_keys))
+    transaction.on_commit(lambda: cache.delete_many(list(_keys)))
+
+
+# NOTE: Caché de "fragmentos": el JSON ya codificado de cada fila de un
+# listado, con la versión de la fila (su "updated_at") en la clave. Una fila
+# modificada cambia de clave, así que no hace falta invalidar nada: los
+# fragmentos viejos simplemente dejan de pedirse y expiran solos.
+def _fragment_key(label, pk, version):
+    return f'{KEY_PREFIX}:fragment:{label}:{pk}:{version}'
+
+
+def get_row_fragments(label, rows):
+    '''
+    Busca en una sola consulta a la caché los fragmentos de las filas
+    indicadas como pares (pk, versión) y devuelve {pk: bytes} con los que
+    encontró. `label` identifica al modelo y al serializador.
+    '''
+    _keys = {_fragment_key(label, _pk, _version): _pk for _pk, _version in rows}
+    return {
+        _keys[_key]: _fragment for _key, _fragment in cache.get_many(_keys).items()
+    }
+
+
+def set_row_fragments(label, fragments):
+    '''
+    Guarda los fragmentos indicados como {(pk, versión): bytes}.
+    '''
+    cache.set_many(
+        {
+            _fragment_key(label, _pk, _version): _fragment
+            for (_pk, _version), _fragment in fragments.items()
+        },
+        settings.E_COMMERCE_FRAGMENT_CACHE_TIMEOUT
+    )
+
+
+# NOTE: Versión del catálogo de comics. Se incrementa con cada escritura
+# sobre la tabla de comics y forma parte de la clave de los listados
+# cacheados, por lo que al cambiar la versión los listados viejos dejan de
+# usarse (y expiran solos) sin tener que buscarlos para borrarlos.
+# Junto a la versión se guarda el momento del último cambio, que se envía
+# en el header "Last-Modified" de los listados.
+# Con una caché que no es compartida entre procesos (E_COMMERCE_SHARED_CACHE)
+# cada worker tendría su propia versión, y los ETag cambiarían según el
+# worker que atiende el request; en ese caso se calculan desde la base.
+_CATALOG_VERSION_KEY = f'{KEY_PREFIX}:catalog:version'
+_CATALOG_MODIFIED_KEY = f'{KEY_PREFIX}:catalog:modified'
+
+
+def _catalog_state_from_db():
+    '''
+    Versión y último cambio del catálogo según la tabla de comics: la
+    cantidad de comics y el último "updated_at", más el último borrado
+    (tombstone) para que un borrado también cambie el Last-Modified.
+    '''
+    _comics = Comic.objects.order_by().aggregate(
+        count=Count('id'), modified=Max('updated_at')
+    )
+    _deleted = Tombstone.objects.filter(
+        model=Comic._meta.label_lower
+    ).aggregate(modified=Max('deleted_at'))['modified']
+    _modified = max(
+        (_value for _value in (_comics['modified'], _deleted) if _value is not None),
+        default=None
+    )
+    _modified = _modified.timestamp() if _modified is not None else 0.0
+    return f'{_comics["count"]}.{int(_modified * 1000000)}', _modified
+
+
+def get_catalog_state():
+    '''
+    Devuelve la versión del catálogo y el timestamp de su último cambio.
+    '''
+    if not settings.E_COMMERCE_SHARED_CACHE:
+        return _catalog_state_from_db()
+    _state = cache.get_many([_CATALOG_VERSION_KEY, _CATALOG_MODIFIED_KEY])
+    _version = _state.get(_CATALOG_VERSION_KEY)
+    _modified = _state.get(_CATALOG_MODIFIED_KEY)
+    if _version is None or _modified is None:
+        # Si las claves se perdieron (expiraron o se reinició la caché)
+        # arrancamos de un valor basado en el reloj para no repetir
+        # versiones viejas, y consideramos que el catálogo cambió ahora.
+        _now = time.time()
+        cache.add(_CATALOG_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        cache.add(_CATALOG_MODIFIED_KEY, _now, timeout=None)
+        _state = cache.get_many([_CATALOG_VERSION_KEY, _CATALOG_MODIFIED_KEY])
+        _version = _state.get(_CATALOG_VERSION_KEY)
+        _modified = _state.get(_CATALOG_MODIFIED_KEY, _now)
+    return _version, _modified
+
+
+def get_catalog_version():
+    return get_catalog_state()[0]
+
+
+def bump_catalog_version():
+    '''
+    Incrementa la versión del catálogo. Se repite al confirmar la
+    transacción para descartar listados armados con datos previos al commit.
+    '''
+    if not settings.E_COMMERCE_SHARED_CACHE:
+        return
+
+    def _bump():
+        try:
+            cache.incr(_CATALOG_VERSION_KEY)
+        except ValueError:
+            get_catalog_state()
+        cache.set(_CATALOG_MODIFIED_KEY, time.time(), timeout=None)
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def catalog_list_cache_key(request):
+    '''
+    Clave de un listado del catálogo: versión del catálogo, URL (host y
+    path), tipo de contenido negociado y los query-params normalizados
+    (ordenados), de modo que "?page=2&search=x" y "?search=x&page=2"
+    comparten la misma entrada. El estado del catálogo queda guardado en
+    `request.catalog_state` para no volver a consultarlo en el mismo request.
+    '''
+    request.catalog_state = get_catalog_state()
+    _params = sorted(
+        (_key, _values) for _key, _values in request.query_params.lists()
+    )
+    _digest = hashlib.md5(
+        repr((
+            request.build_absolute_uri(request.path),
+            request.accepted_media_type,
+            _params,
+        )).encode()
+    ).hexdigest()
+    return f'{KEY_PREFIX}:catalog:list:{request.catalog_state[0]}:{_digest}'
+
+
+def get_catalog_list(key):
+    return cache.get(key)
+
+
+def set_catalog_list(key, content_type, content):
+    cache.set(
+        key,
+        (content_type, content),
+        settings.E_COMMERCE_CATALOG_LIST_CACHE_TIMEOUT
+    )
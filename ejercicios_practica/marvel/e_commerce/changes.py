@@ -0,0 +1,178 @@
+import base64
+import binascii
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from e_commerce.models import Comic, Tombstone, WishList
+
+
+# Recursos que se pueden sincronizar con el feed de cambios.
+CHANGES_RESOURCES = {
+    'comics': Comic,
+    'wishlists': WishList,
+}
+
+# Tipos de evento. El orden de un evento en el feed es la tupla
+# (momento, tipo, id), por lo que a igual momento los "upsert" van
+# antes que los "delete". `_END` no es un evento: la posición
+# (momento, _END, 0) queda después de todos los eventos de ese momento.
+_UPSERT, _DELETE, _END = 0, 1, 2
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class ExpiredCursor(InvalidCursor):
+    '''
+    El cursor es anterior a `E_COMMERCE_CHANGES_RETENTION_DAYS`: los
+    borrados de ese período pueden haberse eliminado.
+    '''
+
+
+def _to_micros(value):
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value):
+    return _EPOCH + timedelta(microseconds=value)
+
+
+def encode_cursor(position):
+    _raw = ':'.join(str(_part) for _part in position)
+    return base64.urlsafe_b64encode(_raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    '''
+    El cursor es opaco para el cliente: es la posición (momento en
+    microsegundos, tipo de evento, id) del último evento recibido.
+    '''
+    try:
+        _micros, _kind, _id = base64.urlsafe_b64decode(
+            cursor.encode()
+        ).decode().split(':')
+        return int(_micros), int(_kind), int(_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+
+
+def _after(position, kind, field_name):
+    '''
+    Filtro para los eventos del tipo `kind` posteriores a `position`,
+    recorriendo el índice por (momento, id).
+    '''
+    if position is None:
+        return Q()
+    _micros, _kind, _id = position
+    _moment = _from_micros(_micros)
+    if kind > _kind:
+        return Q(**{f'{field_name}__gte': _moment})
+    if kind < _kind:
+        return Q(**{f'{field_name}__gt': _moment})
+    return (
+        Q(**{f'{field_name}__gt': _moment}) |
+        Q(**{field_name: _moment, 'id__gt': _id})
+    )
+
+
+def retention_horizon():
+    '''
+    Momento a partir del cual se conservan los "tombstones".
+    '''
+    return timezone.now() - timedelta(
+        days=settings.E_COMMERCE_CHANGES_RETENTION_DAYS
+    )
+
+
+def prune_tombstones(before=None, batch_size=1000):
+    '''
+    Elimina los "tombstones" anteriores a `before` (por defecto,
+    `retention_horizon()`) de a `batch_size` filas, para no mantener la
+    tabla bloqueada con una sola transacción larga. Devuelve la cantidad de
+    filas eliminadas.
+    '''
+    if before is None:
+        before = retention_horizon()
+    _total = 0
+    while True:
+        _ids = list(
+            Tombstone.objects
+            .filter(deleted_at__lt=before)
+            .order_by('deleted_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not _ids:
+            return _total
+        _deleted, _ = Tombstone.objects.filter(pk__in=_ids).delete()
+        _total += _deleted
+
+
+def get_changes(resource, cursor=None, limit=100):
+    '''
+    Devuelve los cambios del recurso posteriores al cursor, en orden, y el
+    cursor para pedir los siguientes. Las filas modificadas se obtienen por
+    "updated_at" y los borrados de la tabla de "tombstones", así que el costo
+    depende sólo de la cantidad de cambios.
+    Se omiten los cambios de los últimos `E_COMMERCE_CHANGES_SETTLE_SECONDS`
+    segundos, para no saltear filas de transacciones que todavía no hicieron
+    commit con un "updated_at" anterior al de otras ya confirmadas. Una
+    transacción que tarda más que eso en hacer commit puede quedar detrás
+    del cursor y sus cambios no se informan (ver marvel/settings.py).
+    Un cursor anterior al período de retención de los "tombstones" lanza
+    `ExpiredCursor`.
+    '''
+    _model = CHANGES_RESOURCES[resource]
+    _position = decode_cursor(cursor) if cursor else None
+    if _position is not None and _from_micros(_position[0]) < retention_horizon():
+        raise ExpiredCursor(cursor)
+    _horizon = timezone.now() - timedelta(
+        seconds=settings.E_COMMERCE_CHANGES_SETTLE_SECONDS
+    )
+
+    _rows = (
+        _model.objects
+        .filter(_after(_position, _UPSERT, 'updated_at'))
+        .filter(updated_at__lte=_horizon)
+        .order_by('updated_at', 'id')
+        .values()[:limit]
+    )
+    _tombstones = (
+        Tombstone.objects
+        .filter(model=_model._meta.label_lower)
+        .filter(_after(_position, _DELETE, 'deleted_at'))
+        .filter(deleted_at__lte=_horizon)
+        .order_by('deleted_at', 'id')
+        .values_list('id', 'object_id', 'deleted_at')[:limit]
+    )
+
+    _events = [
+        ((_to_micros(_row['updated_at']), _UPSERT, _row['id']), {
+            'op': 'upsert', 'id': _row['id'], 'data': _row
+        })
+        for _row in _rows
+    ]
+    _events += [
+        ((_to_micros(_deleted_at), _DELETE, _id), {
+            'op': 'delete', 'id': _object_id
+        })
+        for _id, _object_id, _deleted_at in _tombstones
+    ]
+    _events.sort(key=lambda _event: _event[0])
+    _events = _events[:limit]
+
+    if len(_events) == limit:
+        _next = encode_cursor(_events[-1][0])
+    else:
+        # No hay más eventos hasta `_horizon`: el cursor avanza hasta ahí
+        # aunque el recurso no haya cambiado, así no expira en una réplica
+        # que está al día.
+        _end = (_to_micros(_horizon), _END, 0)
+        if _position is not None and _position > _end:
+            _end = _position
+        _next = encode_cursor(_end)
+    return [_event for _, _event in _events], _next
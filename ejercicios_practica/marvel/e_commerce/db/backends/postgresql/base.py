@@ -0,0 +1,146 @@
+import os
+import threading
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.base import Database
+
+from psycopg2.extensions import (
+    TRANSACTION_STATUS_IDLE,
+    TRANSACTION_STATUS_UNKNOWN
+)
+
+from e_commerce.db.pool import ConnectionPool, PoolTimeout
+
+
+# NOTE: Un pool por base de datos y por proceso: si el proceso se duplica
+# (por ejemplo `gunicorn --preload`) el hijo crea su propio pool en lugar
+# de compartir los sockets del padre.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _is_usable(connection):
+    with connection.cursor() as _cursor:
+        _cursor.execute('SELECT 1')
+    if not connection.autocommit:
+        connection.rollback()
+    return True
+
+
+def _reset(connection):
+    '''
+    Deja la conexión como recién abierta antes de volver al pool: sin
+    transacción y, con DISCARD ALL, sin el estado de la sesión (`SET ...`,
+    locks "advisory", tablas temporales, etc.) del hilo que la usó.
+    '''
+    if connection.closed:
+        return False
+    _status = connection.get_transaction_status()
+    if _status == TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if _status != TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    # DISCARD ALL no se puede ejecutar dentro de una transacción. Al tomarla
+    # del pool Django vuelve a configurar "autocommit" y la zona horaria.
+    connection.autocommit = True
+    with connection.cursor() as _cursor:
+        _cursor.execute('DISCARD ALL')
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''
+    Backend de Postgres de Django con dos agregados (ver `DATABASES` en
+    marvel/settings.py):
+    - "CONN_HEALTH_CHECKS": como en Django 4.1, antes del primer uso de una
+      conexión persistente en cada request se verifica que siga viva y si
+      no, se abre otra, en lugar de fallar el request.
+    - OPTIONS["pool"]: con un diccionario de opciones de `ConnectionPool`
+      (o True), al cerrar una conexión se devuelve al pool del proceso y al
+      abrir se toma de ahí. Cada hilo (WSGI con hilos, o los hilos donde
+      ASGI ejecuta el código síncrono) usa su propia conexión mientras la
+      tiene, y el pool las comparte entre hilos sin abrir una nueva por
+      request. Se usa con CONN_MAX_AGE = 0.
+    '''
+    health_check_done = False
+
+    @property
+    def health_checks(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def get_pool(self):
+        _options = self.settings_dict['OPTIONS'].get('pool')
+        if not _options:
+            return None
+        _key = (self.alias, os.getpid())
+        _pool = _pools.get(_key)
+        if _pool is None:
+            with _pools_lock:
+                _pool = _pools.get(_key)
+                if _pool is None:
+                    _pool = _pools[_key] = ConnectionPool(
+                        **({} if _options is True else _options)
+                    )
+        return _pool
+
+    def get_connection_params(self):
+        _params = super().get_connection_params()
+        _params.pop('pool', None)
+        return _params
+
+    def get_new_connection(self, conn_params):
+        _pool = self.get_pool()
+        if _pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            _connection = _pool.get(
+                lambda: super(DatabaseWrapper, self).get_new_connection(conn_params),
+                check=_is_usable if self.health_checks else None
+            )
+        except PoolTimeout as _error:
+            raise Database.OperationalError(str(_error))
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', _connection.isolation_level
+        )
+        return _connection
+
+    def _close(self):
+        _pool = self.get_pool()
+        if _pool is None or self.connection is None:
+            return super()._close()
+        # NOTE: Dentro de un `atomic()` Django mantiene la referencia a la
+        # conexión hasta salir del bloque, así que no puede pasar a otro hilo.
+        with self.wrap_database_errors:
+            _pool.put(
+                self.connection,
+                reset=_reset,
+                discard=self.errors_occurred or self.in_atomic_block
+            )
+
+    def connect(self):
+        super().connect()
+        # Una conexión recién abierta (o verificada por el pool) no necesita
+        # otra verificación en este request.
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # Se llama al inicio y al final de cada request.
+        self.health_check_done = False
+        super().close_if_unusable_or_obsolete()
+
+    def _close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or not self.health_checks
+            or self.health_check_done
+        ):
+            return
+        if not self.is_usable():
+            # No se devuelve al pool.
+            self.errors_occurred = True
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self._close_if_health_check_failed()
+        return super()._cursor(name)
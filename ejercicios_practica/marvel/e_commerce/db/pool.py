@@ -0,0 +1,100 @@
+import threading
+import time
+
+
+class PoolTimeout(TimeoutError):
+    pass
+
+
+class ConnectionPool:
+    '''
+    Pool de conexiones liviano y seguro entre hilos. No conoce el tipo de
+    conexión: `get()` recibe la función que crea una nueva y, opcionalmente,
+    la que verifica una conexión reutilizada; `put()` recibe la que la deja
+    lista para el próximo uso (devuelve False si hay que descartarla).
+    - `max_size`: máximo de conexiones en uso a la vez. Al llegar al máximo
+      `get()` espera hasta `timeout` segundos a que se devuelva alguna.
+    - `max_lifetime`: segundos luego de los cuales una conexión se cierra en
+      lugar de volver al pool (None: sin límite).
+    Las conexiones libres se reutilizan de la última devuelta a la primera,
+    así las que sobran quedan sin usar y terminan cerrándose por antigüedad.
+    '''
+
+    def __init__(self, max_size=10, timeout=10.0, max_lifetime=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._created = {}
+
+    def _expired(self, connection):
+        return (
+            self.max_lifetime is not None
+            and time.monotonic() - self._created.get(connection, 0) > self.max_lifetime
+        )
+
+    def _discard(self, connection):
+        self._created.pop(connection, None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def get(self, create, check=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'No hay conexiones libres en el pool ({self.max_size} en uso) '
+                f'luego de esperar {self.timeout}s.'
+            )
+        try:
+            while True:
+                with self._lock:
+                    _connection = self._idle.pop() if self._idle else None
+                if _connection is None:
+                    _connection = create()
+                    self._created[_connection] = time.monotonic()
+                    return _connection
+                if self._expired(_connection):
+                    self._discard(_connection)
+                    continue
+                try:
+                    _usable = check is None or check(_connection)
+                except Exception:
+                    _usable = False
+                if _usable:
+                    return _connection
+                self._discard(_connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, connection, reset=None, discard=False):
+        try:
+            if not discard and reset is not None:
+                try:
+                    discard = not reset(connection)
+                except Exception:
+                    discard = True
+            if discard or self._expired(connection):
+                self._discard(connection)
+            else:
+                with self._lock:
+                    self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        '''
+        Cierra las conexiones libres. Las que están en uso se cierran al
+        devolverlas si superan `max_lifetime`.
+        '''
+        with self._lock:
+            _idle, self._idle = self._idle, []
+        for _connection in _idle:
+            self._discard(_connection)
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
@@ -0,0 +1,135 @@
+import csv
+import io
+import logging
+import time
+
+from django.db.models import Max, Min
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from e_commerce.models import Comic, WishList
+
+
+logger = logging.getLogger(__name__)
+
+# Tablas que se pueden exportar y formatos disponibles.
+EXPORT_TABLES = {
+    'comics': Comic,
+    'wishlists': WishList,
+}
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_columns(model):
+    return tuple(_field.attname for _field in model._meta.concrete_fields)
+
+
+def pk_ranges(table, parts):
+    '''
+    Divide el rango de claves primarias de la tabla en `parts` rangos
+    [desde, hasta) de tamaño similar, para exportarlos en paralelo.
+    '''
+    _bounds = EXPORT_TABLES[table].objects.aggregate(
+        _min=Min('pk'), _max=Max('pk')
+    )
+    if _bounds['_min'] is None:
+        return []
+    _start, _stop = _bounds['_min'], _bounds['_max'] + 1
+    _step = max(1, -(-(_stop - _start) // parts))
+    return [
+        (_gte, min(_gte + _step, _stop))
+        for _gte in range(_start, _stop, _step)
+    ]
+
+
+def _rows(table, chunk_size, pk_gte=None, pk_lt=None):
+    '''
+    Recorre la tabla ordenada por clave primaria con `.iterator()`, que en
+    Postgres usa un cursor del lado del servidor, así que en memoria sólo
+    hay `chunk_size` filas por vez.
+    '''
+    _model = EXPORT_TABLES[table]
+    _queryset = _model.objects.order_by('pk')
+    if pk_gte is not None:
+        _queryset = _queryset.filter(pk__gte=pk_gte)
+    if pk_lt is not None:
+        _queryset = _queryset.filter(pk__lt=pk_lt)
+    return _queryset.values_list(
+        *export_columns(_model)
+    ).iterator(chunk_size=chunk_size)
+
+
+def _chunks(rows, chunk_size):
+    _chunk = []
+    for _row in rows:
+        _chunk.append(_row)
+        if len(_chunk) == chunk_size:
+            yield _chunk
+            _chunk = []
+    if _chunk:
+        yield _chunk
+
+
+def _iter_ndjson(columns, chunks):
+    _encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for _chunk in chunks:
+        yield ''.join(
+            _encoder.encode(dict(zip(columns, _row))) + '\n' for _row in _chunk
+        ).encode()
+
+
+def _csv_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _iter_csv(columns, chunks, header):
+    _buffer = io.StringIO()
+    _writer = csv.writer(_buffer)
+    if header:
+        _writer.writerow(columns)
+    for _chunk in chunks:
+        _writer.writerows(
+            [_csv_value(_value) for _value in _row] for _row in _chunk
+        )
+        yield _buffer.getvalue().encode()
+        _buffer.seek(0)
+        _buffer.truncate()
+    if _buffer.tell():
+        yield _buffer.getvalue().encode()
+
+
+def iter_export(table, output, chunk_size, pk_gte=None, pk_lt=None,
+                header=True, stats=None):
+    '''
+    Genera en partes (bytes) el contenido de la tabla en formato NDJSON o
+    CSV. Si se pasa el diccionario `stats` se completa con la cantidad de
+    filas exportadas ("rows") y el tiempo que llevó ("seconds"); además se
+    registra el rendimiento en filas por segundo en el log.
+    '''
+    _columns = export_columns(EXPORT_TABLES[table])
+    _stats = stats if stats is not None else {}
+    _stats.update(rows=0, seconds=0.0)
+    _start = time.perf_counter()
+
+    def _counted(chunks):
+        for _chunk in chunks:
+            _stats['rows'] += len(_chunk)
+            yield _chunk
+
+    _chunks_iter = _counted(
+        _chunks(_rows(table, chunk_size, pk_gte, pk_lt), chunk_size)
+    )
+    if output == 'csv':
+        yield from _iter_csv(_columns, _chunks_iter, header)
+    else:
+        yield from _iter_ndjson(_columns, _chunks_iter)
+
+    _stats['seconds'] = time.perf_counter() - _start
+    logger.info(
+        'Export %s (%s): %d rows in %.2fs (%.0f rows/s)',
+        table, output, _stats['rows'], _stats['seconds'],
+        _stats['rows'] / _stats['seconds'] if _stats['seconds'] else 0
+    )
@@ -0,0 +1,220 @@
+import csv
+import io
+import json
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from e_commerce.models import Comic, comics_updated
+
+
+# Columnas que se cargan desde el archivo y su conversión. "marvel_id" es
+# obligatoria y se usa para decidir si el comic se crea o se actualiza; las
+# demás, si faltan, toman el valor por defecto del modelo (también al
+# actualizar: cada registro reemplaza al comic completo).
+IMPORT_COLUMNS = {
+    'marvel_id': int,
+    'title': str,
+    'description': str,
+    'price': float,
+    'stock_qty': int,
+    'picture': str,
+}
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+
+class InvalidRow(ValueError):
+
+    def __init__(self, number, message):
+        super().__init__(f'Registro {number}: {message}')
+        self.number = number
+
+
+def _clean_row(number, row):
+    if not isinstance(row, dict):
+        raise InvalidRow(number, 'debe ser un objeto.')
+    if row.get('marvel_id') in (None, ''):
+        raise InvalidRow(number, 'falta "marvel_id".')
+    _values = []
+    for _name, _cast in IMPORT_COLUMNS.items():
+        _value = row.get(_name)
+        if _value in (None, ''):
+            _value = Comic._meta.get_field(_name).get_default()
+        try:
+            _values.append(_cast(_value))
+        except (TypeError, ValueError):
+            raise InvalidRow(number, f'"{_name}" no es válido: {_value!r}.')
+    return tuple(_values)
+
+
+def read_rows(file, input_format, skip=0):
+    '''
+    Lee el archivo CSV (con encabezado) o NDJSON registro por registro, sin
+    cargarlo completo en memoria, y devuelve tuplas con los valores de
+    `IMPORT_COLUMNS`. Los primeros `skip` registros se saltean sin validar.
+    '''
+    if input_format == 'csv':
+        _records = csv.DictReader(file)
+    else:
+        _records = (_line for _line in file if _line.strip())
+    _number = 0
+    while True:
+        _number += 1
+        # NOTE: Los errores de lectura (codificación, CSV mal formado) se
+        # informan como `InvalidRow` con el número de registro, igual que
+        # los de validación.
+        try:
+            _record = next(_records)
+        except StopIteration:
+            return
+        except UnicodeDecodeError as _error:
+            raise InvalidRow(_number, f'el archivo no es UTF-8 válido ({_error.reason}).')
+        except csv.Error as _error:
+            raise InvalidRow(_number, f'CSV no válido ({_error}).')
+        if _number <= skip:
+            continue
+        if input_format != 'csv':
+            try:
+                _record = json.loads(_record)
+            except json.JSONDecodeError as _error:
+                raise InvalidRow(_number, f'JSON no válido ({_error.msg}).')
+        yield _clean_row(_number, _record)
+
+
+def _batches(rows, batch_size):
+    _batch = []
+    for _row in rows:
+        _batch.append(_row)
+        if len(_batch) == batch_size:
+            yield _batch
+            _batch = []
+    if _batch:
+        yield _batch
+
+
+def _rows_by_marvel_id(marvel_ids, chunk_size=500):
+    # En lotes, para no superar el límite de parámetros de SQLite.
+    _rows = []
+    for _start in range(0, len(marvel_ids), chunk_size):
+        _rows += Comic.objects.filter(
+            marvel_id__in=marvel_ids[_start:_start + chunk_size]
+        ).values_list('id', 'marvel_id')
+    return _rows
+
+
+def _merge_postgresql(batch, now):
+    '''
+    Copia el lote con COPY a una tabla temporal y desde ahí lo combina con
+    la tabla de comics en una sola sentencia. Si el mismo "marvel_id" se
+    repite en el lote gana el último registro.
+    '''
+    _table = connection.ops.quote_name(Comic._meta.db_table)
+    _columns = ', '.join(IMPORT_COLUMNS)
+    _buffer = io.StringIO()
+    csv.writer(_buffer).writerows(
+        (_position, *_row) for _position, _row in enumerate(batch)
+    )
+    _buffer.seek(0)
+    _updates = ', '.join(
+        f'{_name} = EXCLUDED.{_name}' for _name in (*IMPORT_COLUMNS, 'updated_at')
+    )
+    with connection.cursor() as _cursor:
+        _cursor.execute(
+            f'CREATE TEMPORARY TABLE e_commerce_comics_staging ('
+            f'position integer, marvel_id integer, title varchar(120), '
+            f'description text, price double precision, stock_qty integer, '
+            f'picture varchar(200)) ON COMMIT DROP'
+        )
+        _cursor.copy_expert(
+            f'COPY e_commerce_comics_staging (position, {_columns}) '
+            f'FROM STDIN WITH (FORMAT csv)',
+            _buffer
+        )
+        _cursor.execute(
+            f'INSERT INTO {_table} ({_columns}, created_at, updated_at) '
+            f'SELECT DISTINCT ON (marvel_id) {_columns}, %s, %s '
+            f'FROM e_commerce_comics_staging ORDER BY marvel_id, position DESC '
+            f'ON CONFLICT (marvel_id) DO UPDATE SET {_updates} '
+            f'RETURNING id, marvel_id',
+            [now, now]
+        )
+        return _cursor.fetchall()
+
+
+def _merge_sqlite(batch, now):
+    '''
+    "Upsert" del lote completo con un único `executemany`. `executemany`
+    no devuelve las filas de un RETURNING, así que se buscan por
+    "marvel_id".
+    '''
+    _table = connection.ops.quote_name(Comic._meta.db_table)
+    _columns = ', '.join(IMPORT_COLUMNS)
+    _placeholders = ', '.join(['%s'] * (len(IMPORT_COLUMNS) + 2))
+    _updates = ', '.join(
+        f'{_name} = excluded.{_name}' for _name in (*IMPORT_COLUMNS, 'updated_at')
+    )
+    _now = connection.ops.adapt_datetimefield_value(now)
+    with connection.cursor() as _cursor:
+        _cursor.executemany(
+            f'INSERT INTO {_table} ({_columns}, created_at, updated_at) '
+            f'VALUES ({_placeholders}) '
+            f'ON CONFLICT (marvel_id) DO UPDATE SET {_updates}',
+            [(*_row, _now, _now) for _row in batch]
+        )
+    return _rows_by_marvel_id(list({_row[0] for _row in batch}))
+
+
+def _merge_orm(batch, now):
+    '''
+    Para las demás bases de datos: con el ORM, una consulta para saber
+    cuáles existen y luego `bulk_update()` y `bulk_create()`.
+    '''
+    _latest = {_row[0]: dict(zip(IMPORT_COLUMNS, _row)) for _row in batch}
+    _existing = Comic.objects.in_bulk(list(_latest), field_name='marvel_id')
+    _new = []
+    for _marvel_id, _values in _latest.items():
+        _comic = _existing.get(_marvel_id)
+        if _comic is None:
+            _new.append(Comic(**_values, created_at=now, updated_at=now))
+            continue
+        for _name, _value in _values.items():
+            setattr(_comic, _name, _value)
+        _comic.updated_at = now
+    Comic.objects.bulk_update(
+        list(_existing.values()), [*IMPORT_COLUMNS, 'updated_at'], batch_size=500
+    )
+    Comic.objects.bulk_create(_new, batch_size=500)
+    return _rows_by_marvel_id(list(_latest))
+
+
+_MERGE_BY_VENDOR = {
+    'postgresql': _merge_postgresql,
+    'sqlite': _merge_sqlite,
+}
+
+
+def import_batch(batch):
+    '''
+    Crea o actualiza (según "marvel_id") los comics del lote en una
+    transacción. Como `bulk_create()`, emite `comics_updated` con las filas
+    afectadas, así se invalidan la caché y la versión del catálogo, y el
+    feed de cambios las ve por su "updated_at".
+    '''
+    _merge = _MERGE_BY_VENDOR.get(connection.vendor, _merge_orm)
+    with transaction.atomic():
+        _rows = _merge(batch, timezone.now())
+        comics_updated.send(sender=Comic, rows=_rows)
+    return len(batch)
+
+
+def import_rows(rows, batch_size, on_batch=None):
+    '''
+    Importa las filas en lotes de `batch_size`. Después de confirmar cada
+    lote se llama a `on_batch(cantidad)`, por ejemplo para guardar el avance.
+    '''
+    _total = 0
+    for _batch in _batches(rows, batch_size):
+        _total += import_batch(_batch)
+        if on_batch is not None:
+            on_batch(len(_batch))
+    return _total
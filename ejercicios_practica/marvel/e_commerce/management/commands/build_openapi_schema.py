@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_commerce.openapi import build_schema, get_registered_schema_view, schema_path
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera el esquema OpenAPI de la documentación (Swagger / Redoc) y lo '
+        'guarda en E_COMMERCE_OPENAPI_SCHEMA_DIR, para que los requests a la '
+        'documentación no tengan que generarlo. Ejecutar en cada deploy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Lo vuelve a generar aunque ya exista para este código.'
+        )
+
+    def handle(self, *args, **options):
+        self._print_info('####### Inicio de Comando #######')
+        _view = get_registered_schema_view()
+        if _view is None:
+            raise CommandError(
+                'El URLconf no usa `get_cached_schema_view()` (e_commerce/openapi.py).'
+            )
+        _path = schema_path()
+        if _path.exists() and not options['force']:
+            self._print_success(f'El esquema ya está generado: {_path}')
+        else:
+            _start = time.perf_counter()
+            build_schema(_view)
+            self._print_success(
+                f'Esquema generado en {time.perf_counter() - _start:.2f}s: {_path}'
+            )
+        self._print_info('####### Fin de Comando #######')
+
+    def _print_success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def _print_info(self, text):
+        self.stdout.write(self.style.WARNING(text))
@@ -0,0 +1,119 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from e_commerce.exports import EXPORT_FORMATS, EXPORT_TABLES, iter_export, pk_ranges
+
+
+def _init_worker():
+    # NOTE: Con el método "spawn" (macOS / Windows) el proceso hijo arranca
+    # de cero y hay que inicializar Django; con "fork" no hace nada.
+    django.setup()
+
+
+def _export_part(table, output, chunk_size, path, pk_gte, pk_lt, header):
+    '''
+    Exporta el rango de IDs [pk_gte, pk_lt) al archivo indicado y devuelve
+    la cantidad de filas y los segundos que llevó.
+    '''
+    _stats = {}
+    with open(path, 'wb') as _file:
+        for _chunk in iter_export(
+            table, output, chunk_size, pk_gte=pk_gte, pk_lt=pk_lt,
+            header=header, stats=_stats
+        ):
+            _file.write(_chunk)
+    connections.close_all()
+    return _stats['rows'], _stats['seconds']
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta la tabla de comics o de wish-lists completa a NDJSON o CSV. '
+        'Con --workers N la tabla se divide en N rangos de IDs que se '
+        'exportan en paralelo, cada uno a su propio archivo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=list(EXPORT_TABLES))
+        parser.add_argument(
+            '--output-format', choices=list(EXPORT_FORMATS), default='ndjson'
+        )
+        parser.add_argument(
+            '--path',
+            help='Archivo de salida (por defecto "<table>.<formato>").'
+        )
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=settings.E_COMMERCE_STREAM_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        self._print_info('####### Inicio de Comando #######')
+        _table = options['table']
+        _output = options['output_format']
+        _path = Path(options['path'] or f'{_table}.{_output}')
+        _workers = max(1, options['workers'])
+        _chunk_size = options['chunk_size']
+
+        _start = time.perf_counter()
+        if _workers == 1:
+            _parts = [(_path, None, None)]
+        else:
+            # NOTE: Si la tabla está vacía no hay rangos; igual exportamos una
+            # parte (vacía, o sólo con el encabezado del CSV) para que el
+            # comando siempre deje al menos un archivo.
+            _ranges = pk_ranges(_table, _workers) or [(None, None)]
+            _parts = [
+                (
+                    _path.with_name(f'{_path.stem}.part-{_index:03d}{_path.suffix}'),
+                    _gte,
+                    _lt
+                )
+                for _index, (_gte, _lt) in enumerate(_ranges)
+            ]
+
+        # El encabezado del CSV va sólo en la primera parte, así las partes
+        # se pueden concatenar directamente.
+        _jobs = [
+            (_table, _output, _chunk_size, str(_part_path), _gte, _lt, not _index)
+            for _index, (_part_path, _gte, _lt) in enumerate(_parts)
+        ]
+        if len(_jobs) <= 1:
+            _results = [_export_part(*_job) for _job in _jobs]
+        else:
+            # NOTE: Cerramos las conexiones antes de crear los procesos para
+            # que ningún hijo herede (y comparta) el socket de la base.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=len(_jobs), initializer=_init_worker
+            ) as _executor:
+                _results = list(_executor.map(_export_part, *zip(*_jobs)))
+
+        for _job, (_rows, _seconds) in zip(_jobs, _results):
+            self._print_debug(
+                f'{_job[3]}: {_rows} filas en {_seconds:.2f}s '
+                f'({_rows / _seconds if _seconds else 0:.0f} filas/s)'
+            )
+        _total = sum(_rows for _rows, _ in _results)
+        _elapsed = time.perf_counter() - _start
+        self._print_success(
+            f'{_table}: {_total} filas exportadas en {_elapsed:.2f}s '
+            f'({_total / _elapsed if _elapsed else 0:.0f} filas/s)'
+        )
+        self._print_info('####### Fin de Comando #######')
+
+    def _print_debug(self, text):
+        self.stdout.write(self.style.SQL_TABLE(text))
+
+    def _print_success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def _print_info(self, text):
+        self.stdout.write(self.style.WARNING(text))
@@ -0,0 +1,93 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_commerce.imports import IMPORT_FORMATS, InvalidRow, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa comics desde un archivo CSV o NDJSON, creando o actualizando '
+        'según "marvel_id". El archivo se procesa en lotes; el avance se '
+        'guarda después de cada lote, así que si la importación se corta se '
+        'puede retomar con --resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--input-format', choices=IMPORT_FORMATS,
+            help='Por defecto se toma de la extensión del archivo.'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Saltea los registros ya importados según el checkpoint.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Archivo de avance (por defecto "<path>.checkpoint").'
+        )
+
+    def handle(self, *args, **options):
+        self._print_info('####### Inicio de Comando #######')
+        _path = Path(options['path'])
+        _format = options['input_format'] or _path.suffix.lstrip('.').lower()
+        if _format not in IMPORT_FORMATS:
+            raise CommandError(
+                f'No se reconoce el formato "{_format}", use --input-format.'
+            )
+        _checkpoint = Path(options['checkpoint'] or f'{_path}.checkpoint')
+
+        _done = 0
+        if options['resume'] and _checkpoint.exists():
+            _done = int(_checkpoint.read_text() or 0)
+            self._print_info(f'Retomando después de {_done} registros.')
+        _skipped = _done
+        _start = time.perf_counter()
+
+        def _on_batch(count):
+            nonlocal _done
+            _done += count
+            # NOTE: Se escribe en un archivo temporal y se reemplaza para
+            # no dejar un checkpoint a medio escribir.
+            _tmp = _checkpoint.with_name(f'{_checkpoint.name}.tmp')
+            _tmp.write_text(str(_done))
+            os.replace(_tmp, _checkpoint)
+            _elapsed = time.perf_counter() - _start
+            self._print_debug(
+                f'{_done} registros ({(_done - _skipped) / _elapsed:.0f} filas/s)'
+            )
+
+        _newline = '' if _format == 'csv' else None
+        with open(_path, encoding='utf-8', newline=_newline) as _file:
+            try:
+                _total = import_rows(
+                    read_rows(_file, _format, skip=_done),
+                    options['batch_size'],
+                    on_batch=_on_batch
+                )
+            except InvalidRow as error:
+                raise CommandError(
+                    f'{error} Se importaron {_done} registros; corrija el '
+                    f'archivo y vuelva a ejecutar con --resume.'
+                )
+
+        _checkpoint.unlink(missing_ok=True)
+        _elapsed = time.perf_counter() - _start
+        self._print_success(
+            f'{_total} comics importados en {_elapsed:.2f}s '
+            f'({_total / _elapsed if _elapsed else 0:.0f} filas/s)'
+        )
+        self._print_info('####### Fin de Comando #######')
+
+    def _print_debug(self, text):
+        self.stdout.write(self.style.SQL_TABLE(text))
+
+    def _print_success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def _print_info(self, text):
+        self.stdout.write(self.style.WARNING(text))
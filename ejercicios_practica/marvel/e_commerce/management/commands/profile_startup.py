@@ -0,0 +1,110 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# NOTE: El arranque se mide en un proceso nuevo (este ya tiene todo
+# importado) con `python -X importtime`, que informa por stderr el tiempo
+# de cada import en microsegundos: propio ("self") y acumulado.
+_STARTUP_SCRIPT = '''
+import json, time
+_start = time.perf_counter()
+import django
+django.setup()
+_setup = time.perf_counter()
+from django.urls import get_resolver
+_resolver = get_resolver()
+_resolver.url_patterns
+_urlconf = time.perf_counter()
+_resolver.reverse_dict
+_resolver.resolve({path!r})
+_resolve = time.perf_counter()
+print(json.dumps({{
+    'django.setup()': _setup - _start,
+    'import del URLconf': _urlconf - _setup,
+    'resolución de rutas': _resolve - _urlconf,
+    'total': _resolve - _start,
+}}))
+'''
+_IMPORT_TIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el arranque de un worker en un proceso nuevo: django.setup(), '
+        'la carga del URLconf y la primera resolución de rutas, y los módulos '
+        'que más tardan en importarse.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Cantidad de módulos a mostrar.'
+        )
+        parser.add_argument(
+            '--by-package', action='store_true',
+            help='Agrupa los tiempos propios por paquete de primer nivel.'
+        )
+        parser.add_argument(
+            '--path', default='/e-commerce/api/comics/list/',
+            help='URL que se resuelve para medir la resolución de rutas.'
+        )
+
+    def handle(self, *args, **options):
+        self._print_info('####### Inicio de Comando #######')
+        _result = subprocess.run(
+            [
+                sys.executable, '-X', 'importtime', '-c',
+                _STARTUP_SCRIPT.format(path=options['path']),
+            ],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'marvel.settings'
+            )},
+        )
+        if _result.returncode:
+            raise CommandError(_result.stderr.strip().splitlines()[-1])
+
+        for _phase, _seconds in json.loads(_result.stdout).items():
+            self._print_debug(f'{_phase:>22}: {_seconds * 1000:8.1f} ms')
+
+        _modules = []
+        for _line in _result.stderr.splitlines():
+            _match = _IMPORT_TIME_RE.match(_line)
+            if _match:
+                _self, _cumulative, _, _name = _match.groups()
+                _modules.append((_name, int(_self), int(_cumulative)))
+
+        if options['by_package']:
+            _packages = defaultdict(int)
+            for _name, _self, _ in _modules:
+                _packages[_name.split('.')[0]] += _self
+            _rows = sorted(_packages.items(), key=lambda _item: -_item[1])
+            self._print_success(f'\n{"propio ms":>10}  paquete')
+            for _name, _self in _rows[:options['limit']]:
+                self.stdout.write(f'{_self / 1000:10.1f}  {_name}')
+        else:
+            _rows = sorted(_modules, key=lambda _item: -_item[1])
+            self._print_success(f'\n{"propio ms":>10} {"acumulado ms":>13}  módulo')
+            for _name, _self, _cumulative in _rows[:options['limit']]:
+                self.stdout.write(
+                    f'{_self / 1000:10.1f} {_cumulative / 1000:13.1f}  {_name}'
+                )
+        self._print_info('####### Fin de Comando #######')
+
+    def _print_debug(self, text):
+        self.stdout.write(self.style.SQL_TABLE(text))
+
+    def _print_success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def _print_info(self, text):
+        self.stdout.write(self.style.WARNING(text))
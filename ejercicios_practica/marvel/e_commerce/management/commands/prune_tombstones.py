@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from e_commerce.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina los "tombstones" del feed de cambios más viejos que '
+        'E_COMMERCE_CHANGES_RETENTION_DAYS días (o que --days). Se puede '
+        'ejecutar periódicamente, por ejemplo una vez por día con cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            default=settings.E_COMMERCE_CHANGES_RETENTION_DAYS
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self._print_info('####### Inicio de Comando #######')
+        # NOTE: Con menos días que la retención configurada, los cursores
+        # de ese período siguen siendo válidos pero pueden perder borrados.
+        if options['days'] < settings.E_COMMERCE_CHANGES_RETENTION_DAYS:
+            self._print_info(
+                f'--days es menor que E_COMMERCE_CHANGES_RETENTION_DAYS '
+                f'({settings.E_COMMERCE_CHANGES_RETENTION_DAYS}).'
+            )
+        _before = timezone.now() - timedelta(days=options['days'])
+        self._print_debug(f'Eliminando los tombstones anteriores a {_before:%Y-%m-%d %H:%M}')
+        _deleted = prune_tombstones(_before, batch_size=options['batch_size'])
+        self._print_success(f'{_deleted} tombstones eliminados.')
+        self._print_info('####### Fin de Comando #######')
+
+    def _print_debug(self, text):
+        self.stdout.write(self.style.SQL_TABLE(text))
+
+    def _print_success(self, text):
+        self.stdout.write(self.style.SUCCESS(text))
+
+    def _print_info(self, text):
+        self.stdout.write(self.style.WARNING(text))
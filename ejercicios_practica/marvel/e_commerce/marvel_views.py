@@ -1,4 +1,3 @@
-import requests
 import json
 
 from django.conf import settings
@@ -55,6 +54,9 @@ def get_comics(request):
     params['offset'] = offset
     # NOTE: A los parametros de hash, api key y demás,
     # sumamos limit y offset para paginación.
+    # NOTE: `requests` se importa recién acá, no al cargar el URLconf.
+    import requests
+
     res = requests.get(MARVEL_DICT.get('URL'), params=params)
     comics = json.loads(res.text)
 
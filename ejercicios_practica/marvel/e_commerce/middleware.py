@@ -0,0 +1,234 @@
+import zlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+# NOTE: brotli y zstandard son opcionales: si no están instalados esas
+# codificaciones simplemente no se ofrecen.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _GzipCompressor:
+
+    def __init__(self, level):
+        # wbits = 16 + 15: formato gzip (encabezado y CRC).
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Codificaciones disponibles: compresor y nivel por defecto.
+COMPRESSORS = {'gzip': (_GzipCompressor, 6)}
+if brotli is not None:
+    COMPRESSORS['br'] = (_BrotliCompressor, 4)
+if zstandard is not None:
+    COMPRESSORS['zstd'] = (_ZstdCompressor, 3)
+
+# Tipos de contenido que ya vienen comprimidos y no vale la pena recomprimir.
+_COMPRESSED_TYPES = (
+    'image/', 'video/', 'audio/', 'font/woff',
+    'application/zip', 'application/gzip', 'application/x-gzip',
+    'application/x-bzip2', 'application/x-7z-compressed',
+    'application/zstd', 'application/octet-stream', 'application/pdf',
+)
+
+
+def parse_accept_encoding(header):
+    '''
+    Devuelve un diccionario {codificación: q} a partir del header
+    "Accept-Encoding", por ejemplo "br;q=1.0, gzip;q=0.8, *;q=0.1".
+    '''
+    _accepted = {}
+    for _item in header.split(','):
+        _name, _, _params = _item.strip().partition(';')
+        _name = _name.strip().lower()
+        if not _name:
+            continue
+        _q = 1.0
+        # "q" puede venir después de otros parámetros.
+        for _param in _params.split(';'):
+            _key, _, _value = _param.partition('=')
+            if _key.strip().lower() != 'q':
+                continue
+            try:
+                _q = float(_value.strip())
+            except ValueError:
+                _q = 0.0
+            break
+        _accepted[_name] = _q
+    return _accepted
+
+
+def choose_encoding(header, preference=None):
+    '''
+    Elige la codificación con mayor "q" entre las disponibles; a igual "q"
+    se respeta el orden de `E_COMMERCE_COMPRESSION_ENCODINGS`.
+    '''
+    _accepted = parse_accept_encoding(header)
+    _best, _best_q = None, 0.0
+    for _encoding in preference or settings.E_COMMERCE_COMPRESSION_ENCODINGS:
+        if _encoding not in COMPRESSORS:
+            continue
+        _q = _accepted.get(_encoding, _accepted.get('*', 0.0))
+        if _q > _best_q:
+            _best, _best_q = _encoding, _q
+    return _best
+
+
+def get_compressor(encoding, content_type):
+    '''
+    Crea el compresor con el nivel configurado en
+    `E_COMMERCE_COMPRESSION_LEVELS` para el tipo de contenido (o para "*").
+    '''
+    _class, _level = COMPRESSORS[encoding]
+    _levels = settings.E_COMMERCE_COMPRESSION_LEVELS
+    _media_type = content_type.split(';')[0].strip().lower()
+    for _key in (_media_type, '*'):
+        if encoding in _levels.get(_key, {}):
+            _level = _levels[_key][encoding]
+            break
+    return _class(_level)
+
+
+def compression_exempt(view_func):
+    '''
+    Marca una vista para que `CompressionMiddleware` no comprima sus
+    respuestas, igual que `csrf_exempt`. En las vistas basadas en clase
+    alcanza con el atributo `compression_exempt = True`.
+    '''
+    def wrapped_view(*args, **kwargs):
+        return view_func(*args, **kwargs)
+    wrapped_view.compression_exempt = True
+    return wraps(view_func)(wrapped_view)
+
+
+def is_compression_exempt(view_func):
+    return getattr(view_func, 'compression_exempt', False) or getattr(
+        getattr(view_func, 'cls', None), 'compression_exempt', False
+    )
+
+
+def compress_sequence(compressor, sequence):
+    '''
+    Comprime un contenido en partes. Cada parte se envía apenas se
+    comprime ("flush") para no demorar las respuestas en streaming.
+    '''
+    for _chunk in sequence:
+        _data = compressor.compress(_chunk) + compressor.flush()
+        if _data:
+            yield _data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    '''
+    Comprime las respuestas con gzip, brotli ("br") o zstd según el header
+    "Accept-Encoding" del request. Reemplaza a `GZipMiddleware` de Django:
+    - No comprime respuestas menores a `E_COMMERCE_COMPRESSION_MIN_SIZE`
+      bytes, ni contenido que ya está comprimido (imágenes, zip, etc.).
+    - Las respuestas en streaming se comprimen parte por parte.
+    - El nivel de compresión se configura por tipo de contenido en
+      `E_COMMERCE_COMPRESSION_LEVELS`.
+    - Para evitar ataques como BREACH, que deducen un secreto a partir del
+      tamaño de la respuesta comprimida, no se comprimen las respuestas con
+      credenciales: las de vistas marcadas con `compression_exempt` (el
+      login que devuelve el token), las que envían cookies (sesión, CSRF) y
+      las que incluyen el token CSRF en el contenido.
+    '''
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_compression_exempt(view_func):
+            request.compression_exempt = True
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if (
+            getattr(request, 'compression_exempt', False)
+            or response.cookies
+            or request.META.get('CSRF_COOKIE_USED')
+        ):
+            return response
+        if not response.streaming and (
+            len(response.content) < settings.E_COMMERCE_COMPRESSION_MIN_SIZE
+        ):
+            return response
+        _content_type = response.get('Content-Type', '')
+        if _content_type.lower().startswith(_COMPRESSED_TYPES):
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        _encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if _encoding is None:
+            return response
+
+        _compressor = get_compressor(_encoding, _content_type)
+        if response.streaming:
+            response.streaming_content = compress_sequence(
+                _compressor, response.streaming_content
+            )
+            # No sabemos el tamaño final hasta terminar de enviarlo.
+            del response['Content-Length']
+        else:
+            _content = _compressor.compress(response.content) + _compressor.finish()
+            # Sólo usamos el contenido comprimido si realmente es más chico.
+            if len(_content) >= len(response.content):
+                return response
+            response.content = _content
+            response['Content-Length'] = str(len(_content))
+
+        # Igual que `GZipMiddleware`: el ETag fuerte pasa a ser débil, ya que
+        # el contenido enviado cambia según la codificación.
+        _etag = response.get('ETag')
+        if _etag and _etag.startswith('"'):
+            response['ETag'] = 'W/' + _etag
+        response['Content-Encoding'] = _encoding
+        return response
@@ -0,0 +1,184 @@
+# Generated by Django 3.2.2 on 2026-10-19 07:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.db.models.deletion
+
+
+# NOTE: En Postgres los índices se construyen con "CONCURRENTLY" para no
+# bloquear las escrituras sobre la tabla mientras se crean. Esto no puede
+# ejecutarse dentro de una transacción, por eso la migración es no atómica.
+# En el resto de los motores (SQLite) se usa la operación estándar.
+class AddIndexConcurrentlyOnPostgres(migrations.AddIndex):
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(
+                self.index.create_sql(model, schema_editor, concurrently=True)
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute(
+                self.index.remove_sql(model, schema_editor, concurrently=True)
+            )
+
+
+class AddUniqueConstraintConcurrentlyOnPostgres(migrations.AddConstraint):
+    '''
+    En Postgres primero se crea el índice único de forma concurrente y luego
+    se promueve a constraint con "USING INDEX", que sólo toma un lock breve.
+    '''
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        _quote = schema_editor.quote_name
+        _table = _quote(model._meta.db_table)
+        _name = _quote(self.constraint.name)
+        _columns = ', '.join(
+            _quote(model._meta.get_field(field).column)
+            for field in self.constraint.fields
+        )
+        # Si una ejecución anterior falló, CONCURRENTLY deja el índice
+        # creado pero inválido.
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {_name}')
+        schema_editor.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY {_name} ON {_table} ({_columns})'
+        )
+        schema_editor.execute(
+            f'ALTER TABLE {_table} ADD CONSTRAINT {_name} UNIQUE USING INDEX {_name}'
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        _quote = schema_editor.quote_name
+        _name = _quote(self.constraint.name)
+        # El índice pasó a ser del constraint, así que se elimina con él.
+        schema_editor.execute(
+            f'ALTER TABLE {_quote(model._meta.db_table)} DROP CONSTRAINT IF EXISTS {_name}'
+        )
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {_name}')
+
+
+class DropForeignKeyIndexConcurrentlyOnPostgres(migrations.AlterField):
+    '''
+    `AlterField` a `db_index=False` de un FK: en Postgres el índice del FK
+    se elimina (y al revertir se vuelve a crear) de forma concurrente, sin
+    bloquear las escrituras. El resto de la columna no cambia.
+    '''
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        _column = model._meta.get_field(self.name).column
+        for _index_name in schema_editor._constraint_names(
+            model, [_column], index=True, type_=models.Index.suffix
+        ):
+            schema_editor.execute(
+                schema_editor._delete_index_sql(model, _index_name, concurrently=True)
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        schema_editor.execute(schema_editor._create_index_sql(
+            model, fields=[model._meta.get_field(self.name)], concurrently=True
+        ))
+
+
+def merge_duplicated_wishlists(apps, schema_editor):
+    '''
+    Antes de agregar el constraint único unificamos las filas repetidas
+    (user, comic): se conserva la de menor ID sumando las cantidades y
+    manteniendo los flags que estén activos en alguna de ellas.
+    '''
+    WishList = apps.get_model('e_commerce', 'WishList')
+    _duplicated = (
+        WishList.objects.values('user_id', 'comic_id')
+        .annotate(_count=Count('id'), _keep=Min('id'))
+        .filter(_count__gt=1)
+    )
+    for _row in _duplicated:
+        _rows = list(
+            WishList.objects.filter(
+                user_id=_row['user_id'], comic_id=_row['comic_id']
+            ).order_by('id')
+        )
+        _keep, _others = _rows[0], _rows[1:]
+        for _other in _others:
+            _keep.favorite = _keep.favorite or _other.favorite
+            _keep.cart = _keep.cart or _other.cart
+            _keep.wished_qty += _other.wished_qty
+            _keep.bought_qty += _other.bought_qty
+        _keep.save()
+        WishList.objects.filter(id__in=[_other.id for _other in _others]).delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('e_commerce', '0003_auto_20231203_1917'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicated_wishlists,
+            migrations.RunPython.noop,
+            atomic=True,
+        ),
+        AddUniqueConstraintConcurrentlyOnPostgres(
+            model_name='wishlist',
+            constraint=models.UniqueConstraint(fields=('user', 'comic'), name='wish_list_user_comic_uniq'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='wishlist',
+            index=models.Index(condition=models.Q(('cart', True)), fields=['user', 'comic'], name='wish_list_user_cart_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='wishlist',
+            index=models.Index(condition=models.Q(('favorite', True)), fields=['user', 'comic'], name='wish_list_user_fav_idx'),
+        ),
+        # NOTE: Una vez creado el índice único (user, comic) el índice
+        # propio del FK "user" es redundante y sólo encarece las escrituras.
+        DropForeignKeyIndexConcurrentlyOnPostgres(
+            model_name='wishlist',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='wish', to=settings.AUTH_USER_MODEL, verbose_name='user'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.2 on 2026-10-19 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_commerce', '0004_wishlist_unique_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comic',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='updated at'),
+        ),
+    ]
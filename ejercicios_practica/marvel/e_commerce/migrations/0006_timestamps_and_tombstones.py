@@ -0,0 +1,49 @@
+# Generated by Django 3.2.2 on 2026-10-19 07:44
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_commerce', '0005_comic_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(db_column='ID', primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=100, verbose_name='model')),
+                ('object_id', models.BigIntegerField(verbose_name='object id')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='deleted at')),
+            ],
+            options={
+                'verbose_name': 'tombstone',
+                'verbose_name_plural': 'tombstones',
+                'db_table': 'e_commerce_tombstones',
+            },
+        ),
+        migrations.AddField(
+            model_name='comic',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='created at'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='created at'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='updated at'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['model', 'deleted_at', 'id'], name='tombstones_model_deleted_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.dispatch import Signal
+from django.utils import timezone
 
 # NOTE: Para poder utilizar el modelo "user" que viene por defecto en Django,
 # Debemos importarlo previamente:
@@ -12,6 +14,72 @@ from django.db import models
 User = get_user_model()
 
 
+# NOTE: `queryset.update()` y `bulk_create()` no ejecutan las señales
+# `pre_save`/`post_save`, así que emitimos estas señales propias con las
+# filas afectadas para que, por ejemplo, se pueda invalidar la caché.
+# - comics_updated: pares (id, marvel_id) de los comics.
+# - wishlists_updated: IDs de los usuarios dueños de las wish-lists.
+comics_updated = Signal()
+wishlists_updated = Signal()
+
+
+class TimestampedQuerySet(models.QuerySet):
+    '''
+    `auto_now` sólo actúa en `.save()`, por eso en las actualizaciones
+    masivas completamos "updated_at" a mano.
+    '''
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+
+class ComicQuerySet(TimestampedQuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        _objs = super().bulk_create(objs, *args, **kwargs)
+        if _objs:
+            comics_updated.send(
+                sender=self.model,
+                rows=[(_obj.pk, _obj.marvel_id) for _obj in _objs]
+            )
+        return _objs
+
+    def update(self, **kwargs):
+        _rows = list(self.order_by().values_list('id', 'marvel_id'))
+        _updated = super().update(**kwargs)
+        if _rows:
+            if 'marvel_id' in kwargs:
+                # Si cambió el "marvel_id" avisamos también los nuevos valores.
+                _rows += list(
+                    self.model._base_manager.filter(
+                        id__in=[_id for _id, _ in _rows]
+                    ).values_list('id', 'marvel_id')
+                )
+            comics_updated.send(sender=self.model, rows=_rows)
+        return _updated
+
+
+class WishListQuerySet(TimestampedQuerySet):
+
+    def _send_updated(self, user_ids):
+        if user_ids:
+            wishlists_updated.send(sender=self.model, user_ids=user_ids)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        _objs = super().bulk_create(objs, *args, **kwargs)
+        self._send_updated({_obj.user_id for _obj in _objs})
+        return _objs
+
+    def update(self, **kwargs):
+        _user_ids = set(self.order_by().values_list('user_id', flat=True))
+        _updated = super().update(**kwargs)
+        if 'user' in kwargs or 'user_id' in kwargs:
+            _user_ids.add(getattr(kwargs.get('user'), 'pk', kwargs.get('user_id')))
+        self._send_updated(_user_ids)
+        return _updated
+
+
 # Create your models here.
 class Comic(models.Model):
     '''
@@ -33,6 +101,14 @@ class Comic(models.Model):
         verbose_name='stock qty', default=0
     )
     picture = models.URLField(verbose_name='picture', default='')
+    created_at = models.DateTimeField(
+        verbose_name='created at', auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='updated at', auto_now=True, db_index=True
+    )
+
+    objects = ComicQuerySet.as_manager()
 
     class Meta:
         '''
@@ -53,8 +129,11 @@ class Comic(models.Model):
 
 class WishList(models.Model):
     id = models.BigAutoField(db_column='ID', primary_key=True)
+    # NOTE: El índice del FK queda cubierto por el índice único
+    # (user, comic), por eso no se crea uno propio.
     user = models.ForeignKey(
-        User, verbose_name='user', on_delete=models.CASCADE, related_name='wish'
+        User, verbose_name='user', on_delete=models.CASCADE,
+        related_name='wish', db_index=False
     )
     comic = models.ForeignKey(
         Comic, verbose_name='comic', on_delete=models.CASCADE,
@@ -67,11 +146,70 @@ class WishList(models.Model):
     bought_qty = models.PositiveIntegerField(
         verbose_name='bought qty', default=0
     )
+    created_at = models.DateTimeField(
+        verbose_name='created at', auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='updated at', auto_now=True, db_index=True
+    )
+
+    objects = WishListQuerySet.as_manager()
 
     class Meta:
         db_table = 'e_commerce_wish_list'
         verbose_name = 'wish list'
         verbose_name_plural = 'wish lists'
+        # NOTE: Un usuario sólo puede tener una fila por comic. El índice
+        # único (user, comic) además cubre las búsquedas por usuario.
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'comic'), name='wish_list_user_comic_uniq'
+            ),
+        ]
+        # NOTE: Índices parciales para los filtros más usados: "el carrito
+        # de un usuario" y "los favoritos de un usuario". Sólo indexan las
+        # filas con el flag activo y ya incluyen el comic, por lo que la
+        # búsqueda se resuelve sin leer la tabla.
+        indexes = [
+            models.Index(
+                fields=('user', 'comic'),
+                condition=models.Q(cart=True),
+                name='wish_list_user_cart_idx'
+            ),
+            models.Index(
+                fields=('user', 'comic'),
+                condition=models.Q(favorite=True),
+                name='wish_list_user_fav_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.id}: {self.user.username} - {self.comic.title}'
+
+
+class Tombstone(models.Model):
+    '''
+    Registro de las filas eliminadas, para que el feed de cambios pueda
+    informar los borrados. "model" es el label del modelo, por ejemplo
+    "e_commerce.comic", y "object_id" la clave primaria de la fila borrada.
+    '''
+    id = models.BigAutoField(db_column='ID', primary_key=True)
+    model = models.CharField(verbose_name='model', max_length=100)
+    object_id = models.BigIntegerField(verbose_name='object id')
+    deleted_at = models.DateTimeField(
+        verbose_name='deleted at', auto_now_add=True
+    )
+
+    class Meta:
+        db_table = 'e_commerce_tombstones'
+        verbose_name = 'tombstone'
+        verbose_name_plural = 'tombstones'
+        indexes = [
+            models.Index(
+                fields=('model', 'deleted_at', 'id'),
+                name='tombstones_model_deleted_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.model}: {self.object_id}'
@@ -0,0 +1,265 @@
+import hashlib
+import inspect
+import os
+import sys
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils.functional import cached_property
+from django.views.decorators.csrf import csrf_exempt
+
+from rest_framework.request import Request
+
+from e_commerce.api.mixins import conditional_response
+
+
+# NOTE: drf-yasg genera el esquema OpenAPI recorriendo todas las vistas y
+# serializadores en cada request a la documentación. Como el esquema sólo
+# cambia cuando cambia el código, lo generamos una vez, lo guardamos en un
+# archivo cuyo nombre lleva un hash de las rutas y del código de las vistas
+# y serializadores ("fingerprint"), y lo servimos desde ahí con ETag.
+# Se puede generar antes de levantar el servidor con
+# `python manage.py build_openapi_schema`.
+# drf-yasg (y con él ruamel.yaml, pygments, etc.) se importa recién en el
+# primer request a la documentación, así no demora el arranque de los
+# workers (ver `python manage.py profile_startup`).
+
+_lock = threading.Lock()
+_schemas = {}
+_schema_view = None
+
+
+def walk_patterns(patterns, prefix=''):
+    '''
+    Recorre el URLconf y devuelve pares (ruta, callback) de cada URL.
+    '''
+    for _pattern in patterns:
+        if isinstance(_pattern, URLResolver):
+            yield from walk_patterns(
+                _pattern.url_patterns, prefix + str(_pattern.pattern)
+            )
+        elif isinstance(_pattern, URLPattern):
+            yield prefix + str(_pattern.pattern), _pattern.callback
+
+
+def get_view_class(callback):
+    return getattr(callback, 'cls', None) or getattr(callback, 'view_class', None)
+
+
+# Atributos de las vistas cuyas clases cambian el esquema (consumes,
+# produces, seguridad, parámetros de filtrado y paginado).
+_VIEW_CLASS_ATTRIBUTES = (
+    'renderer_classes',
+    'parser_classes',
+    'authentication_classes',
+    'permission_classes',
+    'filter_backends',
+)
+
+
+def _schema_modules(view_class):
+    '''
+    Módulos de los que depende el esquema de la vista: el de la vista (con
+    sus `get_serializer_class()` y `swagger_auto_schema`), el de su
+    serializador y el de los modelos, y los de sus renderers, parsers, etc.
+    '''
+    _modules = {view_class.__module__}
+    _serializer_class = getattr(view_class, 'serializer_class', None)
+    if _serializer_class is not None:
+        _modules.add(_serializer_class.__module__)
+        _model = getattr(getattr(_serializer_class, 'Meta', None), 'model', None)
+        if _model is not None:
+            _modules.add(_model.__module__)
+    _queryset = getattr(view_class, 'queryset', None)
+    if _queryset is not None:
+        _modules.add(_queryset.model.__module__)
+    for _attribute in _VIEW_CLASS_ATTRIBUTES:
+        for _class in getattr(view_class, _attribute, None) or ():
+            _modules.add(getattr(_class, '__module__', None))
+    _pagination_class = getattr(view_class, 'pagination_class', None)
+    if _pagination_class is not None:
+        _modules.add(_pagination_class.__module__)
+    _modules.discard(None)
+    return _modules
+
+
+def schema_fingerprint():
+    '''
+    Hash de las rutas del URLconf y del código fuente de los módulos de los
+    que depende el esquema (ver `_schema_modules()`), más la versión de
+    drf-yasg, `SWAGGER_SETTINGS` y `REST_FRAMEWORK`. Se calcula una sola vez
+    por proceso.
+    '''
+    import drf_yasg
+
+    if 'fingerprint' in _schemas:
+        return _schemas['fingerprint']
+    _hash = hashlib.md5()
+    _modules = set()
+    for _route, _callback in walk_patterns(get_resolver().url_patterns):
+        _class = get_view_class(_callback)
+        _target = _class or _callback
+        _hash.update(f'{_route}:{_target.__module__}.{_target.__qualname__}\n'.encode())
+        _modules.add(_target.__module__)
+        if _class is not None:
+            _modules |= _schema_modules(_class)
+    for _module in sorted(_modules):
+        try:
+            _hash.update(Path(inspect.getfile(sys.modules[_module])).read_bytes())
+        except (KeyError, TypeError, OSError):
+            continue
+    _hash.update(repr((
+        drf_yasg.__version__,
+        getattr(settings, 'SWAGGER_SETTINGS', {}),
+        getattr(settings, 'REST_FRAMEWORK', {}),
+    )).encode())
+    _schemas['fingerprint'] = _hash.hexdigest()
+    return _schemas['fingerprint']
+
+
+def schema_path():
+    return (
+        Path(settings.E_COMMERCE_OPENAPI_SCHEMA_DIR)
+        / f'openapi-{schema_fingerprint()}.json'
+    )
+
+
+def build_schema(schema_view=None):
+    '''
+    Genera el esquema (JSON) con la vista creada por
+    `get_cached_schema_view()` y lo guarda en `schema_path()`. El archivo se
+    escribe en uno temporal y se reemplaza, así otros procesos nunca leen
+    uno incompleto.
+    '''
+    from drf_yasg.renderers import SwaggerJSONRenderer
+
+    _view = (schema_view or _schema_view).view_class
+    # Algunas vistas leen el request al generar el esquema, así que usamos
+    # un GET anónimo. Si no se indicó `url` se quitan el host y el esquema
+    # (http/https): sin ellos Swagger y Redoc usan los de la página.
+    _request = HttpRequest()
+    _request.method = 'GET'
+    _generator = _view.generator_class(
+        _view.info, '', _view.url or 'http://localhost/'
+    )
+    _schema = _generator.get_schema(Request(_request), public=True)
+    if _view.url is None:
+        _schema.pop('host', None)
+        _schema.pop('schemes', None)
+    _content = SwaggerJSONRenderer().render(_schema)
+    _path = schema_path()
+    _path.parent.mkdir(parents=True, exist_ok=True)
+    _tmp = _path.with_name(f'{_path.name}.{os.getpid()}.tmp')
+    _tmp.write_bytes(_content)
+    os.replace(_tmp, _path)
+    return _path
+
+
+def get_schema(schema_view=None):
+    '''
+    Devuelve el esquema como (contenido, ETag, timestamp). Se lee del
+    archivo la primera vez (generándolo si no existe) y queda en memoria.
+    '''
+    _entry = _schemas.get('schema')
+    if _entry is not None:
+        return _entry
+    with _lock:
+        _entry = _schemas.get('schema')
+        if _entry is None:
+            _path = schema_path()
+            if not _path.exists():
+                build_schema(schema_view)
+            _content = _path.read_bytes()
+            _entry = _schemas['schema'] = (
+                _content,
+                f'"{hashlib.md5(_content).hexdigest()}"',
+                _path.stat().st_mtime,
+            )
+    return _entry
+
+
+class LazySchemaView:
+    '''
+    Reemplazo de la clase que devuelve `drf_yasg.views.get_schema_view()`
+    con los mismos `with_ui()` / `without_ui()`, pero la vista real se crea
+    (e importa drf-yasg) en el primer request. `info` puede ser el
+    `openapi.Info` o una función que lo devuelva.
+    El esquema en JSON ("?format=openapi", "swagger.json") se sirve desde
+    el archivo generado, con ETag / Last-Modified (sólo con `public=True`).
+    Las UIs (Swagger, Redoc) no necesitan introspección y el YAML se sigue
+    generando en cada request.
+    '''
+
+    def __init__(self, info, url=None, **kwargs):
+        self._info = info
+        self._url = url
+        self._kwargs = kwargs
+
+    @cached_property
+    def view_class(self):
+        from drf_yasg.views import get_schema_view
+
+        _info = self._info() if callable(self._info) else self._info
+        _base = get_schema_view(_info, url=self._url, **self._kwargs)
+        _lazy_view = self
+
+        class CachedSchemaView(_base):
+            info = _info
+            url = _lazy_view._url
+
+            def get(self, request, version='', format=None):
+                _renderer = request.accepted_renderer
+                # NOTE: El esquema no público depende del usuario, no se cachea.
+                if (
+                    not self.public
+                    or _renderer.format not in ('openapi', '.json')
+                    or request.version or version
+                ):
+                    return super().get(request, version, format)
+                _content, _etag, _modified = get_schema(_lazy_view)
+                return conditional_response(
+                    request._request,
+                    _etag,
+                    _modified,
+                    lambda: HttpResponse(_content, content_type=_renderer.media_type)
+                )
+
+        return CachedSchemaView
+
+    def _lazy(self, method, *args):
+        _views = []
+
+        @csrf_exempt
+        def view(request, *view_args, **view_kwargs):
+            if not _views:
+                _views.append(getattr(self.view_class, method)(*args))
+            return _views[0](request, *view_args, **view_kwargs)
+        return view
+
+    def with_ui(self, renderer='swagger', cache_timeout=0, cache_kwargs=None):
+        return self._lazy('with_ui', renderer, cache_timeout, cache_kwargs)
+
+    def without_ui(self, cache_timeout=0, cache_kwargs=None):
+        return self._lazy('without_ui', cache_timeout, cache_kwargs)
+
+
+def get_cached_schema_view(info, url=None, **kwargs):
+    '''
+    Igual que `drf_yasg.views.get_schema_view()` pero devuelve una
+    `LazySchemaView`, ver más arriba.
+    '''
+    global _schema_view
+    _schema_view = LazySchemaView(info, url=url, **kwargs)
+    return _schema_view
+
+
+def get_registered_schema_view():
+    '''
+    Vista creada con `get_cached_schema_view()` en el URLconf del proyecto.
+    '''
+    # Fuerza la importación del URLconf, que es donde se crea la vista.
+    get_resolver().url_patterns
+    return _schema_view
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from e_commerce.cache import (
+    bump_catalog_version,
+    invalidate_comics,
+    invalidate_wishlist_comic_ids
+)
+from e_commerce.models import (
+    Comic,
+    Tombstone,
+    WishList,
+    comics_updated,
+    wishlists_updated
+)
+
+
+# NOTE: Estas funciones se ejecutan cada vez que se guarda o se elimina
+# una instancia del modelo. Se registran en `ECommerceConfig.ready()`.
+@receiver(post_save, sender=WishList)
+@receiver(post_delete, sender=WishList)
+def wishlist_changed(sender, instance, **kwargs):
+    invalidate_wishlist_comic_ids(instance.user_id)
+
+
+@receiver(post_save, sender=Comic)
+@receiver(post_delete, sender=Comic)
+def comic_changed(sender, instance, **kwargs):
+    invalidate_comics([(instance.pk, instance.marvel_id)])
+    bump_catalog_version()
+
+
+# Escrituras masivas: `Comic.objects.filter(...).update()` y `bulk_create()`.
+@receiver(comics_updated, sender=Comic)
+def comics_bulk_updated(sender, rows, **kwargs):
+    invalidate_comics(rows)
+    bump_catalog_version()
+
+
+@receiver(wishlists_updated, sender=WishList)
+def wishlists_bulk_updated(sender, user_ids, **kwargs):
+    for _user_id in user_ids:
+        invalidate_wishlist_comic_ids(_user_id)
+
+
+# NOTE: Guardamos una "lápida" por cada fila borrada para que el feed de
+# cambios (`ChangesAPIView`) pueda informar los borrados.
+@receiver(post_delete, sender=Comic)
+@receiver(post_delete, sender=WishList)
+def create_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(
+        model=sender._meta.label_lower, object_id=instance.pk
+    )
+
+
+# NOTE: Con los valores por defecto de SQLite (journal "delete") un
+# escritor bloquea a todos los lectores y viceversa. Con WAL los lectores
+# no bloquean al escritor ni esperan por él, y con synchronous=NORMAL cada
+# commit no espera a que el disco confirme la escritura (en WAL sigue
+# siendo seguro ante caídas del proceso). Los valores se configuran en
+# `E_COMMERCE_SQLITE_PRAGMAS`.
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    _pragmas = settings.E_COMMERCE_SQLITE_PRAGMAS
+    if connection.vendor != 'sqlite' or not _pragmas:
+        return
+    with connection.cursor() as _cursor:
+        for _name, _value in _pragmas.items():
+            _cursor.execute(f'PRAGMA {_name} = {_value}')
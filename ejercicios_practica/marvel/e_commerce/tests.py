@@ -1,15 +1,57 @@
+import csv
+import gzip
+import importlib
+import io
+import json
+import msgpack
+import psycopg2.extensions
 import pytest
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse, NoReverseMatch
+from django.utils import timezone
 
 from rest_framework import status
+from rest_framework.exceptions import ParseError
 from rest_framework.generics import ListAPIView
+from rest_framework.renderers import JSONRenderer
 from rest_framework.routers import DefaultRouter
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
 from rest_framework.viewsets import ModelViewSet
 
+from e_commerce.api import batch
+from e_commerce.api.compiled import (
+    CompiledRepresentationMixin,
+    compile_values_representation
+)
+from e_commerce.api import parsers
+from e_commerce.api import renderers
 from e_commerce.api import routers
+from e_commerce.api import serializers
 from e_commerce.api import views
 from e_commerce.api import viewsets
+from e_commerce import middleware
+from e_commerce import cache as cache_module
+from e_commerce import changes
+from e_commerce import imports
+from e_commerce import openapi
+from e_commerce import warmup
+from e_commerce.db.backends.postgresql import base as pg_base
+from e_commerce.db.pool import ConnectionPool, PoolTimeout
+from e_commerce.cache import get_comic_entry, get_wishlist_comic_ids
+from e_commerce.models import Tombstone, User
 from pytest_fixtures import *
 
 
@@ -48,7 +90,7 @@ def test_wishlist_viewset(client, create_wishlist, get_token):
     client.force_login(_wish_list.user)
     response = client.get(
         endpoint,
-        {"username": f'{_wish_list.user.username}'},
+        {"username": f'{_wish_list.user.username}', 'expand': 'user,comic'},
         HTTP_AUTHORIZATION=f'Token {_token.key}'
     )
     _data = response.json()
@@ -108,3 +150,1295 @@ def test_comics_user(client, create_wishlist, get_token):
     assert response.status_code == status.HTTP_200_OK, f'Ocurrió un error: {_data}'
     assert 'results' in _data, 'La API no está paginando.'
     assert _data.get('results') != [], f'La API no está buscando por el campo "search".'
+
+
+def _explain(queryset):
+    '''
+    Devuelve el plan de ejecución de la query. En Postgres deshabilitamos el
+    "seq scan" porque con tablas tan chicas el planner siempre lo prefiere,
+    sólo dentro de esta transacción (SET LOCAL) para no afectar a otros tests.
+    '''
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+@pytest.mark.django_db
+def test_wishlist_unique_user_comic(create_wishlist):
+    _wish_list = create_wishlist()
+    with pytest.raises(IntegrityError):
+        with transaction.atomic():
+            create_wishlist()
+    assert WishList.objects.filter(user=_wish_list.user).count() == 1
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('flag, index_name', [
+    ('cart', 'wish_list_user_cart_idx'),
+    ('favorite', 'wish_list_user_fav_idx'),
+])
+def test_wishlist_flag_lookups_use_index(create_wishlist, flag, index_name):
+    _wish_list = create_wishlist()
+    _plan = _explain(
+        WishList.objects.filter(user_id=_wish_list.user_id, **{flag: True})
+    )
+    assert index_name in _plan, f'La búsqueda por "{flag}" no usa el índice: {_plan}'
+
+
+@pytest.mark.django_db
+def test_wishlist_me(client, create_wishlist, create_user):
+    _wish_list = create_wishlist()
+    WishList.objects.create(user=create_user(), comic=_wish_list.comic)
+    _token, _ = Token.objects.get_or_create(user=_wish_list.user)
+    endpoint = reverse('wishlist-me')
+
+    with CaptureQueriesContext(connection) as _queries:
+        response = client.get(
+            endpoint, {'cart': '1'}, HTTP_AUTHORIZATION=f'Token {_token.key}'
+        )
+    _data = response.json()
+    assert response.status_code == status.HTTP_200_OK, f'Ocurrió un error: {_data}'
+    assert _data['count'] == 1, 'Sólo debe listar la wish-list del usuario autenticado.'
+    assert _data['results'][0]['comic']['marvel_id'] == _wish_list.comic.marvel_id
+    _sql = [
+        _query['sql'] for _query in _queries.captured_queries
+        if 'FROM "e_commerce_wish_list"' in _query['sql']
+    ]
+    assert _sql and all('auth_user' not in _query for _query in _sql), _sql
+
+    response = client.get(
+        endpoint, {'cart': '0'}, HTTP_AUTHORIZATION=f'Token {_token.key}'
+    )
+    assert response.json()['count'] == 0
+
+
+@pytest.mark.django_db
+def test_comics_user_only_lists_wishlisted_comics(client, create_wishlist):
+    _wish_list = create_wishlist()
+    _other_comic = Comic.objects.create(marvel_id=1, title='Otro comic')
+    _token, _ = Token.objects.get_or_create(user=_wish_list.user)
+    endpoint = reverse(
+        'comic_list_user', kwargs={'username': _wish_list.user.username}
+    )
+    response = client.get(endpoint, HTTP_AUTHORIZATION=f'Token {_token.key}')
+    _data = response.json()
+    assert response.status_code == status.HTTP_200_OK, f'Ocurrió un error: {_data}'
+    assert [_comic['marvel_id'] for _comic in _data['results']] == [
+        _wish_list.comic.marvel_id
+    ]
+    assert get_wishlist_comic_ids(_wish_list.user_id) == [_wish_list.comic_id]
+
+    # Al modificar la wish-list se invalida la caché de IDs.
+    WishList.objects.create(user=_wish_list.user, comic=_other_comic)
+    response = client.get(endpoint, HTTP_AUTHORIZATION=f'Token {_token.key}')
+    assert response.json()['count'] == 2
+
+
+@pytest.mark.django_db
+def test_wishlist_ids_invalidated_on_commit(
+    create_wishlist, django_capture_on_commit_callbacks
+):
+    _wish_list = create_wishlist()
+    _other_comic = Comic.objects.create(marvel_id=1, title='Otro comic')
+    _key = cache_module._wishlist_comic_ids_key(_wish_list.user_id)
+    assert get_wishlist_comic_ids(_wish_list.user_id) == [_wish_list.comic_id]
+    _stale = cache.get(_key)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            WishList.objects.create(user=_wish_list.user, comic=_other_comic)
+            # Un lector que consultó antes del commit vuelve a guardar
+            # los IDs viejos.
+            cache.set(_key, _stale)
+    assert sorted(get_wishlist_comic_ids(_wish_list.user_id)) == sorted(
+        [_wish_list.comic_id, _other_comic.id]
+    )
+
+
+@pytest.mark.django_db
+def test_comics_user_many_wishlisted_comics(client, create_wishlist, settings):
+    _wish_list = create_wishlist()
+    _other_comic = Comic.objects.create(marvel_id=1, title='Otro comic')
+    WishList.objects.create(user=_wish_list.user, comic=_other_comic)
+    settings.E_COMMERCE_WISHLIST_IDS_MAX_IN = 1
+    _token, _ = Token.objects.get_or_create(user=_wish_list.user)
+    endpoint = reverse(
+        'comic_list_user', kwargs={'username': _wish_list.user.username}
+    )
+    with CaptureQueriesContext(connection) as _queries:
+        response = client.get(endpoint, HTTP_AUTHORIZATION=f'Token {_token.key}')
+    assert response.json()['count'] == 2
+    assert any('FROM "e_commerce_wish_list"' in _query['sql'].split(' IN ', 1)[-1]
+               for _query in _queries.captured_queries)
+
+
+def _comic_queries(queries):
+    return [
+        _query['sql'] for _query in queries.captured_queries
+        if 'FROM "e_commerce_comics"' in _query['sql']
+    ]
+
+
+@pytest.mark.django_db
+def test_comic_detail_cache(client, create_comic, create_user):
+    _comic = create_comic()
+    client.force_login(create_user())
+    _by_pk = f'/e-commerce/api/comics/{_comic.pk}/'
+    _by_marvel_id = f'/e-commerce/api/comics/comic/{_comic.marvel_id}/'
+
+    assert client.get(_by_pk).json()['title'] == _comic.title
+    # El comic quedó en caché bajo ambas claves.
+    with CaptureQueriesContext(connection) as _queries:
+        assert client.get(_by_pk).status_code == status.HTTP_200_OK
+        assert client.get(_by_marvel_id).json()['title'] == _comic.title
+    assert _comic_queries(_queries) == [], 'El detalle debería leerse de la caché.'
+
+    # Se invalida al guardar la instancia...
+    _comic.title = 'Nuevo título'
+    _comic.save()
+    assert client.get(_by_marvel_id).json()['title'] == 'Nuevo título'
+    # ...y también con las actualizaciones masivas.
+    Comic.objects.filter(pk=_comic.pk).update(price=99.0)
+    assert client.get(_by_pk).json()['price'] == 99.0
+
+    _comic.delete()
+    assert client.get(_by_pk).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_comic_cache_coalesces_concurrent_misses():
+    _calls = []
+
+    def _loader():
+        _calls.append(1)
+        time.sleep(0.05)
+        _instance = SimpleNamespace(pk=1, marvel_id=10, updated_at=timezone.now())
+        return _instance, {'marvel_id': 10}
+
+    _threads = [
+        threading.Thread(target=get_comic_entry, args=('pk', 1, _loader))
+        for _ in range(8)
+    ]
+    for _thread in _threads:
+        _thread.start()
+    for _thread in _threads:
+        _thread.join()
+    assert len(_calls) == 1, 'Los "misses" simultáneos deberían agruparse.'
+
+
+def _content(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def _catalog_queries(queries):
+    '''
+    Consultas a la tabla de comics sin contar la del estado del catálogo,
+    que con una caché local se calcula desde la base (ver
+    `E_COMMERCE_SHARED_CACHE`).
+    '''
+    return [
+        _sql for _sql in _comic_queries(queries)
+        if 'MAX("e_commerce_comics"."updated_at")' not in _sql
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('shared_cache', [False, True])
+@pytest.mark.parametrize('endpoint', [
+    '/e-commerce/api/comics/list/',
+    '/e-commerce/api/comic-list/',
+])
+def test_catalog_list_cache(client, create_comic, create_user, settings, endpoint, shared_cache):
+    settings.E_COMMERCE_SHARED_CACHE = shared_cache
+    _comic = create_comic()
+    client.force_login(create_user())
+    _headers = {'HTTP_ACCEPT': 'application/json'}
+    _first = client.get(endpoint, {'page': 1}, **_headers)
+    assert _first.status_code == status.HTTP_200_OK
+    _first_content = _content(_first)
+
+    with CaptureQueriesContext(connection) as _queries:
+        _second = client.get(endpoint, {'page': 1}, **_headers)
+    assert _catalog_queries(_queries) == [], 'El listado debería leerse de la caché.'
+    if shared_cache:
+        assert _comic_queries(_queries) == []
+    assert _content(_second) == _first_content
+    if not shared_cache:
+        # Otro worker (con su propia caché) responde con el mismo ETag.
+        cache.clear()
+        assert client.get(endpoint, {'page': 1}, **_headers)['ETag'] == _first['ETag']
+
+    # Cualquier escritura sobre los comics cambia la versión del catálogo.
+    Comic.objects.filter(pk=_comic.pk).update(title='Nuevo título')
+    _response = client.get(endpoint, {'page': 1}, **_headers)
+    assert 'Nuevo título'.encode() in _content(_response)
+
+
+@pytest.mark.django_db
+def test_comic_conditional_get(client, create_comic, create_user):
+    _comic = create_comic()
+    client.force_login(create_user())
+    _headers = {'HTTP_ACCEPT': 'application/json'}
+    for endpoint in (
+        f'/e-commerce/api/comics/{_comic.pk}/',
+        '/e-commerce/api/comics/list/',
+        '/e-commerce/api/comic-list/',
+    ):
+        response = client.get(endpoint, **_headers)
+        _etag = response['ETag']
+        _last_modified = response['Last-Modified']
+        assert _etag.startswith('"'), 'El ETag debería ser fuerte.'
+
+        with CaptureQueriesContext(connection) as _queries:
+            response = client.get(endpoint, HTTP_IF_NONE_MATCH=_etag, **_headers)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED, endpoint
+        assert _catalog_queries(_queries) == []
+        response = client.get(
+            endpoint, HTTP_IF_MODIFIED_SINCE=_last_modified, **_headers
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED, endpoint
+
+    # Al modificar el comic cambian los validadores.
+    _etag = client.get(f'/e-commerce/api/comics/{_comic.pk}/', **_headers)['ETag']
+    Comic.objects.filter(pk=_comic.pk).update(stock_qty=1)
+    response = client.get(
+        f'/e-commerce/api/comics/{_comic.pk}/', HTTP_IF_NONE_MATCH=_etag, **_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] != _etag
+
+
+@pytest.mark.django_db
+def test_changes_feed(admin_client, create_comic, settings):
+    settings.E_COMMERCE_CHANGES_SETTLE_SECONDS = 0
+    endpoint = reverse('changes')
+    _comic = create_comic()
+    _other = Comic.objects.create(marvel_id=1, title='Otro comic')
+
+    _data = admin_client.get(endpoint, {'limit': 1}).json()
+    assert [_event['id'] for _event in _data['results']] == [_comic.id]
+    _data = admin_client.get(endpoint, {'since': _data['next']}).json()
+    assert [_event['id'] for _event in _data['results']] == [_other.id]
+    _cursor = _data['next']
+
+    # Sin cambios nuevos el feed viene vacío y el cursor avanza hasta el
+    # momento de la consulta, así no expira en una réplica que está al día.
+    _before = timezone.now()
+    _data = admin_client.get(endpoint, {'since': _cursor}).json()
+    assert _data['results'] == []
+    _micros, _, _ = changes.decode_cursor(_data['next'])
+    assert _micros >= changes.decode_cursor(_cursor)[0]
+    assert changes._from_micros(_micros) >= _before
+    _cursor = _data['next']
+
+    # Las actualizaciones masivas y los borrados también aparecen.
+    _other_id = _other.id
+    Comic.objects.filter(pk=_comic.pk).update(stock_qty=1)
+    _other.delete()
+    _data = admin_client.get(endpoint, {'since': _cursor}).json()
+    assert [(_event['op'], _event['id']) for _event in _data['results']] == [
+        ('upsert', _comic.id), ('delete', _other_id)
+    ]
+    assert _data['results'][0]['data']['stock_qty'] == 1
+
+    response = admin_client.get(endpoint, {'since': 'cursor-invalido'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_prune_tombstones(admin_client, create_comic, settings):
+    settings.E_COMMERCE_CHANGES_SETTLE_SECONDS = 0
+    settings.E_COMMERCE_CHANGES_RETENTION_DAYS = 30
+    _old, _recent = create_comic(), Comic.objects.create(marvel_id=1, title='Otro comic')
+    _old_id, _recent_id = _old.pk, _recent.pk
+    _cursor = admin_client.get(reverse('changes')).json()['next']
+    _old.delete()
+    _recent.delete()
+    Tombstone.objects.filter(object_id=_old_id).update(
+        deleted_at=timezone.now() - timedelta(days=31)
+    )
+    # El cursor de hace más de 30 días ya no es válido.
+    response = admin_client.get(
+        reverse('changes'), {'since': changes.encode_cursor((0, 0, 0))}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'expiró' in response.json()['since']
+
+    _stdout = io.StringIO()
+    call_command('prune_tombstones', '--batch-size', '1', stdout=_stdout)
+    assert '1 tombstones eliminados.' in _stdout.getvalue()
+    assert list(Tombstone.objects.values_list('object_id', flat=True)) == [_recent_id]
+    _data = admin_client.get(reverse('changes'), {'since': _cursor}).json()
+    assert _data['results'] == [{'op': 'delete', 'id': _recent_id}]
+
+
+@pytest.mark.django_db
+def test_comic_list_is_streamed_in_one_query(client, create_user, settings):
+    settings.E_COMMERCE_STREAM_CHUNK_SIZE = 2
+    Comic.objects.bulk_create([
+        Comic(marvel_id=_marvel_id, title=f'Comic {_marvel_id}')
+        for _marvel_id in range(5)
+    ])
+    client.force_login(create_user())
+    with CaptureQueriesContext(connection) as _queries:
+        response = client.get('/e-commerce/api/comic-list/')
+        _data = json.loads(_content(response))
+    assert response.streaming, 'El listado debería enviarse en partes.'
+    assert len(_catalog_queries(_queries)) == 1
+    assert [_row['marvel_id'] for _row in _data] == list(range(5))
+    assert list(_data[0]) == list(Comic.objects.values()[0])
+
+    Comic.objects.all().delete()
+    response = client.get('/e-commerce/api/comic-list/')
+    assert json.loads(_content(response)) == []
+
+    # Con MessagePack el listado no se envía en partes, pero tiene los mismos datos.
+    Comic.objects.create(marvel_id=1, title='Comic 1')
+    _json = json.loads(_content(client.get('/e-commerce/api/comic-list/')))
+    response = client.get('/e-commerce/api/comic-list/', HTTP_ACCEPT='application/msgpack')
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'] == 'application/msgpack'
+    _data = msgpack.unpackb(response.content)
+    assert [_row['marvel_id'] for _row in _data] == [_row['marvel_id'] for _row in _json]
+    assert list(_data[0]) == list(_json[0])
+
+
+@pytest.mark.django_db
+def test_export_endpoint(admin_client, settings):
+    settings.E_COMMERCE_STREAM_CHUNK_SIZE = 2
+    Comic.objects.bulk_create([
+        Comic(marvel_id=_marvel_id, title=f'Comic, "{_marvel_id}"')
+        for _marvel_id in range(5)
+    ])
+    endpoint = reverse('export', kwargs={'table': 'comics'})
+
+    response = admin_client.get(endpoint)
+    assert response.streaming
+    assert response['Content-Type'] == 'application/x-ndjson'
+    _rows = [json.loads(_line) for _line in _content(response).splitlines()]
+    assert [_row['marvel_id'] for _row in _rows] == list(range(5))
+
+    _ids = list(Comic.objects.order_by('id').values_list('id', flat=True))
+    response = admin_client.get(
+        endpoint, {'output': 'csv', 'pk_gte': _ids[1], 'pk_lt': _ids[3]}
+    )
+    _lines = list(csv.reader(io.StringIO(_content(response).decode())))
+    assert _lines[0] == [_field.attname for _field in Comic._meta.concrete_fields]
+    assert [_line[2] for _line in _lines[1:]] == ['Comic, "1"', 'Comic, "2"']
+
+    response = admin_client.get(reverse('export', kwargs={'table': 'users'}))
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_export_table_command(tmp_path, create_wishlist):
+    create_wishlist()
+    _path = tmp_path / 'wishlists.csv'
+    _out = io.StringIO()
+    call_command(
+        'export_table', 'wishlists', '--output-format=csv',
+        f'--path={_path}', stdout=_out
+    )
+    _lines = _path.read_text().splitlines()
+    assert len(_lines) == 2, 'Debería haber encabezado y una fila.'
+    assert '1 filas exportadas' in _out.getvalue()
+
+    # Con la tabla vacía y varios workers igual se escribe un archivo.
+    WishList.objects.all().delete()
+    call_command(
+        'export_table', 'wishlists', '--output-format=csv', '--workers=2',
+        f'--path={_path}', stdout=io.StringIO()
+    )
+    _part = tmp_path / 'wishlists.part-000.csv'
+    assert _part.read_text().splitlines() == [_lines[0]]
+    assert not (tmp_path / 'wishlists.part-001.csv').exists()
+
+
+@pytest.mark.django_db
+def test_import_comics_command(tmp_path, create_comic):
+    _comic = create_comic()
+    get_comic_entry('pk', _comic.pk, lambda: (_comic, {}))
+    _path = tmp_path / 'comics.csv'
+    _path.write_text(
+        'marvel_id,title,price\n'
+        f'{_comic.marvel_id},Nuevo titulo,1.5\n'
+        '1,Comic 1,\n'
+        '2,Comic 2,2\n'
+        'x,Comic invalido,2\n'
+        '3,Comic 3,3\n'
+    )
+    with pytest.raises(CommandError):
+        call_command('import_comics', str(_path), '--batch-size=2', stdout=io.StringIO())
+    # Los lotes anteriores al error quedan importados y se guarda el avance.
+    assert Comic.objects.count() == 2
+    _comic.refresh_from_db()
+    assert (_comic.title, _comic.price) == ('Nuevo titulo', 1.5)
+    assert _comic.updated_at > _comic.created_at
+    _loads = []
+    get_comic_entry('pk', _comic.pk, lambda: _loads.append(_comic) or (_comic, {}))
+    assert _loads == [_comic]
+    assert (tmp_path / 'comics.csv.checkpoint').read_text() == '2'
+
+    _path.write_text(_path.read_text().replace('x,', '4,'))
+    call_command('import_comics', str(_path), '--resume', '--batch-size=2', stdout=io.StringIO())
+    assert sorted(Comic.objects.values_list('marvel_id', flat=True)) == [
+        1, 2, 3, 4, _comic.marvel_id
+    ]
+    assert not (tmp_path / 'comics.csv.checkpoint').exists()
+
+    # JSON mal formado o codificación inválida: error con el número de registro.
+    _path = tmp_path / 'comics.ndjson'
+    _path.write_text('{"marvel_id": 5}\n{"marvel_id": \n')
+    with pytest.raises(CommandError, match='Registro 2: JSON no válido'):
+        call_command('import_comics', str(_path), stdout=io.StringIO())
+    _path.write_bytes(b'{"marvel_id": 5, "title": "\xff"}\n')
+    with pytest.raises(CommandError, match='Registro 1: el archivo no es UTF-8'):
+        call_command('import_comics', str(_path), stdout=io.StringIO())
+
+
+@pytest.mark.django_db
+def test_import_batch_orm_fallback(create_comic, monkeypatch):
+    # Otras bases de datos usan el ORM en lugar del SQL propio.
+    monkeypatch.setattr(imports, '_MERGE_BY_VENDOR', {})
+    _comic = create_comic()
+    _rows = []
+    monkeypatch.setattr(
+        imports.comics_updated, 'send', lambda sender, rows: _rows.extend(rows)
+    )
+    imports.import_batch([
+        (_comic.marvel_id, 'Viejo', '', 1.0, 1, ''),
+        (1, 'Comic 1', '', 2.0, 2, ''),
+        (_comic.marvel_id, 'Nuevo titulo', '', 1.5, 3, ''),
+    ])
+    _comic.refresh_from_db()
+    assert (_comic.title, _comic.stock_qty) == ('Nuevo titulo', 3)
+    assert {_marvel_id for _, _marvel_id in _rows} == {1, _comic.marvel_id}
+
+
+def test_fast_json_renderer_matches_drf():
+    _data = ReturnList(
+        [ReturnDict({
+            'price': Decimal('10.50'),
+            'updated_at': timezone.now(),
+            'title': 'Spider-Man \u2028 ñ',
+            1: None,
+        }, serializer=None)],
+        serializer=None
+    )
+    _content = renderers.FastJSONRenderer().render(_data)
+    assert _content == JSONRenderer().render(_data)
+    assert renderers.FastJSONRenderer().render(
+        _data, 'application/json; indent=4'
+    ) == JSONRenderer().render(_data, 'application/json; indent=4')
+
+    # Enteros de más de 64 bits, COMPACT_JSON = False y STRICT_JSON = False.
+    assert renderers.FastJSONRenderer().render(
+        {'id': 2 ** 70}
+    ) == JSONRenderer().render({'id': 2 ** 70})
+    for _setting, _value in (
+        ('compact', {'title': 'Spider-Man', 'ratio': 0.5}),
+        ('strict', {'title': 'Spider-Man', 'ratio': float('nan')}),
+    ):
+        _fast, _drf = renderers.FastJSONRenderer(), JSONRenderer()
+        setattr(_fast, _setting, False)
+        setattr(_drf, _setting, False)
+        assert _fast.render(_value) == _drf.render(_value)
+    # Con STRICT_JSON = True, NaN se codifica como null.
+    assert renderers.FastJSONRenderer().render({'ratio': float('nan')}) == b'{"ratio":null}'
+
+    assert parsers.FastJSONParser().parse(io.BytesIO(_content)) == json.loads(_content)
+    with pytest.raises(ParseError):
+        parsers.FastJSONParser().parse(io.BytesIO(b'{"a": '))
+
+
+@pytest.mark.django_db
+def test_wishlist_msgpack(client, create_wishlist):
+    _wish_list = create_wishlist()
+    _token, _ = Token.objects.get_or_create(user=_wish_list.user)
+    _headers = {'HTTP_AUTHORIZATION': f'Token {_token.key}'}
+    endpoint = reverse('wishlist-list')
+
+    response = client.get(endpoint, HTTP_ACCEPT='application/msgpack', **_headers)
+    assert response['Content-Type'] == 'application/msgpack'
+    _json = client.get(endpoint, **_headers)
+    assert msgpack.unpackb(response.content) == _json.json()
+    assert len(response.content) < len(_json.content)
+
+    _comic = Comic.objects.create(marvel_id=1, title='Otro comic')
+    response = client.post(
+        endpoint,
+        msgpack.packb({
+            'user': _wish_list.user_id, 'comic': _comic.id, 'wished_qty': 2
+        }),
+        content_type='application/msgpack',
+        HTTP_ACCEPT='application/msgpack',
+        **_headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED, response.content
+    assert msgpack.unpackb(response.content)['wished_qty'] == 2
+
+
+@pytest.mark.skipif('br' not in middleware.COMPRESSORS, reason='brotli no está instalado')
+def test_choose_encoding():
+    assert middleware.choose_encoding('gzip, br') == 'br'
+    assert middleware.choose_encoding('gzip;q=1, br;q=0.5') == 'gzip'
+    assert middleware.choose_encoding('br;q=0, *;q=0.1', ['br', 'gzip']) == 'gzip'
+    assert middleware.choose_encoding('identity') is None
+
+
+@pytest.mark.django_db
+def test_compression_middleware(client, create_user, settings):
+    Comic.objects.bulk_create([
+        Comic(marvel_id=_marvel_id, title='Comic', description='Descripción ' * 20)
+        for _marvel_id in range(20)
+    ])
+    client.force_login(create_user())
+
+    response = client.get('/e-commerce/api/comic-list/', HTTP_ACCEPT_ENCODING='gzip')
+    assert response.streaming
+    assert response['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response['Vary']
+    assert response['ETag'].startswith('W/')
+    _plain = _content(client.get('/e-commerce/api/comic-list/'))
+    assert gzip.decompress(_content(response)) == _plain
+
+    # La segunda vez el listado sale de la caché y se comprime completo.
+    response = client.get('/e-commerce/api/comic-list/', HTTP_ACCEPT_ENCODING='zstd, gzip')
+    assert not response.streaming
+    assert response['Content-Encoding'] in middleware.COMPRESSORS
+    assert len(response.content) < len(_plain)
+
+    # Con el ETag débil el GET condicional sigue respondiendo 304.
+    response = client.get(
+        '/e-commerce/api/comic-list/',
+        HTTP_ACCEPT_ENCODING='gzip',
+        HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # Las respuestas chicas se envían sin comprimir.
+    _comic = Comic.objects.first()
+    response = client.get(f'/e-commerce/api/comics/{_comic.id}/', HTTP_ACCEPT_ENCODING='gzip')
+    assert not response.has_header('Content-Encoding')
+
+    # "q" puede no ser el primer parámetro.
+    assert middleware.parse_accept_encoding('gzip;level=1;q=0.5, br; q=0') == {
+        'gzip': 0.5, 'br': 0.0
+    }
+
+    # Las respuestas con credenciales nunca se comprimen (BREACH).
+    settings.E_COMMERCE_COMPRESSION_MIN_SIZE = 0
+    _user = create_user()
+    _login = {'username': _user.username, 'password': '12345678hola'}
+    response = client.post(
+        '/e-commerce/api/login/', _login,
+        content_type='application/json', HTTP_ACCEPT_ENCODING='gzip'
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert not response.has_header('Content-Encoding')
+    response = client.post(
+        '/e-commerce/api/batch/',
+        {'requests': [{'method': 'POST', 'path': '/e-commerce/api/login/', 'body': _login}]},
+        content_type='application/json', HTTP_ACCEPT_ENCODING='gzip'
+    )
+    assert response.json()['responses'][0]['body']['token']
+    assert not response.has_header('Content-Encoding')
+    # El formulario de login incluye el token CSRF.
+    response = client.get('/admin/login/', HTTP_ACCEPT_ENCODING='gzip')
+    assert not response.has_header('Content-Encoding')
+
+
+@pytest.mark.django_db
+def test_sparse_fields(client, create_wishlist):
+    _wish_list = create_wishlist()
+    with CaptureQueriesContext(connection) as _queries:
+        response = client.get(
+            '/e-commerce/api/comics/list/', {'fields': 'marvel_id,title'}
+        )
+    assert response.json()['results'] == [
+        {'marvel_id': _wish_list.comic.marvel_id, 'title': _wish_list.comic.title}
+    ]
+    assert '"description"' not in _comic_queries(_queries)[-1]
+
+    _token, _ = Token.objects.get_or_create(user=_wish_list.user)
+    _headers = {'HTTP_AUTHORIZATION': f'Token {_token.key}'}
+    response = client.get(
+        f'/e-commerce/api/comics/{_wish_list.comic_id}/',
+        {'exclude': 'description,picture'},
+        **_headers
+    )
+    assert 'description' not in response.json() and 'title' in response.json()
+
+    with CaptureQueriesContext(connection) as _queries:
+        response = client.get(
+            reverse('wishlist-list'),
+            {
+                'fields': 'id,comic.title,user',
+                'exclude': 'user.email,user.date_joined',
+                'expand': 'user,comic',
+            },
+            **_headers
+        )
+    _result = response.json()['results'][0]
+    assert _result['comic'] == {'title': _wish_list.comic.title}
+    assert 'email' not in _result['user'] and 'username' in _result['user']
+    _sql = [
+        _query['sql'] for _query in _queries.captured_queries
+        if 'FROM "e_commerce_wish_list"' in _query['sql']
+    ][-1]
+    assert 'JOIN "e_commerce_comics"' in _sql and 'JOIN "auth_user"' in _sql
+    assert '"description"' not in _sql and '"email"' not in _sql
+    assert len(_queries) == 3, 'Token, count y una única query con los joins.'
+
+
+@pytest.mark.django_db
+def test_wishlist_expand(client, create_wishlist):
+    _wish_list = create_wishlist()
+    _token, _ = Token.objects.get_or_create(user=_wish_list.user)
+    _headers = {'HTTP_AUTHORIZATION': f'Token {_token.key}'}
+    endpoint = reverse('wishlist-list')
+
+    def _get(params):
+        with CaptureQueriesContext(connection) as _queries:
+            _result = client.get(endpoint, params, **_headers).json()['results'][0]
+        return _result, [
+            _query['sql'] for _query in _queries.captured_queries
+            if 'FROM "e_commerce_wish_list"' in _query['sql']
+        ][-1]
+
+    _result, _sql = _get({})
+    assert (_result['user'], _result['comic']) == (_wish_list.user_id, _wish_list.comic_id)
+    # (El join con "auth_user" es por el orden por "user__username".)
+    assert 'e_commerce_comics' not in _sql and '"auth_user"."email"' not in _sql
+
+    _result, _sql = _get({'expand': 'comic'})
+    assert _result['user'] == _wish_list.user_id
+    assert _result['comic']['marvel_id'] == _wish_list.comic.marvel_id
+    assert 'JOIN "e_commerce_comics"' in _sql and '"auth_user"."email"' not in _sql
+
+    _result, _sql = _get({'expand': 'user,comic,favorite'})
+    assert _result['user']['username'] == _wish_list.user.username
+    assert '"auth_user"."email"' in _sql
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('time_zone', ['UTC', 'America/Argentina/Buenos_Aires'])
+def test_compiled_serializers_match_drf(create_wishlist, settings, time_zone):
+    settings.TIME_ZONE = time_zone
+    _wish_list = create_wishlist()
+    _wish_list.user.last_login = timezone.now()
+    _wish_list.user.save()
+    _cases = (
+        (serializers.ComicSerializer, Comic.objects.all(), {}),
+        (serializers.UserSerializer, User.objects.all(), {}),
+        (serializers.WishListSerializer, WishList.objects.all(), {}),
+        (serializers.WishListSerializer, WishList.objects.all(), {'expand': ['user', 'comic']}),
+        (serializers.UserWishListSerializer, WishList.objects.all(), {}),
+    )
+    # Se prueban todos los serializadores que usan el mixin.
+    assert {_case[0] for _case in _cases} == {
+        _value for _value in vars(serializers).values()
+        if isinstance(_value, type) and issubclass(_value, CompiledRepresentationMixin)
+        and _value is not CompiledRepresentationMixin
+    }
+    for _serializer_class, _instances, _context in _cases:
+        settings.E_COMMERCE_COMPILED_SERIALIZERS = False
+        _expected = _serializer_class(_instances, many=True, context=_context).data
+        settings.E_COMMERCE_COMPILED_SERIALIZERS = True
+        _data = _serializer_class(_instances, many=True, context=_context).data
+        assert json.dumps(_data) == json.dumps(_expected)
+
+        # Y lo mismo con las filas de `values_list()`, si se pueden usar.
+        # (Sin request, "expand" se aplica recién en `to_representation()`.)
+        _serializer = _serializer_class(many=True, context=_context).child
+        _columns, _serializer.values_representation = compile_values_representation(
+            _serializer
+        )
+        if _columns is not None and 'expand' not in _context:
+            assert json.dumps([
+                _serializer.to_representation(_row)
+                for _row in _instances.values_list(*_columns)
+            ]) == json.dumps(_expected)
+        if 'expand' in _context:
+            assert 'password' not in _data[0]['user']
+            assert 'is_active' not in _data[0]['user']
+
+
+@pytest.mark.django_db
+@pytest.mark.filterwarnings('error::django.core.paginator.UnorderedObjectListWarning')
+def test_values_list_pipeline(client, create_wishlist, settings, monkeypatch):
+    _wish_list = create_wishlist()
+    _wish_list.user.last_login = timezone.now()
+    _wish_list.user.save()
+    _token, _ = Token.objects.get_or_create(user=_wish_list.user)
+    _headers = {'HTTP_AUTHORIZATION': f'Token {_token.key}'}
+    _comic_urls = (
+        '/e-commerce/api/comics/list/',
+        f'/e-commerce/api/comics/user/{_wish_list.user.username}/',
+    )
+    _user_urls = (
+        '/e-commerce/api/users/modelviewset/users/',
+        '/e-commerce/api/users/modelviewset/users/?fields=id,username',
+        '/e-commerce/api/users/modelviewset/filtering-backend/users/?ordering=-username',
+    )
+
+    def _get_all():
+        _data = [client.get(_url, **_headers).json() for _url in _comic_urls]
+        # NOTE: Con el pipeline de `values_list()` no se crean instancias.
+        with monkeypatch.context() as _patch:
+            if settings.E_COMMERCE_COMPILED_SERIALIZERS:
+                _patch.setattr(User, 'from_db', None)
+            with CaptureQueriesContext(connection) as _queries:
+                _data += [client.get(_url).json() for _url in _user_urls]
+        return _data, _queries
+
+    settings.E_COMMERCE_COMPILED_SERIALIZERS = False
+    _expected, _ = _get_all()
+    cache.clear()
+    settings.E_COMMERCE_COMPILED_SERIALIZERS = True
+    monkeypatch.setattr(Comic, 'from_db', None)
+    _data, _queries = _get_all()
+    assert _data == _expected
+    _user = _data[2]['results'][0]
+    assert 'password' not in _user and 'is_active' not in _user
+    assert all(list(_row) == ['id', 'username'] for _row in _data[3]['results'])
+    assert '"auth_user"."email"' not in _queries.captured_queries[-3]['sql']
+
+
+@pytest.mark.django_db
+def test_row_fragment_cache(client, monkeypatch):
+    Comic.objects.bulk_create([
+        Comic(marvel_id=_marvel_id, title=f'Comic {_marvel_id}')
+        for _marvel_id in range(3)
+    ])
+    _serialized = []
+    _to_representation = serializers.ComicSerializer.to_representation
+    # NOTE: Las filas que faltan se leen con `values_list()`.
+    _columns, _ = compile_values_representation(serializers.ComicSerializer())
+    _marvel_id = _columns.index('marvel_id')
+
+    def _counting_to_representation(self, instance):
+        if isinstance(instance, tuple):
+            _serialized.append(instance[_marvel_id])
+        return _to_representation(self, instance)
+
+    monkeypatch.setattr(
+        serializers.ComicSerializer, 'to_representation', _counting_to_representation
+    )
+    _url = '/e-commerce/api/comics/list/'
+    response = client.get(_url)
+    _expected = serializers.ComicSerializer(
+        Comic.objects.order_by('id')[:2], many=True
+    ).data
+    assert response.json()['count'] == 3
+    assert response.json()['results'] == _expected
+    assert sorted(_serialized) == [0, 1]
+
+    # Cambia el catálogo: la página se vuelve a armar pero sólo se
+    # serializa la fila modificada.
+    _serialized.clear()
+    Comic.objects.get(marvel_id=1).save()
+    response = client.get(_url)
+    assert response.json()['results'] == _expected
+    assert _serialized == [1]
+    _page_2 = client.get(_url, {'page': 2}).json()
+    assert _page_2['previous'] and _page_2['results'][0]['marvel_id'] == 2
+    _msgpack = client.get(_url, {'page': 2}, HTTP_ACCEPT='application/msgpack')
+    assert msgpack.unpackb(_msgpack.content) == _page_2
+
+    # Si cambian los campos del serializador cambia la clave de los fragmentos.
+    _view = views.GetComicAPIView()
+    _serializer = serializers.ComicSerializer()
+    _label = _view._fragment_label(Comic, _serializer)
+    _serializer.fields.pop('description')
+    assert _view._fragment_label(Comic, _serializer) != _label
+
+
+@pytest.mark.django_db
+def test_comic_batch(client, create_user):
+    _comics = [
+        Comic.objects.create(marvel_id=_marvel_id, title=f'Comic {_marvel_id}')
+        for _marvel_id in (10, 20, 30)
+    ]
+    client.force_login(create_user())
+    _url = reverse('comic_batch')
+    _ids = [_comics[2].id, 999, _comics[0].id]
+    get_comic_entry(
+        'pk', _comics[2].id,
+        lambda: (_comics[2], serializers.ComicSerializer(_comics[2]).data)
+    )
+    with CaptureQueriesContext(connection) as _queries:
+        response = client.get(_url, {'ids': ','.join(map(str, _ids))})
+    assert response.status_code == status.HTTP_200_OK
+    assert [_row['marvel_id'] for _row in response.json()['results']] == [
+        _comics[2].marvel_id, _comics[0].marvel_id
+    ]
+    assert response.json()['missing'] == [999]
+    # Sólo se consultan los que no estaban en caché.
+    assert len(_comic_queries(_queries)) == 1
+    _sql = _comic_queries(_queries)[0]
+    assert f'{_comics[0].id}, 999' in _sql or f'999, {_comics[0].id}' in _sql
+
+    response = client.get(_url, {'marvel_ids': _comics[1].marvel_id})
+    assert response.json()['results'] == [
+        serializers.ComicSerializer(_comics[1]).data
+    ]
+    assert client.get(_url, {'ids': '1', 'marvel_ids': '1'}).status_code == 400
+    assert client.get(_url, {'ids': 'a,b'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_batch(client, create_wishlist):
+    _wish_list = create_wishlist()
+    _comic = _wish_list.comic
+    _token, _ = Token.objects.get_or_create(user=_wish_list.user)
+    _headers = {'HTTP_AUTHORIZATION': f'Token {_token.key}'}
+    _requests = [
+        {'id': 'comic', 'path': f'/e-commerce/api/comics/{_comic.id}/'},
+        {'path': f'/e-commerce/api/users/wishlist/?username={_wish_list.user.username}'},
+        {
+            'method': 'PATCH',
+            'path': f'/e-commerce/api/comics/retrieve-update/{_comic.id}/',
+            'body': {'stock_qty': 3},
+        },
+        {
+            'method': 'POST', 'path': '/e-commerce/api/login/',
+            'body': {'username': _wish_list.user.username, 'password': 'x'},
+        },
+        {'path': '/e-commerce/api/batch/'},
+        {'path': '/admin/'},
+    ]
+    with CaptureQueriesContext(connection) as _queries:
+        response = client.post(
+            '/e-commerce/api/batch/', {'requests': _requests},
+            content_type='application/json', **_headers
+        )
+    assert response.status_code == status.HTTP_200_OK
+    _responses = response.json()['responses']
+    assert [_item['status'] for _item in _responses] == [200, 200, 403, 400, 400, 404]
+    assert _responses[3]['body'] == {'error': 'Invalid Credentials.'}
+    assert _responses[0]['id'] == 'comic'
+    assert _responses[0]['body'] == serializers.ComicSerializer(_comic).data
+    assert _responses[0]['headers']['ETag']
+    assert _responses[1]['body']['results'][0]['comic'] == _comic.id
+    # El token se consulta una sola vez para todo el batch.
+    assert len([
+        _query for _query in _queries.captured_queries
+        if 'authtoken_token' in _query['sql']
+    ]) == 1
+
+    response = client.post(
+        '/e-commerce/api/batch/', {'requests': [{'method': 'TRACE', 'path': '/'}]},
+        content_type='application/json'
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    # Con sesión, las views que sólo aceptan token no se autentican.
+    client.force_login(_wish_list.user)
+    response = client.post(
+        '/e-commerce/api/batch/',
+        {'requests': [
+            {'path': f'/e-commerce/api/users/wishlist/?username={_wish_list.user.username}'},
+            {'path': f'/e-commerce/api/comics/{_comic.id}/'},
+        ]},
+        content_type='application/json'
+    )
+    assert [_item['status'] for _item in response.json()['responses']] == [401, 200]
+
+
+@pytest.mark.django_db
+def test_batch_sub_request_error(client, create_comic, create_user, monkeypatch):
+    _comic = create_comic()
+    _token = Token.objects.create(user=create_user())
+    _resolve = batch.resolve
+
+    def _failing_view(request, *args, **kwargs):
+        raise RuntimeError('boom')
+
+    def _resolve_failing(path):
+        _match = _resolve(path)
+        if 'retrieve-update' in path:
+            _match.func = _failing_view
+        return _match
+
+    monkeypatch.setattr(batch, 'resolve', _resolve_failing)
+    response = client.post(
+        '/e-commerce/api/batch/',
+        {'requests': [
+            {'path': f'/e-commerce/api/comics/retrieve-update/{_comic.id}/'},
+            {'path': f'/e-commerce/api/comics/{_comic.id}/'},
+        ]},
+        content_type='application/json', HTTP_AUTHORIZATION=f'Token {_token.key}'
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [_item['status'] for _item in response.json()['responses']] == [500, 200]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_asgi_runs_reads_concurrently(create_comic, create_user, settings, monkeypatch):
+    _comic = create_comic()
+    _user = create_user()
+    _threads = set()
+    _dispatch = batch.dispatch
+
+    def _tracking_dispatch(*args):
+        _threads.add(threading.get_ident())
+        time.sleep(0.05)
+        return _dispatch(*args)
+
+    _closed = []
+    _close_all = connections.close_all
+
+    def _tracking_close_all():
+        _closed.append(threading.get_ident())
+        _close_all()
+
+    monkeypatch.setattr(batch, 'dispatch', _tracking_dispatch)
+    monkeypatch.setattr(connections, 'close_all', _tracking_close_all)
+    settings.E_COMMERCE_BATCH_WORKERS = 4
+    _token = Token.objects.create(user=_user)
+
+    async def _post():
+        return await AsyncClient().post(
+            '/e-commerce/api/batch/',
+            {'requests': [{'path': f'/e-commerce/api/comics/{_comic.id}/'}] * 4},
+            content_type='application/json',
+            # NOTE: `AsyncClient` recibe los headers por su nombre HTTP.
+            authorization=f'Token {_token.key}'
+        )
+
+    response = async_to_sync(_post)()
+    assert response.status_code == status.HTTP_200_OK
+    assert [_item['status'] for _item in response.json()['responses']] == [200] * 4
+    assert len(_threads) > 1
+    # Cada hilo cierra sus conexiones una sola vez, al terminar el batch.
+    assert sorted(_closed) == sorted(_threads)
+
+
+@pytest.mark.django_db
+def test_cached_openapi_schema(client, tmp_path, settings, monkeypatch):
+    settings.E_COMMERCE_OPENAPI_SCHEMA_DIR = tmp_path
+    monkeypatch.setattr(openapi, '_schemas', {})
+    call_command('build_openapi_schema', stdout=io.StringIO())
+    _path = openapi.schema_path()
+    assert _path.parent == tmp_path and _path.exists()
+
+    # Los requests ya no generan el esquema, lo leen del archivo.
+    monkeypatch.setattr(openapi, 'build_schema', None)
+    response = client.get('/api-docs/swagger/?format=openapi')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == _path.read_bytes()
+    assert '/comics/batch/' in json.loads(response.content)['paths']
+    response = client.get(
+        '/api-docs/swagger/?format=openapi', HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+
+def test_openapi_fingerprint_dependencies(settings, monkeypatch):
+    assert {'e_commerce.models', 'e_commerce.api.serializers'} <= (
+        openapi._schema_modules(views.GetComicAPIView)
+    )
+    monkeypatch.setattr(openapi, '_schemas', {})
+    _fingerprint = openapi.schema_fingerprint()
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK, 'DEFAULT_PARSER_CLASSES': ('rest_framework.parsers.JSONParser',)
+    }
+    monkeypatch.setattr(openapi, '_schemas', {})
+    assert openapi.schema_fingerprint() != _fingerprint
+
+
+def test_profile_startup_lazy_imports():
+    _out = io.StringIO()
+    call_command('profile_startup', '--limit', '10000', stdout=_out)
+    _output = _out.getvalue()
+    assert 'import del URLconf' in _output
+    # drf-yasg (vistas, renderers) y `requests` desde marvel_views se
+    # importan recién cuando se usan, no al arrancar.
+    assert ' drf_yasg.views\n' not in _output
+    assert ' drf_yasg.openapi\n' not in _output
+    assert ' ruamel.yaml\n' not in _output
+
+
+@pytest.mark.django_db
+def test_warm_up(create_wishlist, settings, django_assert_max_num_queries):
+    _wish_list = create_wishlist()
+    _other_comic = Comic.objects.create(marvel_id=1, title='Otro comic')
+    settings.E_COMMERCE_WARMUP_COMICS = 1
+    cache.clear()
+    _stats = warmup.warm_up(timeout=30)
+    assert list(_stats) == [_name for _name, _ in warmup.WARMUP_STAGES]
+    assert _stats['routes'][0] > 0 and _stats['serializers'][0] > 0
+    # Sólo se precarga el comic más pedido (el que está en una wish-list).
+    assert _stats['comics'][0] == 1
+    with django_assert_max_num_queries(0):
+        assert get_comic_entry('pk', _wish_list.comic_id, None)['marvel_id'] == (
+            _wish_list.comic.marvel_id
+        )
+    assert cache.get(f'e_commerce:comic:pk:{_other_comic.pk}') is None
+
+    # Sin tiempo disponible no se ejecuta ninguna etapa.
+    assert warmup.warm_up(timeout=0) == {}
+
+
+@pytest.mark.django_db
+def test_warm_up_only_in_servers(settings, monkeypatch):
+    _calls = []
+    monkeypatch.setattr(warmup, 'warm_up', lambda: _calls.append('warm_up'))
+    settings.E_COMMERCE_WARMUP = True
+    # Los comandos de manage.py (migrate, collectstatic...) no precalientan.
+    django_apps.get_app_config('e_commerce').ready()
+    assert _calls == []
+    for _name in ('marvel.wsgi', 'marvel.asgi'):
+        _module = importlib.import_module(_name)
+        _calls.clear()
+        importlib.reload(_module)
+        assert _calls == ['warm_up']
+
+    settings.E_COMMERCE_WARMUP = False
+    assert warmup.warm_up_if_enabled() is None
+    assert _calls == ['warm_up']
+
+
+def test_connection_pool():
+    class _Connection:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    _pool = ConnectionPool(max_size=2, timeout=0.05, max_lifetime=60)
+    _first = _pool.get(_Connection)
+    _pool.put(_first)
+    # Se reutiliza la conexión devuelta.
+    assert _pool.get(_Connection) is _first
+    _second = _pool.get(_Connection)
+    assert _second is not _first
+    with pytest.raises(PoolTimeout):
+        _pool.get(_Connection)
+
+    # Las conexiones que no se pueden reutilizar se cierran.
+    _pool.put(_first, reset=lambda _connection: False)
+    _pool.put(_second)
+    assert _first.closed and _pool.idle_count == 1
+    _third = _pool.get(_Connection, check=lambda _connection: False)
+    assert _second.closed and _third not in (_first, _second)
+    _pool.put(_third)
+
+    # Varios hilos nunca usan la misma conexión a la vez.
+    _in_use = set()
+    _lock = threading.Lock()
+    _errors = []
+
+    def _worker():
+        for _ in range(200):
+            _connection = _pool.get(_Connection)
+            with _lock:
+                if _connection in _in_use:
+                    _errors.append(_connection)
+                _in_use.add(_connection)
+            time.sleep(0)
+            with _lock:
+                _in_use.discard(_connection)
+            _pool.put(_connection)
+
+    _pool.timeout = 5
+    _threads = [threading.Thread(target=_worker) for _ in range(8)]
+    for _thread in _threads:
+        _thread.start()
+    for _thread in _threads:
+        _thread.join()
+    assert not _errors and _pool.idle_count <= 2
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas(settings, tmp_path):
+    def _pragma(name, pragmas):
+        settings.E_COMMERCE_SQLITE_PRAGMAS = pragmas
+        _connection = connections['default'].__class__(
+            {**connection.settings_dict, 'NAME': str(tmp_path / f'{len(pragmas)}.sqlite3')}
+        )
+        try:
+            with _connection.cursor() as _cursor:
+                _cursor.execute(f'PRAGMA {name}')
+                return _cursor.fetchone()[0]
+        finally:
+            _connection.close()
+
+    _pragmas = settings.E_COMMERCE_SQLITE_PRAGMAS
+    assert _pragma('journal_mode', _pragmas) == 'wal'
+    assert _pragma('busy_timeout', _pragmas) == _pragmas['busy_timeout']
+    # Sin PRAGMAs configurados se usan los de SQLite.
+    assert _pragma('journal_mode', {}) == 'delete'
+
+
+class _FakePgCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        if self.connection.broken:
+            raise pg_base.Database.OperationalError('server closed the connection')
+        self.connection.statements.append(sql)
+
+    def close(self):
+        pass
+
+
+class _FakePgConnection:
+    '''
+    Lo mínimo de una conexión de psycopg2 que usa el backend de Postgres.
+    '''
+    isolation_level = None
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.autocommit = False
+        self.statements = []
+        self.transaction_status = pg_base.TRANSACTION_STATUS_IDLE
+
+    def cursor(self, *args, **kwargs):
+        return _FakePgCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        self.statements.append('ROLLBACK')
+        self.transaction_status = pg_base.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        pass
+
+    def set_client_encoding(self, encoding):
+        pass
+
+    def get_parameter_status(self, name):
+        return 'UTC'
+
+    def get_transaction_status(self):
+        return self.transaction_status
+
+
+def _fake_pg_wrapper(monkeypatch, **settings_dict):
+    _created = []
+
+    def _get_new_connection(self, conn_params):
+        _created.append(_FakePgConnection())
+        return _created[-1]
+
+    monkeypatch.setattr(
+        pg_base.base.DatabaseWrapper, 'get_new_connection', _get_new_connection
+    )
+    monkeypatch.setattr(pg_base, '_pools', {})
+    _wrapper = pg_base.DatabaseWrapper({
+        'ENGINE': 'e_commerce.db.backends.postgresql', 'NAME': 'marvel_db',
+        'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '', 'TIME_ZONE': None,
+        'AUTOCOMMIT': True, 'ATOMIC_REQUESTS': False, 'TEST': {},
+        'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': {},
+        **settings_dict
+    }, alias='fake_pg')
+    return _wrapper, _created
+
+
+def test_wishlist_migration_postgresql_sql(monkeypatch, django_db_blocker):
+    # NOTE: Se junta el SQL (collect_sql) sin conectarse a ningún Postgres.
+    _loader = MigrationLoader(None, ignore_no_migrations=True)
+    _migration = _loader.get_migration('e_commerce', '0004_wishlist_unique_and_indexes')
+    _constraint, _fk_index = _migration.operations[1], _migration.operations[-1]
+    _before = _loader.project_state(('e_commerce', '0003_auto_20231203_1917'))
+    _after = _before.clone()
+    for _operation in _migration.operations:
+        _operation.state_forwards('e_commerce', _after)
+
+    with django_db_blocker.unblock():
+        _wrapper, _ = _fake_pg_wrapper(monkeypatch)
+        # `allow_migrate_model()` busca la conexión por su alias.
+        monkeypatch.setattr(connections._connections, 'fake_pg', _wrapper, raising=False)
+        _editor = _wrapper.SchemaEditorClass(_wrapper, collect_sql=True, atomic=False)
+        monkeypatch.setattr(
+            _editor, '_constraint_names',
+            lambda *args, **kwargs: ['e_commerce_wishlist_user_id_idx']
+        )
+        _constraint.database_backwards('e_commerce', _editor, _after, _before)
+        _fk_index.database_forwards('e_commerce', _editor, _before, _after)
+        _fk_index.database_backwards('e_commerce', _editor, _after, _before)
+    _sql = '\n'.join(_editor.collected_sql)
+    assert 'DROP CONSTRAINT IF EXISTS "wish_list_user_comic_uniq"' in _sql
+    assert 'DROP INDEX CONCURRENTLY IF EXISTS "e_commerce_wishlist_user_id_idx"' in _sql
+    assert 'CREATE INDEX CONCURRENTLY' in _sql and '("user_id")' in _sql
+    assert 'ALTER COLUMN' not in _sql
+
+
+def test_postgresql_pool_wrapper(monkeypatch, django_db_blocker):
+    # NOTE: Son conexiones falsas, no la base de datos de los tests.
+    with django_db_blocker.unblock():
+        _wrapper, _created = _fake_pg_wrapper(
+            monkeypatch, OPTIONS={'pool': {'max_size': 2}}
+        )
+        _pool = _wrapper.get_pool()
+        _wrapper.ensure_connection()
+        _first = _created[0]
+        _first.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+
+        # Al terminar el request (CONN_MAX_AGE = 0) vuelve al pool, sin
+        # transacción ni estado de la sesión.
+        _wrapper.close_if_unusable_or_obsolete()
+        assert _wrapper.connection is None and not _first.closed
+        assert _pool.idle_count == 1
+        assert _first.statements[-2:] == ['ROLLBACK', 'DISCARD ALL']
+
+        # El siguiente request la reutiliza, verificándola una vez.
+        _wrapper.close_if_unusable_or_obsolete()
+        _wrapper.cursor()
+        _wrapper.cursor()
+        assert _wrapper.connection is _first and len(_created) == 1
+        assert _first.statements.count('SELECT 1') == 1
+
+        # Luego de un error, si ya no responde se descarta.
+        _wrapper.errors_occurred = True
+        _first.broken = True
+        _wrapper.close_if_unusable_or_obsolete()
+        assert _first.closed and _pool.idle_count == 0
+
+        # Cerrada dentro de un `atomic()` tampoco vuelve al pool.
+        _wrapper.ensure_connection()
+        _second = _created[-1]
+        assert _second is not _first
+        _wrapper.in_atomic_block = True
+        _wrapper.close()
+        assert _second.closed and _pool.idle_count == 0
+
+
+def test_postgresql_health_checks(monkeypatch, django_db_blocker):
+    # NOTE: Son conexiones falsas, no la base de datos de los tests.
+    with django_db_blocker.unblock():
+        _wrapper, _created = _fake_pg_wrapper(monkeypatch, CONN_MAX_AGE=None)
+        _wrapper.ensure_connection()
+        _first = _created[0]
+
+        # Una verificación por request, antes del primer uso.
+        for _request in range(2):
+            _wrapper.close_if_unusable_or_obsolete()
+            _wrapper.cursor()
+            _wrapper.cursor()
+        assert _first.statements.count('SELECT 1') == 2
+
+        # Si la conexión se cayó se abre otra en lugar de fallar.
+        _first.broken = True
+        _wrapper.close_if_unusable_or_obsolete()
+        _wrapper.cursor()
+        assert _first.closed and _wrapper.connection is _created[1]
@@ -0,0 +1,182 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Count
+from django.urls import Resolver404, get_resolver, resolve
+
+from rest_framework.generics import GenericAPIView
+
+from e_commerce.openapi import get_view_class, walk_patterns
+
+
+logger = logging.getLogger(__name__)
+
+# NOTE: Luego de un deploy, los primeros requests de cada worker pagan la
+# compilación de las expresiones regulares del URLconf, la construcción de
+# los campos de los serializadores y de los filtersets, y la caché de comics
+# vacía. El precalentamiento hace ese trabajo al arrancar, con un tiempo
+# máximo para no demorar el arranque. Se llama desde marvel/wsgi.py y
+# marvel/asgi.py (no desde `ECommerceConfig.ready()`), que sólo importan los
+# servidores (gunicorn, uvicorn, `runserver`) y no el resto de los comandos
+# de manage.py como `migrate` o `collectstatic`. Cada etapa es un generador
+# que devuelve un elemento por vez, y entre elementos se controla el tiempo
+# restante.
+
+
+def _view_classes():
+    _seen = set()
+    for _route, _callback in walk_patterns(get_resolver().url_patterns):
+        _class = get_view_class(_callback)
+        if _class is not None and _class not in _seen:
+            _seen.add(_class)
+            yield _class
+
+
+def _warm_routes():
+    '''
+    Compila las expresiones regulares de todas las rutas, arma los índices
+    de `reverse()` y resuelve las URLs que no tienen parámetros.
+    '''
+    _resolver = get_resolver()
+    _resolver.reverse_dict
+    _resolver.namespace_dict
+    for _route, _callback in walk_patterns(_resolver.url_patterns):
+        if '<' in _route or '(' in _route or '^' in _route:
+            yield _route
+            continue
+        try:
+            resolve(f'/{_route}')
+        except Resolver404:
+            pass
+        yield _route
+
+
+def _warm_serializers():
+    '''
+    Instancia el serializador de cada vista y arma sus campos y la función
+    de representación generada (ver e_commerce/api/compiled.py).
+    '''
+    from e_commerce.api.compiled import (
+        CompiledRepresentationMixin,
+        compile_representation,
+        compile_values_representation
+    )
+
+    _seen = set()
+    for _class in _view_classes():
+        _serializer_class = getattr(_class, 'serializer_class', None)
+        if _serializer_class is None or _serializer_class in _seen:
+            continue
+        _seen.add(_serializer_class)
+        _serializer = _serializer_class()
+        _serializer.fields
+        if (
+            settings.E_COMMERCE_COMPILED_SERIALIZERS
+            and isinstance(_serializer, CompiledRepresentationMixin)
+        ):
+            compile_representation(_serializer)
+            compile_values_representation(_serializer)
+        yield _serializer_class
+
+
+def _warm_filtersets():
+    '''
+    Arma la clase del filterset de cada vista que usa `DjangoFilterBackend`
+    y su formulario, sin consultar la base de datos.
+    '''
+    from django_filters.rest_framework import DjangoFilterBackend
+
+    for _class in _view_classes():
+        _queryset = getattr(_class, 'queryset', None)
+        if not issubclass(_class, GenericAPIView) or _queryset is None:
+            continue
+        for _backend in _class.filter_backends:
+            if not issubclass(_backend, DjangoFilterBackend):
+                continue
+            _filterset_class = _backend().get_filterset_class(_class(), _queryset)
+            if _filterset_class is not None:
+                _filterset_class(data={}, queryset=_queryset).form
+                yield _class
+
+
+def _warm_comics():
+    '''
+    Carga en la caché el detalle de los comics más pedidos (los que están
+    en más wish-lists), de a `E_COMMERCE_COMIC_BATCH_MAX_IDS` por consulta.
+    '''
+    from e_commerce.api.serializers import ComicSerializer
+    from e_commerce.cache import get_comic_entries
+    from e_commerce.models import Comic
+
+    _ids = list(
+        Comic.objects.annotate(_wishes=Count('wishlist'))
+        .order_by('-_wishes', '-id')
+        .values_list('id', flat=True)[:settings.E_COMMERCE_WARMUP_COMICS]
+    )
+
+    def _load(values):
+        return [
+            (_instance, ComicSerializer(_instance).data)
+            for _instance in Comic.objects.filter(pk__in=values)
+        ]
+
+    _size = settings.E_COMMERCE_COMIC_BATCH_MAX_IDS
+    for _start in range(0, len(_ids), _size):
+        yield from get_comic_entries('pk', _ids[_start:_start + _size], _load)
+
+
+WARMUP_STAGES = (
+    ('routes', _warm_routes),
+    ('serializers', _warm_serializers),
+    ('filtersets', _warm_filtersets),
+    ('comics', _warm_comics),
+)
+
+
+def warm_up(timeout=None):
+    '''
+    Ejecuta las etapas de `WARMUP_STAGES` en orden hasta terminar o hasta
+    que pasen `timeout` segundos (por defecto `E_COMMERCE_WARMUP_TIMEOUT`).
+    Un error en una etapa se registra y se pasa a la siguiente: el
+    precalentamiento nunca impide que el worker arranque.
+    Devuelve {etapa: (elementos, segundos)} de las etapas ejecutadas.
+    '''
+    if timeout is None:
+        timeout = settings.E_COMMERCE_WARMUP_TIMEOUT
+    _deadline = time.monotonic() + timeout
+    _stats = {}
+    for _name, _stage in WARMUP_STAGES:
+        if time.monotonic() >= _deadline:
+            logger.warning('Warm-up: time limit reached before stage "%s"', _name)
+            break
+        _start = time.monotonic()
+        _count = 0
+        try:
+            for _ in _stage():
+                _count += 1
+                if time.monotonic() >= _deadline:
+                    break
+        except DatabaseError as _error:
+            # Por ejemplo, al correr `migrate` con la base de datos vacía.
+            logger.warning('Warm-up: stage "%s" skipped: %s', _name, _error)
+        except Exception:
+            logger.exception('Warm-up: stage "%s" failed', _name)
+        _stats[_name] = (_count, time.monotonic() - _start)
+        logger.info('Warm-up: %s, %d items in %.3fs', _name, *_stats[_name])
+
+    # NOTE: Con `gunicorn --preload` esto corre en el proceso principal
+    # antes de crear los workers, que no deben heredar la conexión abierta.
+    connections.close_all()
+    return _stats
+
+
+def warm_up_if_enabled():
+    '''
+    Ejecuta `warm_up()` si `E_COMMERCE_WARMUP` está activo. Se llama al
+    cargar la aplicación WSGI o ASGI.
+    '''
+    if settings.E_COMMERCE_WARMUP:
+        return warm_up()
+    return None
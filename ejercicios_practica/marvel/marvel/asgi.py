@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'marvel.settings')
 
 application = get_asgi_application()
+
+# NOTE: Precalentamiento de rutas, serializadores y caché al arrancar el
+# worker, ver e_commerce/warmup.py.
+from e_commerce.warmup import warm_up_if_enabled  # noqa: E402
+
+warm_up_if_enabled()
@@ -86,13 +86,29 @@ REST_FRAMEWORK = {
     # Ahora nuestras vistas genéricas van a tener paginado utilizando la clase
     # "PageNumberPagination".
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 2
+    'PAGE_SIZE': 2,
+    # Renderers y parsers JSON basados en orjson (ver e_commerce/api/renderers.py),
+    # mucho más rápidos que el módulo "json" estándar. Los servicios internos
+    # pueden usar MessagePack con "Accept" / "Content-Type: application/msgpack".
+    'DEFAULT_RENDERER_CLASSES': (
+        'e_commerce.api.renderers.FastJSONRenderer',
+        'e_commerce.api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'e_commerce.api.parsers.FastJSONParser',
+        'e_commerce.api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Debe ir antes que cualquier middleware que lea o modifique el contenido.
+    'e_commerce.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -135,15 +151,41 @@ if os.getenv("DB_ENGINE") == "POSTGRES":
         #   POSTGRES_USER: inove_user
         #   POSTGRES_PASSWORD: 123Marvel!
 
+    # Conexiones persistentes: segundos que se reutiliza cada conexión antes
+    # de cerrarla (0: una conexión por request, "None": sin límite). Con
+    # DB_POOL=1 las conexiones se devuelven a un pool del proceso al terminar
+    # cada request (ver e_commerce/db/backends/postgresql/base.py), por eso
+    # el valor por defecto pasa a ser 0.
+    _DB_POOL = os.getenv('DB_POOL', '0') == '1'
+    _DB_CONN_MAX_AGE = os.getenv('DB_CONN_MAX_AGE', '0' if _DB_POOL else '60')
+
     DATABASES = {
         'default': {
             # 'ENGINE': 'django.db.backends.postgresql_psycopg2' --> En desuso.
-            'ENGINE': 'django.db.backends.postgresql',
+            # NOTE: Backend de Postgres de Django con health checks y pool.
+            'ENGINE': 'e_commerce.db.backends.postgresql',
             'NAME': 'marvel_db',        # POSTGRES_DB
             'USER' : 'inove_user',      # POSTGRES_USER
             'PASSWORD' : '123Marvel!',  # POSTGRES_PASSWORD
-            'HOST':'db',                # Nombre del servicio
-            'PORT': '5432'              # Número del puerto
+            'HOST': os.getenv('DB_HOST', 'db'),  # Nombre del servicio
+            'PORT': os.getenv('DB_PORT', '5432'),  # Número del puerto
+            'CONN_MAX_AGE': None if _DB_CONN_MAX_AGE == 'None' else int(_DB_CONN_MAX_AGE),
+            # Verifica que la conexión persistente siga viva antes de
+            # usarla en cada request.
+            'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1',
+            # Necesario detrás de PgBouncer en modo "transaction": los
+            # cursores del lado del servidor (`.iterator()`) no sobreviven
+            # entre transacciones.
+            'DISABLE_SERVER_SIDE_CURSORS': (
+                os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', '0') == '1'
+            ),
+            'OPTIONS': {
+                'pool': {
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+                    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+                },
+            } if _DB_POOL else {},
         }
     }
 
@@ -155,6 +197,135 @@ else:
         }
     }
 
+# PRAGMAs que se aplican a cada conexión nueva de SQLite (ver
+# e_commerce/signals.py). Con un diccionario vacío se usan los de SQLite.
+# Comparar con `python benchmarks/bench_sqlite_pragmas.py`.
+E_COMMERCE_SQLITE_PRAGMAS = {
+    # Los lectores no bloquean al escritor (y viceversa).
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # Bytes del archivo que se leen con mmap en lugar de read().
+    'mmap_size': 256 * 1024 * 1024,
+    # Caché de páginas por conexión, en KiB si es negativo.
+    'cache_size': -64 * 1024,
+    # Milisegundos que se espera un lock antes de fallar con
+    # "database is locked".
+    'busy_timeout': 5000,
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# NOTE: Por defecto usamos la caché en memoria de cada proceso. En producción
+# se puede apuntar a un backend compartido (Memcached, Redis, etc.) por
+# medio de las variables de entorno.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'marvel'),
+    }
+}
+
+# NOTE: La caché en memoria (locmem) es de cada proceso: al guardar un comic
+# o una wish-list sólo se invalida la caché del worker que hizo la escritura
+# y el resto de los workers de gunicorn / uvicorn sigue devolviendo los datos
+# viejos hasta que expiran. Por eso, si la caché no es compartida:
+# - El detalle de los comics y los IDs de las wish-lists se guardan sólo
+#   E_COMMERCE_LOCAL_CACHE_TIMEOUT segundos (lo que puede tardar otro worker
+#   en ver un cambio).
+# - La versión del catálogo y su Last-Modified (ETag de los listados) se
+#   calculan desde la base de datos, así son iguales en todos los workers.
+# Para usar los tiempos largos hay que configurar un backend compartido.
+E_COMMERCE_SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+E_COMMERCE_LOCAL_CACHE_TIMEOUT = int(os.getenv('E_COMMERCE_LOCAL_CACHE_TIMEOUT', '5'))
+_SHARED_CACHE_TIMEOUT = 60 * 60 if E_COMMERCE_SHARED_CACHE else (
+    E_COMMERCE_LOCAL_CACHE_TIMEOUT
+)
+
+# Tiempo (en segundos) que se guardan los IDs de los comics de la
+# wish-list de cada usuario.
+E_COMMERCE_WISHLIST_IDS_CACHE_TIMEOUT = _SHARED_CACHE_TIMEOUT
+# Hasta esta cantidad de IDs el listado de comics de la wish-list usa un
+# `IN` con los IDs cacheados; con más, una subconsulta.
+E_COMMERCE_WISHLIST_IDS_MAX_IN = 500
+
+# Tiempo (en segundos) que se guarda el detalle serializado de cada comic.
+E_COMMERCE_COMIC_CACHE_TIMEOUT = _SHARED_CACHE_TIMEOUT
+
+# Cantidad máxima de comics que se pueden pedir juntos en
+# e-commerce/api/comics/batch/.
+E_COMMERCE_COMIC_BATCH_MAX_IDS = 100
+
+# Tiempo (en segundos) que se guardan los listados ya renderizados del
+# catálogo de comics. La clave incluye la versión del catálogo, así que no
+# depende de que la caché sea compartida (lo mismo que los fragmentos).
+E_COMMERCE_CATALOG_LIST_CACHE_TIMEOUT = 60 * 60
+# Los listados que se envían en partes (streaming) sólo se cachean si no
+# superan este tamaño (en bytes).
+E_COMMERCE_CATALOG_LIST_CACHE_MAX_BYTES = 1024 * 1024
+
+# Tiempo (en segundos) que se guarda el JSON de cada fila de los listados
+# de comics (ver `RowFragmentCacheMixin`).
+E_COMMERCE_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+# Cantidad de filas que se leen de la base de datos por vez en los
+# listados que se envían en partes.
+E_COMMERCE_STREAM_CHUNK_SIZE = 2000
+
+# Feed de cambios (e-commerce/api/changes/): se omiten los cambios de los
+# últimos segundos para no saltear transacciones que aún no hicieron commit.
+# NOTE: El feed ordena por "updated_at", el momento en que se modificó la
+# fila y no el del commit. Si una transacción tarda más que
+# E_COMMERCE_CHANGES_SETTLE_SECONDS en hacer commit, el cursor de un cliente
+# puede pasar ese momento antes de que la fila sea visible y el cambio no se
+# le informa nunca. Este valor tiene que ser mayor que la duración de la
+# transacción más larga que modifica comics o wish-lists.
+E_COMMERCE_CHANGES_SETTLE_SECONDS = 2
+E_COMMERCE_CHANGES_MAX_LIMIT = 1000
+# Los "tombstones" de los borrados se guardan esta cantidad de días y después
+# se eliminan con `python manage.py prune_tombstones`. Un cursor más viejo ya
+# no es válido: el cliente tiene que volver a sincronizar desde el principio.
+E_COMMERCE_CHANGES_RETENTION_DAYS = 30
+
+# Batch de requests (e-commerce/api/batch/): cantidad máxima de requests
+# por batch y de hilos para ejecutar en paralelo los de sólo lectura (sólo
+# bajo ASGI; con 1 se ejecutan uno por uno).
+E_COMMERCE_BATCH_MAX_REQUESTS = 20
+E_COMMERCE_BATCH_WORKERS = 4
+
+# Los serializadores arman un plan de lectura de los campos para representar
+# cada fila (ver e_commerce/api/compiled.py). Con False se usa la
+# representación de DRF.
+E_COMMERCE_COMPILED_SERIALIZERS = True
+
+# Compresión de respuestas (e_commerce.middleware.CompressionMiddleware).
+# Orden de preferencia de las codificaciones cuando el cliente acepta varias
+# con el mismo "q"; "br" y "zstd" sólo se usan si está instalado el paquete.
+E_COMMERCE_COMPRESSION_ENCODINGS = ('zstd', 'br', 'gzip')
+# Las respuestas más chicas que esto (en bytes) se envían sin comprimir.
+E_COMMERCE_COMPRESSION_MIN_SIZE = 512
+# Nivel de compresión por tipo de contenido ("*" para el resto). Ver el
+# costo en CPU de cada nivel con `python benchmarks/bench_compression.py`.
+E_COMMERCE_COMPRESSION_LEVELS = {
+    '*': {'gzip': 6, 'br': 4, 'zstd': 3},
+    'application/msgpack': {'gzip': 5, 'br': 3, 'zstd': 3},
+}
+
+# Precalentamiento al arrancar cada worker (ver e_commerce/warmup.py): rutas,
+# serializadores, filtersets y los E_COMMERCE_WARMUP_COMICS comics más
+# pedidos en caché, en un máximo de E_COMMERCE_WARMUP_TIMEOUT segundos. Se
+# activa con la variable de entorno E_COMMERCE_WARMUP=1 y sólo corre al cargar
+# marvel/wsgi.py o marvel/asgi.py (gunicorn, uvicorn, runserver), nunca en
+# el resto de los comandos de manage.py.
+E_COMMERCE_WARMUP = os.getenv('E_COMMERCE_WARMUP', '0') == '1'
+E_COMMERCE_WARMUP_TIMEOUT = float(os.getenv('E_COMMERCE_WARMUP_TIMEOUT', '10'))
+E_COMMERCE_WARMUP_COMICS = 200
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -242,6 +413,11 @@ SWAGGER_SETTINGS = {
     'LOGOUT_URL': LOGOUT_URL
 }
 
+# Directorio donde se guarda el esquema OpenAPI ya generado (ver
+# e_commerce/openapi.py). Se genera con `python manage.py build_openapi_schema`
+# o en el primer request a la documentación.
+E_COMMERCE_OPENAPI_SCHEMA_DIR = BASE_DIR / '.openapi'
+
 # Acá van todas las configuraciones para la UI de Redoc.
 REDOC_SETTINGS = {
    'LAZY_RENDERING': False,
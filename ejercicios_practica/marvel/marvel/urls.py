@@ -17,9 +17,8 @@ from django.contrib import admin
 from django.urls import path, include
 
 from rest_framework import permissions
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
 
+from e_commerce.openapi import get_cached_schema_view
 
 
 description = '''
@@ -35,14 +34,23 @@ Donde <b>92937874f377a1ea17f7637ee07208622e5cb5e6</b> es un ejemplo del <b>Token
 </p>
 '''
 
-schema_view = get_schema_view(
-   openapi.Info(
+
+def api_info():
+   # NOTE: drf-yasg se importa en el primer request a la documentación,
+   # no al cargar el URLconf (ver e_commerce/openapi.py).
+   from drf_yasg import openapi
+
+   return openapi.Info(
       title="Inove Marvel e-commerce",
       default_version='1.0.0',
       description=description,
       contact=openapi.Contact(email="info@inove.com.ar"),
       license=openapi.License(name="Inove Coding School."),
-   ),
+   )
+
+
+schema_view = get_cached_schema_view(
+   api_info,
    public=True,
    permission_classes=(permissions.IsAuthenticatedOrReadOnly,),
 )
@@ -1,11 +1,21 @@
 import pytest
 import uuid
 
+from django.core.cache import cache
 from rest_framework.authtoken.models import Token
 
 from e_commerce.models import Comic, WishList
 
 
+# NOTE: La base de datos se limpia en cada test pero la caché no, así que
+# la vaciamos para que los tests no compartan estado.
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def create_user(django_user_model, username=None):
     def make_user(*args, **kwargs):